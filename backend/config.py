@@ -33,11 +33,77 @@ class Settings(BaseSettings):
     IPFS_PINNING_SERVICE: str = "pinata"
     IPFS_API_URL: str = "http://127.0.0.1:5001"  # 仅 local 模式使用
     IPFS_GATEWAY: str = "https://gateway.pinata.cloud/ipfs/"  # Pinata 专用网关
+    # 读取内容时使用的网关列表（按实测延迟排序，慢请求会对冲到下一个网关）
+    IPFS_GATEWAYS: List[str] = [
+        "https://gateway.pinata.cloud/ipfs/",
+        "https://ipfs.io/ipfs/",
+        "https://cloudflare-ipfs.com/ipfs/",
+    ]
+    IPFS_GATEWAY_TIMEOUT_SECONDS: float = 15.0
+    IPFS_HEDGE_PERCENTILE: float = 0.9  # 领先请求超过该分位延迟仍未返回时发起对冲请求
+    IPFS_HEDGE_MIN_DELAY_MS: int = 100
+    IPFS_HEDGE_MAX_DELAY_MS: int = 3000
+    # 校验网关返回的内容与请求的 CIDv0 一致，不一致视为该网关失败（避免错误内容写入磁盘缓存）
+    IPFS_VERIFY_GATEWAY_CONTENT: bool = True
     
     # Pinata 配置（推荐使用 JWT）
     PINATA_JWT: Optional[str] = None  # 从 https://app.pinata.cloud/developers/api-keys 获取
     PINATA_API_KEY: Optional[str] = None  # 备选：API Key + Secret
     PINATA_SECRET_KEY: Optional[str] = None
+    # Pinata API 地址（压测时可指向本地替身服务：python -m backend.tools.pinata_standin）
+    PINATA_API_URL: str = "https://api.pinata.cloud"
+    # pinList 增量同步：分页大小与同一钱包两次同步的最小间隔（秒，0 表示只在首次同步）
+    PINATA_SYNC_PAGE_SIZE: int = 1000
+    PINATA_SYNC_INTERVAL_SECONDS: int = 300
+    # 快照编码：json（兼容旧格式）| compact（自动选择 msgpack/CBOR + zstd/zlib）| 显式指定如 msgpack+zstd
+    SNAPSHOT_ENCODING: str = "json"
+    # 是否将钱包对话摘要清单固定到 Pinata（新实例可直接读取，代价是每次保存多一次固定）
+    CONVERSATION_SUMMARY_PIN: bool = False
+    # 旧快照回收：每个对话保留的头部清单版本数、取消固定的批大小 / 批间隔，以及后台定时周期（0 表示不定时执行）
+    SNAPSHOT_GC_KEEP: int = 1
+    SNAPSHOT_GC_BATCH_SIZE: int = 20
+    SNAPSHOT_GC_BATCH_INTERVAL_SECONDS: float = 1.0
+    SNAPSHOT_GC_INTERVAL_SECONDS: int = 0
+
+    # 对话分段存储：每满 N 条消息封存为一个不可变分段，头部清单只携带未封存的尾部
+    CONVERSATION_SEGMENT_SIZE: int = 50
+    # 对话写入：分段锁数量，以及版本冲突（其他进程已写入更新版本）时重新加载重试的次数
+    CONVERSATION_LOCK_STRIPES: int = 64
+    CONVERSATION_WRITE_RETRIES: int = 2
+
+    # 批量读取：并行拉取快照的最大并发数与整体截止时间（秒），超时返回部分结果
+    IPFS_FETCH_CONCURRENCY: int = 8
+    IPFS_FETCH_DEADLINE_SECONDS: float = 20.0
+
+    # /conversations、/history 游标分页时每页的最大数量
+    CONVERSATION_PAGE_SIZE_MAX: int = 100
+
+    # 内存缓存预算（字节，0 表示不限制）与过期时间（秒），用于给每个 worker 固定内存上限
+    CONVERSATION_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    MINT_RECORD_CACHE_MAX_BYTES: int = 8 * 1024 * 1024
+    DATA_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_TTL_SECONDS: int = 3600
+    CACHE_REFRESH_AHEAD_RATIO: float = 0.1  # 剩余有效期低于 TTL 的该比例时，命中的对话在后台提前刷新
+    # 负缓存：记住索引和 Pinata 同步后仍不存在的对话 / 铸造记录 ID（秒，0 表示禁用），避免反复触发 pinList
+    NEGATIVE_CACHE_TTL_SECONDS: int = 30
+    NEGATIVE_CACHE_MAX_ENTRIES: int = 100000
+    # 钱包登录后在后台预热对话摘要和铸造记录：队列上限（满时丢弃）、工作线程数、同一钱包的最小预热间隔（秒）
+    PREFETCH_ON_LOGIN: bool = True
+    PREFETCH_QUEUE_SIZE: int = 32
+    PREFETCH_WORKERS: int = 2
+    PREFETCH_COOLDOWN_SECONDS: int = 300
+
+    # IPFS 内容磁盘缓存（按 CID 寻址，留空则禁用；Mock 模式下不启用）
+    IPFS_BLOB_CACHE_DIR: str = "./ipfs_cache"
+    IPFS_BLOB_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # 异步上传发件箱（仅 Pinata 模式）：本地计算 CID 后立即返回，内容持久化到 SQLite 后由后台线程固定
+    UPLOAD_OUTBOX_ENABLED: bool = False
+    UPLOAD_OUTBOX_PATH: str = "./upload_outbox.db"
+    UPLOAD_OUTBOX_WORKERS: int = 2
+    UPLOAD_OUTBOX_MAX_ATTEMPTS: int = 0  # 超过该次数转为 dead（0 表示一直重试）
+    UPLOAD_OUTBOX_RETRY_BASE_SECONDS: float = 1.0
+    UPLOAD_OUTBOX_RETRY_MAX_SECONDS: float = 300.0
 
     # ============ Blockchain Configuration ============
     # 通用配置
@@ -68,9 +134,24 @@ class Settings(BaseSettings):
     JWT_SECRET: str = "your-secret-key"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 60
+    AUTH_NONCE_TTL_SECONDS: int = 600  # 登录 nonce 在共享缓存中的有效期
+
+    # 出站 HTTP 连接池（Pinata / IPFS 网关 / RPC 共用）
+    HTTP_POOL_CONNECTIONS: int = 10  # 缓存连接池的主机数
+    HTTP_POOL_MAXSIZE: int = 32  # 每个主机的最大连接数
+    HTTP_TIMEOUT_SECONDS: float = 30.0  # 默认请求超时
 
     # Database (Optional - for caching)
     DATABASE_URL: str = "sqlite:///./chat_history.db"
+
+    # 多 worker 共享缓存（L2）：none（仅进程内缓存）| redis | sqlite（同一主机的多个 worker）
+    # 对话快照和登录 nonce 在 worker 间共享，写入时广播失效消息保持各进程本地缓存一致
+    SHARED_CACHE_BACKEND: str = "none"
+    SHARED_CACHE_URL: str = "redis://127.0.0.1:6379/0"
+    SHARED_CACHE_SQLITE_PATH: str = "./shared_cache.db"
+    SHARED_CACHE_PREFIX: str = "occ:"
+    SHARED_CACHE_POLL_SECONDS: float = 0.5  # sqlite 后端轮询失效消息的间隔
+
     USE_MOCK_SERVICES: bool = False
     MOCK_WALLET_ADDRESS: str = "0xMockWallet000000000000000000000000000000"
 
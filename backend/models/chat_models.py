@@ -1,8 +1,10 @@
 # Chat message schemas
 from datetime import datetime
-from typing import List, Literal, Optional
+from typing import Dict, Iterable, List, Literal, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter
+
+from ..utils.merkle import MerkleTree, hash_leaf, merkle_root
 
 
 class ChatMessage(BaseModel):
@@ -14,6 +16,21 @@ class ChatMessage(BaseModel):
     is_minted: bool = False  # 是否已被铸造为 NFT
 
 
+# 整个消息列表一次交给 pydantic-core 校验，比逐条 ChatMessage(**msg) 少了每条消息的 Python 调用开销
+_MESSAGE_LIST_ADAPTER = TypeAdapter(List[ChatMessage])
+
+
+def parse_messages(raw_messages: List[Dict]) -> List[ChatMessage]:
+    """批量校验并构建消息（快照解码的热路径）"""
+    return _MESSAGE_LIST_ADAPTER.validate_python(raw_messages)
+
+
+class ConversationSegment(BaseModel):
+    """已封存的对话分段（不可变，单独固定到 IPFS）"""
+    ipfs_hash: str  # 分段内容的 IPFS 哈希
+    message_count: int  # 分段包含的消息数
+
+
 class Conversation(BaseModel):
     """完整对话"""
     id: str  # 对话唯一标识
@@ -24,7 +41,79 @@ class Conversation(BaseModel):
     updated_at: datetime = Field(default_factory=datetime.now)
     
     # IPFS 存储信息
-    ipfs_hash: Optional[str] = None  # 最新版本的 IPFS 哈希
+    ipfs_hash: Optional[str] = None  # 最新版本的 IPFS 哈希（头部清单）
+    segments: List[ConversationSegment] = []  # 已封存的消息分段，按顺序排列
+    version: int = 0  # 每次保存递增，用于检测并发写入冲突
+    
+    # 消息 ID -> 在 messages 中的位置（懒构建；消息数变化时自动重建）
+    _positions: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _indexed_count: int = PrivateAttr(default=-1)
+    # 消息内容的增量 Merkle 树（懒构建，每条消息只哈希一次）
+    _merkle: Optional[MerkleTree] = PrivateAttr(default=None)
+    
+    def _index(self) -> Dict[str, int]:
+        if self._indexed_count != len(self.messages):
+            self._positions = {msg.id: pos for pos, msg in enumerate(self.messages) if msg.id}
+            self._indexed_count = len(self.messages)
+        return self._positions
+    
+    def add_message(self, message: ChatMessage) -> None:
+        """追加消息并同步更新索引"""
+        positions = self._index()
+        if message.id:
+            positions[message.id] = len(self.messages)
+        self.messages.append(message)
+        self._indexed_count = len(self.messages)
+    
+    def index_of(self, message_id: str) -> Optional[int]:
+        """消息在 messages 中的位置，不存在返回 None"""
+        return self._index().get(message_id)
+    
+    def positions_of(self, message_ids: Iterable[str]) -> List[int]:
+        """批量查询消息位置（按对话顺序排列，忽略不存在的 ID）"""
+        positions = self._index()
+        return sorted({positions[msg_id] for msg_id in message_ids if msg_id in positions})
+    
+    def select_messages(self, message_ids: Iterable[str]) -> List[ChatMessage]:
+        """按对话顺序返回指定 ID 的消息"""
+        return [self.messages[pos] for pos in self.positions_of(message_ids)]
+    
+    def missing_message_ids(self, message_ids: Iterable[str]) -> List[str]:
+        """返回不属于本对话的消息 ID"""
+        positions = self._index()
+        return [msg_id for msg_id in message_ids if msg_id not in positions]
+    
+    def set_minted(self, message_ids: Iterable[str], is_minted: bool = True) -> List[int]:
+        """批量设置铸造状态，返回受影响消息的位置（按对话顺序）"""
+        positions = self.positions_of(message_ids)
+        for pos in positions:
+            self.messages[pos].is_minted = is_minted
+        tree = self._merkle
+        if tree is not None:
+            for pos in positions:
+                if pos < len(tree):
+                    tree.update(pos, hash_leaf(self.messages[pos].model_dump(mode="json")))
+        return positions
+    
+    def _content_tree(self) -> MerkleTree:
+        tree = self._merkle
+        if tree is None or len(tree) > len(self.messages):
+            tree = self._merkle = MerkleTree()
+        for msg in self.messages[len(tree):]:
+            tree.append(hash_leaf(msg.model_dump(mode="json")))
+        return tree
+    
+    def content_root(self, start: int = 0, end: Optional[int] = None) -> bytes:
+        """消息内容的 Merkle 根（默认全部消息，也可指定 messages[start:end]）"""
+        tree = self._content_tree()
+        if start == 0 and (end is None or end >= len(tree)):
+            return tree.root()
+        return tree.range_root(start, end if end is not None else len(tree))
+    
+    def messages_root(self, positions: Iterable[int]) -> bytes:
+        """指定位置消息的 Merkle 根（按给定顺序）"""
+        leaves = self._content_tree().leaves
+        return merkle_root([leaves[pos] for pos in positions])
 
 
 class MintRecord(BaseModel):
@@ -114,12 +203,14 @@ class MintResponse(BaseModel):
 
 
 class ConversationListItem(BaseModel):
-    """对话列表项（不包含完整消息）"""
+    """对话列表项（不包含完整消息），即钱包对话摘要清单中的一项"""
     id: str
     title: str
     wallet_address: str
     message_count: int
     last_message_preview: Optional[str] = None
     has_minted_messages: bool = False
+    minted_count: int = 0
     created_at: datetime
     updated_at: datetime
+    ipfs_hash: Optional[str] = None  # 摘要对应的头部清单版本
@@ -7,7 +7,7 @@ from ..models.user_models import (
     WalletAuthRequest,
     WalletAuthResponse,
 )
-from ..services import get_wallet_service
+from ..services import get_storage_service, get_wallet_service
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -47,5 +47,13 @@ def verify_wallet():
         return jsonify({"detail": error or "Invalid signature"}), 401
 
     token = wallet_service.issue_access_token(normalized_address)
+
+    # 后台预热该钱包的对话列表和铸造记录，首次请求 /conversations 时无需等待 Pinata
+    if settings.PREFETCH_ON_LOGIN:
+        try:
+            get_storage_service().prefetch_wallet(normalized_address)
+        except Exception as e:
+            logger.warning(f"Failed to schedule prefetch for {normalized_address}: {e}")
+
     return jsonify(WalletAuthResponse(access_token=token).dict())
 
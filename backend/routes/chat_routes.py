@@ -1,10 +1,17 @@
 # Chat functionality
-from flask import Blueprint, request, jsonify
+import heapq
+import json
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 
 from ..config import settings
 from ..middleware.auth_middleware import verify_wallet_token
-from ..models.chat_models import ChatRequest, ChatResponse
+from ..models.chat_models import ChatRequest, ChatResponse, Conversation, ConversationListItem
 from ..services import get_llm_service, get_storage_service
+from ..services.storage_service import ConversationConflictError
+from ..utils.pagination import parse_page_args
 from ..utils.validation import ValidationError, ensure_messages
 from ..utils.logger import get_logger
 
@@ -71,25 +78,12 @@ def get_chat_response():
             import uuid
             conversation_id = str(uuid.uuid4())
         
-        # 添加用户消息
-        user_msg = storage_service.add_message_to_conversation(
-            conversation_id=conversation_id,
-            wallet_address=request.wallet_address,
-            role="user",
-            content=user_message_content,
-        )
-        
-        # 添加助手回复
-        assistant_msg = storage_service.add_message_to_conversation(
+        # 追加本轮问答（用户消息 + 助手回复），只上传一次快照
+        user_msg, assistant_msg, conversation = storage_service.append_exchange(
             conversation_id=conversation_id,
             wallet_address=request.wallet_address,
-            role="assistant",
-            content=response.get("reply", ""),
-        )
-        
-        # 获取更新后的对话
-        conversation = storage_service.get_conversation(
-            conversation_id, request.wallet_address
+            user_content=user_message_content,
+            assistant_content=response.get("reply", ""),
         )
         
         result = ChatResponse(
@@ -101,6 +95,8 @@ def get_chat_response():
             stored_at=assistant_msg.timestamp.isoformat() if assistant_msg.timestamp else None,
         )
         return jsonify(result.dict())
+    except ConversationConflictError as ce:
+        return jsonify({"detail": str(ce)}), 409
     except ValidationError as ve:
         return jsonify({"detail": str(ve)}), 422
     except ValueError as ve:
@@ -119,43 +115,57 @@ def get_conversations():
     获取用户的所有对话列表
     
     返回简化的对话列表，不包含完整消息内容
+    
+    查询参数（可选，游标分页）:
+    - limit: 每页数量（不指定时返回全部）
+    - before: 上一页响应中的 next_cursor，获取更旧的一页
+    - after: 上一页响应中的 prev_cursor，获取更新的一页
     """
     try:
+        limit, before, after = parse_page_args(
+            request.args.get("limit"),
+            request.args.get("before"),
+            request.args.get("after"),
+            settings.CONVERSATION_PAGE_SIZE_MAX,
+        )
+        
         storage_service = get_storage_service()
-        conversations = storage_service.get_user_conversations(
-            wallet_address=request.wallet_address
+        # 直接读取摘要清单，不加载消息内容
+        summaries = storage_service.get_conversation_summaries(
+            wallet_address=request.wallet_address,
+            limit=limit,
+            before=before,
+            after=after,
         )
         
         # 转换为列表项格式
         items = []
-        for convo in conversations:
-            # 统计铸造状态
-            minted_count = sum(1 for msg in convo.messages if msg.is_minted)
-            unminted_count = len(convo.messages) - minted_count
-            
-            # 获取最后一条消息预览
-            last_message = convo.messages[-1] if convo.messages else None
-            preview = last_message.content[:50] + "..." if last_message and len(last_message.content) > 50 else (last_message.content if last_message else None)
-            
+        for summary in summaries:
+            unminted_count = summary.message_count - summary.minted_count
             items.append({
-                "id": convo.id,
-                "title": convo.title,
-                "wallet_address": convo.wallet_address,
-                "message_count": len(convo.messages),
-                "last_message_preview": preview,
-                "has_minted_messages": minted_count > 0,
-                "minted_count": minted_count,
+                "id": summary.id,
+                "title": summary.title,
+                "wallet_address": summary.wallet_address,
+                "message_count": summary.message_count,
+                "last_message_preview": summary.last_message_preview,
+                "has_minted_messages": summary.has_minted_messages,
+                "minted_count": summary.minted_count,
                 "unminted_count": unminted_count,
                 "can_mint": unminted_count > 0,
-                "created_at": convo.created_at.isoformat(),
-                "updated_at": convo.updated_at.isoformat(),
+                "created_at": summary.created_at.isoformat(),
+                "updated_at": summary.updated_at.isoformat(),
             })
         
         return jsonify({
             "wallet_address": request.wallet_address,
             "total": len(items),
+            "partial": not summaries.complete,
+            "next_cursor": summaries.next_cursor,
+            "prev_cursor": summaries.prev_cursor,
             "conversations": items,
         })
+    except ValidationError as ve:
+        return jsonify({"detail": str(ve)}), 422
     except Exception as e:
         logger.error(f"Failed to get conversations: {e}")
         return jsonify(
@@ -241,42 +251,152 @@ def create_conversation():
         ), 500
 
 
+def _history_entries(convo: Conversation) -> Iterator[Dict]:
+    """逐条生成一个对话的扁平化历史消息"""
+    for msg in convo.messages:
+        yield {
+            "conversation_id": convo.id,
+            "conversation_title": convo.title,
+            "message_id": msg.id,
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
+            "is_minted": msg.is_minted,
+        }
+
+
+def _merge_history(streams: Iterable[Iterator[Dict]]) -> Iterator[Dict]:
+    """
+    按时间顺序逐条生成扁平化的历史消息
+    
+    每个对话内的消息本身已按时间排序，用堆做 k 路归并，无需构建完整列表再全局排序
+    """
+    return heapq.merge(
+        *streams,
+        key=lambda entry: entry["timestamp"] or datetime.min.isoformat(),
+    )
+
+
+def _iter_history(conversations: List[Conversation]) -> Iterator[Dict]:
+    """按时间顺序逐条生成已加载对话的扁平化历史消息"""
+    return _merge_history(_history_entries(convo) for convo in conversations)
+
+
+def _stream_history(
+    summaries: List[ConversationListItem],
+    wallet_address: str,
+    skipped: List[str],
+) -> Iterator[Dict]:
+    """
+    加载摘要页中的对话并按时间归并输出消息（与非流式返回的顺序一致）
+    
+    归并开始时会加载当前页的全部对话（受分页大小限制），但不构建扁平化的完整消息列表；
+    无法加载的对话跳过并记入 skipped
+    """
+    storage_service = get_storage_service()
+    
+    def entries(summary: ConversationListItem) -> Iterator[Dict]:
+        convo = storage_service.get_conversation(summary.id, wallet_address)
+        if convo is None:
+            logger.warning(f"⚠️ Skipping conversation {summary.id} in history stream: failed to load")
+            skipped.append(summary.id)
+            return
+        yield from _history_entries(convo)
+    
+    return _merge_history(entries(summary) for summary in summaries)
+
+
 @bp.route("/history", methods=["GET"])
 @verify_wallet_token
 def get_chat_history():
     """
     获取用户的所有历史对话记录（兼容旧接口）
     
-    返回扁平化的消息列表
+    返回扁平化的消息列表；分页参数同 /conversations，按对话分页
+    
+    查询参数 stream（可选，分块流式返回，内存占用不随消息总数增长）:
+    - ndjson: 每行一条消息（application/x-ndjson），分页与完整性信息放在 X-* 响应头
+    - json: 与普通响应结构相同的 JSON 对象，history 数组逐条输出，其余字段在数组之后输出
+    
+    流式返回时先从索引取当前页的对话摘要，再加载这些对话并逐条输出；
+    两种返回方式的消息都按时间全局排序
     """
     try:
-        storage_service = get_storage_service()
-        conversations = storage_service.get_user_conversations(
-            wallet_address=request.wallet_address
+        limit, before, after = parse_page_args(
+            request.args.get("limit"),
+            request.args.get("before"),
+            request.args.get("after"),
+            settings.CONVERSATION_PAGE_SIZE_MAX,
         )
+        stream = request.args.get("stream")
+        if stream not in (None, "ndjson", "json"):
+            raise ValidationError(f"stream 只支持 ndjson 或 json: {stream}")
         
-        # 扁平化所有消息
-        all_messages = []
-        for convo in conversations:
-            for msg in convo.messages:
-                all_messages.append({
-                    "conversation_id": convo.id,
-                    "conversation_title": convo.title,
-                    "message_id": msg.id,
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
-                    "is_minted": msg.is_minted,
-                })
+        storage_service = get_storage_service()
+        if stream:
+            # 流式返回只需当前页的摘要（来自本地索引，不含消息），对话在输出时逐个加载
+            summaries = storage_service.get_conversation_summaries(
+                wallet_address=request.wallet_address,
+                limit=limit,
+                before=before,
+                after=after,
+            )
+        
+        if stream == "ndjson":
+            def generate_ndjson() -> Iterator[str]:
+                for entry in _stream_history(summaries, request.wallet_address, []):
+                    yield json.dumps(entry, ensure_ascii=False) + "\n"
+            
+            headers = {
+                "X-Total-Messages": str(sum(summary.message_count for summary in summaries)),
+                "X-Partial": str(not summaries.complete).lower(),
+            }
+            if summaries.next_cursor:
+                headers["X-Next-Cursor"] = summaries.next_cursor
+            if summaries.prev_cursor:
+                headers["X-Prev-Cursor"] = summaries.prev_cursor
+            return Response(
+                stream_with_context(generate_ndjson()),
+                mimetype="application/x-ndjson",
+                headers=headers,
+            )
         
-        # 按时间排序
-        all_messages.sort(key=lambda x: x.get("timestamp", ""))
+        if stream == "json":
+            def generate_json() -> Iterator[str]:
+                # 先逐条输出 history 数组，最后输出元数据（此时才知道是否有对话加载失败）
+                skipped: List[str] = []
+                total = 0
+                yield '{"history": ['
+                for entry in _stream_history(summaries, request.wallet_address, skipped):
+                    yield ("," if total else "") + json.dumps(entry, ensure_ascii=False)
+                    total += 1
+                meta = {
+                    "wallet_address": request.wallet_address,
+                    "total_messages": total,
+                    "partial": not summaries.complete or bool(skipped),
+                    "next_cursor": summaries.next_cursor,
+                    "prev_cursor": summaries.prev_cursor,
+                }
+                yield "], " + json.dumps(meta, ensure_ascii=False)[1:]
+            
+            return Response(stream_with_context(generate_json()), mimetype="application/json")
         
-        return jsonify({
+        conversations = storage_service.get_user_conversations(
+            wallet_address=request.wallet_address,
+            limit=limit,
+            before=before,
+            after=after,
+        )
+        meta = {
             "wallet_address": request.wallet_address,
-            "total_messages": len(all_messages),
-            "history": all_messages,
-        })
+            "total_messages": sum(len(convo.messages) for convo in conversations),
+            "partial": not conversations.complete,
+            "next_cursor": conversations.next_cursor,
+            "prev_cursor": conversations.prev_cursor,
+        }
+        return jsonify({**meta, "history": list(_iter_history(conversations))})
+    except ValidationError as ve:
+        return jsonify({"detail": str(ve)}), 422
     except Exception as e:
         logger.error(f"Failed to get chat history: {e}")
         return jsonify(
@@ -299,6 +419,7 @@ def get_minted_records():
         return jsonify({
             "wallet_address": request.wallet_address,
             "total": len(records),
+            "partial": not records.complete,
             "minted_records": [
                 {
                     "id": record.id,
@@ -351,6 +472,48 @@ def unpin_content(ipfs_hash: str):
         ), 500
 
 
+@bp.route("/compact", methods=["POST"])
+@verify_wallet_token
+def compact_snapshots():
+    """
+    回收当前钱包被替代的对话快照（后台执行，进度见 /status 的 compaction 字段）
+    
+    请求体:
+    {
+        "dry_run": false,
+        "keep": 1
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        keep = data.get("keep")
+        if keep is not None and (not isinstance(keep, int) or isinstance(keep, bool) or keep < 1):
+            raise ValidationError(f"keep 必须是正整数: {keep!r}")
+        
+        storage_service = get_storage_service()
+        status = storage_service.compact_snapshots(
+            wallet_address=request.wallet_address,
+            keep=keep,
+            dry_run=bool(data.get("dry_run", False)),
+        )
+        
+        if status.get("state") == "unavailable":
+            return jsonify({"detail": status["detail"]}), 400
+        
+        return jsonify({
+            "wallet_address": request.wallet_address,
+            **status,
+        }), 202
+    except ValidationError as ve:
+        return jsonify({"detail": str(ve)}), 422
+    except Exception as e:
+        logger.error(f"Failed to start snapshot compaction: {e}")
+        return jsonify(
+            {"detail": f"Failed to start snapshot compaction: {str(e)}"}
+        ), 500
+
+
 @bp.route("/status", methods=["GET"])
 @verify_wallet_token
 def get_storage_status():
@@ -70,25 +70,19 @@ def mint_conversation_nft():
             message_ids = [msg.id for msg in conversation.messages if not msg.is_minted]
         else:
             # 验证消息 ID 存在
-            valid_message_ids = {msg.id for msg in conversation.messages}
-            invalid_ids = set(message_ids) - valid_message_ids
+            invalid_ids = set(conversation.missing_message_ids(message_ids))
             if invalid_ids:
                 return jsonify({
                     "detail": f"Invalid message IDs: {list(invalid_ids)}"
                 }), 400
             
             # 自动过滤已铸造的消息
-            already_minted = [
-                msg.id for msg in conversation.messages 
-                if msg.id in message_ids and msg.is_minted
-            ]
+            selected = conversation.select_messages(message_ids)
+            already_minted = [msg.id for msg in selected if msg.is_minted]
             if already_minted:
                 logger.info(f"Filtering out already minted messages: {already_minted}")
             
-            message_ids = [
-                msg_id for msg_id in message_ids 
-                if msg_id not in already_minted
-            ]
+            message_ids = [msg.id for msg in selected if not msg.is_minted]
         
         # 检查是否还有未铸造的消息
         if not message_ids:
@@ -163,9 +157,7 @@ def get_mint_record(mint_id: str):
     """
     try:
         storage_service = get_storage_service()
-        records = storage_service.get_mint_records(request.wallet_address)
-        
-        record = next((r for r in records if r.id == mint_id), None)
+        record = storage_service.get_mint_record(mint_id, request.wallet_address)
         if not record:
             return jsonify({"detail": "Mint record not found"}), 404
         
@@ -211,9 +203,7 @@ def list_mint_on_market(mint_id: str):
     
     try:
         storage_service = get_storage_service()
-        records = storage_service.get_mint_records(request.wallet_address)
-        
-        record = next((r for r in records if r.id == mint_id), None)
+        record = storage_service.get_mint_record(mint_id, request.wallet_address)
         if not record:
             return jsonify({"detail": "Mint record not found"}), 404
         
@@ -266,9 +256,7 @@ def unlist_from_market(mint_id: str):
     """
     try:
         storage_service = get_storage_service()
-        records = storage_service.get_mint_records(request.wallet_address)
-        
-        record = next((r for r in records if r.id == mint_id), None)
+        record = storage_service.get_mint_record(mint_id, request.wallet_address)
         if not record:
             return jsonify({"detail": "Mint record not found"}), 404
         
@@ -0,0 +1,139 @@
+# Persistent content-addressed on-disk cache for IPFS payloads
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# CID 只包含 base58 / base32 字符，拒绝其他输入以避免路径穿越
+_CID_PATTERN = re.compile(r"^[A-Za-z0-9]{8,128}$")
+
+
+class BlobCache:
+    """
+    IPFS 内容磁盘缓存
+
+    内容按 CID 寻址且不可变，因此可以跨进程重启长期复用：
+    - 目录按 CID 末尾字符两级分片：<root>/<cid[-2:]>/<cid[-4:-2]>/<cid>
+    - 写入先落临时文件再以硬链接原子发布（目标已存在时失败），并发写入同一 CID 只计一次
+    - 内存中按访问顺序维护 LRU 索引（启动时按 mtime 恢复），总大小超过 max_bytes 时
+      从最久未访问的文件开始淘汰，无需重新扫描目录
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # cid -> 字节数，按访问时间从旧到新
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+        logger.info(f"💾 Blob cache at {self.root} ({len(self._entries)} files, {self._bytes} bytes)")
+
+    def _scan(self) -> None:
+        """启动时按 mtime 恢复 LRU 顺序并统计已有缓存文件的总大小"""
+        entries = []
+        for path in self.root.glob("*/*/*"):
+            if path.is_file() and not path.name.startswith("."):
+                stat = path.stat()
+                entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, cid, size in sorted(entries):
+            self._entries[cid] = size
+            self._bytes += size
+
+    def _touch(self, cid: str, size: int) -> None:
+        """标记最近访问（调用方持有锁）；其他进程写入的文件在首次访问时加入索引"""
+        if cid in self._entries:
+            self._entries.move_to_end(cid)
+        else:
+            self._entries[cid] = size
+            self._bytes += size
+
+    def _path(self, cid: str) -> Optional[Path]:
+        if not _CID_PATTERN.match(cid):
+            return None
+        return self.root / cid[-2:] / cid[-4:-2] / cid
+
+    def get(self, cid: str) -> Optional[bytes]:
+        """读取缓存内容，未命中返回 None"""
+        path = self._path(cid)
+        try:
+            content = path.read_bytes()
+            # 更新 mtime，重启后按其恢复 LRU 顺序
+            os.utime(path)
+        except (OSError, TypeError, AttributeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._touch(cid, len(content))
+        return content
+
+    def put(self, cid: str, content: bytes) -> None:
+        """写入缓存（同一 CID 内容相同，已存在时跳过）"""
+        path = self._path(cid)
+        if path is None or path.exists():
+            return
+
+        tmp_path = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            # link 在目标已存在时失败：并发写入同一 CID 时只有一个写入者计入大小
+            os.link(tmp_path, path)
+        except FileExistsError:
+            return
+        except OSError as e:
+            logger.warning(f"⚠️ Failed to write blob cache for {cid}: {e}")
+            return
+        finally:
+            if tmp_path:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+
+        with self._lock:
+            self._touch(cid, len(content))
+            if self.max_bytes and self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """从最久未访问的文件开始删除，直到总大小回到预算的 90% 以内（调用方持有锁）"""
+        target = int(self.max_bytes * 0.9)
+        while self._entries and self._bytes > target:
+            cid, size = self._entries.popitem(last=False)
+            try:
+                self._path(cid).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"⚠️ Failed to evict blob {cid}: {e}")
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "path": str(self.root),
+                "files": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
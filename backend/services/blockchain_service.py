@@ -7,6 +7,7 @@ from eth_account import Account
 
 from ..config import settings
 from ..utils.crypto_utils import normalize_address
+from ..utils.http_client import get_http_client
 from ..utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -342,7 +343,13 @@ class BlockchainService:
             return
         
         try:
-            self.w3 = Web3(Web3.HTTPProvider(settings.WEB3_RPC_URL))
+            # 复用共享的连接池 session，RPC 请求保持 keep-alive
+            http = get_http_client()
+            self.w3 = Web3(Web3.HTTPProvider(
+                settings.WEB3_RPC_URL,
+                request_kwargs={"timeout": http.timeout},
+                session=http.session,
+            ))
             if not self.w3.is_connected():
                 logger.warning("⚠️ Cannot connect to blockchain node, using mock mode")
                 self.mock_mode = True
@@ -0,0 +1,173 @@
+# Hedged IPFS gateway reads ranked by observed latency
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional
+
+from ..utils.cid import compute_cid, is_cidv0
+from ..utils.http_client import HttpClient, get_http_client
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class GatewayStats:
+    """单个网关的延迟 / 错误记分板（EWMA）"""
+
+    def __init__(self, url: str, window: int = 64):
+        self.url = url
+        self.ewma_latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.samples: Deque[float] = deque(maxlen=window)
+
+    def score(self, error_penalty_ms: float) -> float:
+        """排序得分，越小越优；未测量过的网关按 0 延迟处理，保证会被探测到"""
+        latency = self.ewma_latency_ms if self.ewma_latency_ms is not None else 0.0
+        return latency + self.error_rate * error_penalty_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "url": self.url,
+            "ewma_latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class GatewayClient:
+    """
+    IPFS 网关客户端
+
+    - 按 EWMA 延迟与错误率对网关排序，优先请求最快的网关
+    - 领先请求在“历史延迟分位数”时间内未返回时，对下一个网关发起对冲请求
+    - 任一网关成功返回即采用其结果；开启 verify_content 时，内容与请求的 CIDv0 不一致视为该网关失败
+    """
+
+    def __init__(
+        self,
+        gateways: List[str],
+        timeout: float = 15.0,
+        hedge_percentile: float = 0.9,
+        min_hedge_delay_ms: float = 100.0,
+        max_hedge_delay_ms: float = 3000.0,
+        alpha: float = 0.2,
+        max_workers: int = 16,
+        http: Optional[HttpClient] = None,
+        verify_content: bool = True,
+    ):
+        self.gateways = [url if url.endswith("/") else f"{url}/" for url in gateways]
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay_ms = min_hedge_delay_ms
+        self.max_hedge_delay_ms = max_hedge_delay_ms
+        self.alpha = alpha
+        self.http = http or get_http_client()
+        self.verify_content = verify_content
+        # 错误率折算的延迟惩罚：持续失败的网关排在正常网关之后
+        self.error_penalty_ms = timeout * 1000
+
+        self._stats = {url: GatewayStats(url) for url in self.gateways}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ipfs-gateway")
+
+    # ============ 记分板 ============
+
+    def ranked_gateways(self) -> List[str]:
+        """按得分排序后的网关列表"""
+        with self._lock:
+            return sorted(self.gateways, key=lambda url: self._stats[url].score(self.error_penalty_ms))
+
+    def hedge_delay(self, gateway: str) -> float:
+        """对冲延迟（秒）：领先网关历史延迟的分位数，限制在 [min, max] 区间"""
+        with self._lock:
+            samples = sorted(self._stats[gateway].samples)
+        if len(samples) < 5:
+            delay_ms = self.max_hedge_delay_ms
+        else:
+            index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile))
+            delay_ms = samples[index]
+        return max(self.min_hedge_delay_ms, min(self.max_hedge_delay_ms, delay_ms)) / 1000
+
+    def _record(self, gateway: str, latency_ms: float, success: bool) -> None:
+        with self._lock:
+            stats = self._stats[gateway]
+            stats.requests += 1
+            stats.error_rate = (1 - self.alpha) * stats.error_rate + self.alpha * (0.0 if success else 1.0)
+            if success:
+                stats.samples.append(latency_ms)
+                if stats.ewma_latency_ms is None:
+                    stats.ewma_latency_ms = latency_ms
+                else:
+                    stats.ewma_latency_ms = (1 - self.alpha) * stats.ewma_latency_ms + self.alpha * latency_ms
+            else:
+                stats.failures += 1
+
+    def stats(self) -> List[Dict]:
+        """各网关的记分板快照（按当前排序）"""
+        ranked = self.ranked_gateways()
+        with self._lock:
+            return [self._stats[url].to_dict() for url in ranked]
+
+    # ============ 请求 ============
+
+    def _get(self, gateway: str, ipfs_hash: str) -> Optional[bytes]:
+        """向单个网关请求内容，并记录延迟与结果"""
+        start = time.monotonic()
+        try:
+            response = self.http.get(f"{gateway}{ipfs_hash}", timeout=self.timeout)
+            latency_ms = (time.monotonic() - start) * 1000
+            if response.status_code == 200:
+                content = response.content
+                if self.verify_content and is_cidv0(ipfs_hash) and compute_cid(content) != ipfs_hash:
+                    logger.warning(f"⚠️ Gateway {gateway} returned content not matching {ipfs_hash}")
+                else:
+                    self._record(gateway, latency_ms, True)
+                    return content
+            self._record(gateway, latency_ms, False)
+        except Exception:
+            self._record(gateway, (time.monotonic() - start) * 1000, False)
+        return None
+
+    def fetch(self, ipfs_hash: str) -> Optional[bytes]:
+        """
+        获取 IPFS 内容的原始字节
+
+        依次按排名启动请求：上一个请求失败或超过对冲延迟仍未返回时启动下一个，
+        返回最先成功的结果；所有网关都失败时返回 None。
+        """
+        queue = self.ranked_gateways()
+        if not queue:
+            return None
+        preferred = queue[0]
+        deadline = time.monotonic() + self.timeout
+        in_flight = {}
+
+        def launch_next() -> None:
+            gateway = queue.pop(0)
+            in_flight[self._executor.submit(self._get, gateway, ipfs_hash)] = gateway
+
+        launch_next()
+        while in_flight:
+            leader = next(iter(in_flight.values()))
+            wait_for = self.hedge_delay(leader) if queue else deadline - time.monotonic()
+            done, _ = wait(list(in_flight), timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                gateway = in_flight.pop(future)
+                content = future.result()
+                if content is not None:
+                    if gateway != preferred:
+                        logger.debug(f"Gateway {gateway} served {ipfs_hash} (hedged)")
+                    return content
+
+            if time.monotonic() >= deadline:
+                break
+            if queue:
+                # 领先请求超过对冲延迟仍未返回，或已失败：启动下一个网关
+                launch_next()
+
+        return None
@@ -0,0 +1,455 @@
+# Local SQLite index of pinned content (wallet -> conversation/mint -> latest CID)
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def sqlite_path_from_url(database_url: str) -> str:
+    """将 sqlite:///./file.db 形式的 DATABASE_URL 转换为文件路径"""
+    if database_url.startswith("sqlite:///"):
+        return database_url[len("sqlite:///"):] or ":memory:"
+    if database_url.startswith("sqlite://"):
+        return database_url[len("sqlite://"):] or ":memory:"
+    return database_url
+
+
+def utc_timestamp(moment: Optional[datetime] = None) -> str:
+    """返回与 Pinata date_pinned 同格式的 UTC 时间戳（毫秒精度），便于直接按字符串比较"""
+    moment = (moment or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+# 对话相关的表以 (wallet_address, conversation_id) 为主键：conversation_id 由客户端提供，不同钱包可能重复
+_CONVERSATION_TABLES = {
+    "conversation_pins": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            wallet_address TEXT NOT NULL,
+            conversation_id TEXT NOT NULL,
+            ipfs_hash TEXT NOT NULL,
+            pinned_at TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (wallet_address, conversation_id)
+        )
+    """,
+    "conversation_summaries": """
+        CREATE TABLE IF NOT EXISTS {name} (
+            wallet_address TEXT NOT NULL,
+            conversation_id TEXT NOT NULL,
+            ipfs_hash TEXT,
+            title TEXT NOT NULL,
+            message_count INTEGER NOT NULL,
+            minted_count INTEGER NOT NULL,
+            last_message_preview TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (wallet_address, conversation_id)
+        )
+    """,
+}
+
+
+class PinIndex:
+    """
+    Pin 本地索引
+
+    记录每个对话 / 铸造记录最新版本的 IPFS 哈希，读路径直接查本地索引，
+    Pinata pinList 仅用于对账（由 PinataSync 增量同步写入）。
+
+    表结构:
+    - conversation_pins: (wallet_address, conversation_id) -> (ipfs_hash, pinned_at, version)，
+      version 为头部清单的版本号，写入时按期望版本做乐观并发检查
+    - mint_pins: mint_id -> (wallet_address, conversation_id, ipfs_hash, pinned_at, listing_id, record_json)，
+      record_json 缓存该版本铸造记录的内容，按 mint_id / conversation_id 查询时无需访问网络
+    - synced_wallets: (wallet_address, data_type) -> (synced_at, last_pinned_at)，
+      记录与 Pinata 的对账时间和增量同步游标（已同步到的最新 date_pinned）
+    - conversation_summaries: (wallet_address, conversation_id) -> 列表页所需的摘要（标题、消息数、铸造数、预览），
+      ipfs_hash 记录摘要对应的头部清单版本，与 conversation_pins 不一致时说明摘要已过期
+    """
+
+    def __init__(self, database_url: str):
+        self.path = sqlite_path_from_url(database_url)
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+        logger.info(f"🗂️ Pin index ready at {self.path}")
+
+    def _create_tables(self) -> None:
+        with self._lock, self._conn:
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS mint_pins (
+                    mint_id TEXT PRIMARY KEY,
+                    wallet_address TEXT NOT NULL,
+                    conversation_id TEXT,
+                    ipfs_hash TEXT NOT NULL,
+                    pinned_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_mint_pins_wallet
+                    ON mint_pins (wallet_address, pinned_at);
+                CREATE INDEX IF NOT EXISTS idx_mint_pins_conversation
+                    ON mint_pins (wallet_address, conversation_id);
+
+                CREATE TABLE IF NOT EXISTS synced_wallets (
+                    wallet_address TEXT NOT NULL,
+                    data_type TEXT NOT NULL,
+                    synced_at REAL NOT NULL,
+                    last_pinned_at TEXT,
+                    PRIMARY KEY (wallet_address, data_type)
+                );
+                """
+            )
+            for name, ddl in _CONVERSATION_TABLES.items():
+                self._conn.execute(ddl.format(name=name))
+            # 旧版数据库补充新增的列
+            for table, column, column_type in (
+                ("mint_pins", "listing_id", "INTEGER"),
+                ("mint_pins", "record_json", "TEXT"),
+                ("conversation_pins", "version", "INTEGER NOT NULL DEFAULT 0"),
+            ):
+                columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            self._conn.execute("DROP INDEX IF EXISTS idx_mint_pins_listing")
+            for name in _CONVERSATION_TABLES:
+                self._migrate_conversation_key(name)
+            self._conn.executescript(
+                """
+                DROP INDEX IF EXISTS idx_conversation_pins_wallet;
+                CREATE INDEX IF NOT EXISTS idx_conversation_pins_page
+                    ON conversation_pins (wallet_address, pinned_at, conversation_id);
+                CREATE INDEX IF NOT EXISTS idx_conversation_summaries_wallet
+                    ON conversation_summaries (wallet_address, updated_at);
+                """
+            )
+
+    def _migrate_conversation_key(self, name: str) -> None:
+        """旧版数据库的对话表只以 conversation_id 为主键：按新结构重建并复制数据"""
+        table_info = list(self._conn.execute(f"PRAGMA table_info({name})"))
+        primary_key = [row[1] for row in sorted(table_info, key=lambda row: row[5]) if row[5]]
+        if primary_key != ["conversation_id"]:
+            return
+
+        columns = ", ".join(row[1] for row in table_info)
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.execute(f"ALTER TABLE {name} RENAME TO {name}_legacy")
+            self._conn.execute(_CONVERSATION_TABLES[name].format(name=name))
+            self._conn.execute(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {name}_legacy")
+            self._conn.execute(f"DROP TABLE {name}_legacy")
+            self._conn.commit()
+        except Exception:
+            self._conn.rollback()
+            raise
+        logger.info(f"🗂️ Migrated {name} to (wallet_address, conversation_id) keys")
+
+    # ============ 对话 ============
+
+    def record_conversation(
+        self,
+        wallet_address: str,
+        conversation_id: str,
+        ipfs_hash: str,
+        pinned_at: Optional[str] = None,
+        version: int = 0,
+    ) -> None:
+        """记录对话的最新 CID（仅当版本号和 pinned_at 都不早于已有记录时覆盖）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO conversation_pins (conversation_id, wallet_address, ipfs_hash, pinned_at, version)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(wallet_address, conversation_id) DO UPDATE SET
+                    ipfs_hash = excluded.ipfs_hash,
+                    pinned_at = excluded.pinned_at,
+                    version = excluded.version
+                WHERE excluded.pinned_at >= conversation_pins.pinned_at
+                    AND excluded.version >= conversation_pins.version
+                """,
+                (conversation_id, wallet_address.lower(), ipfs_hash, pinned_at or utc_timestamp(), version),
+            )
+
+    @staticmethod
+    def _superseded(row: Optional[Tuple[int, str]], expected_version: int, expected_hash: Optional[str]) -> bool:
+        """索引中的版本是否比调用方读取时更新（版本号更大，或同版本但 CID 不同）"""
+        return bool(row) and (row[0] > expected_version or (row[0] == expected_version and row[1] != expected_hash))
+
+    def is_current(
+        self,
+        wallet_address: str,
+        conversation_id: str,
+        expected_version: int,
+        expected_hash: Optional[str],
+    ) -> bool:
+        """调用方持有的对话版本是否仍是索引中的最新版本（保存前的快速检查）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT version, ipfs_hash FROM conversation_pins WHERE wallet_address = ? AND conversation_id = ?",
+                (wallet_address.lower(), conversation_id),
+            ).fetchone()
+        return not self._superseded(row, expected_version, expected_hash)
+
+    def commit_conversation(
+        self,
+        wallet_address: str,
+        conversation_id: str,
+        ipfs_hash: str,
+        version: int,
+        expected_version: int,
+        expected_hash: Optional[str],
+    ) -> bool:
+        """
+        乐观并发提交：仅当索引中的版本仍是调用方读取时的版本（expected_version / expected_hash）时写入新版本
+
+        在 BEGIN IMMEDIATE 事务中完成检查和写入，共享同一数据库文件的多个进程之间同样有效。
+        返回 False 表示已有更新的版本（需要重新加载后重试）。
+        """
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                row = self._conn.execute(
+                    "SELECT version, ipfs_hash FROM conversation_pins WHERE wallet_address = ? AND conversation_id = ?",
+                    (wallet_address.lower(), conversation_id),
+                ).fetchone()
+                if self._superseded(row, expected_version, expected_hash):
+                    self._conn.rollback()
+                    return False
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO conversation_pins (conversation_id, wallet_address, ipfs_hash, pinned_at, version)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (conversation_id, wallet_address.lower(), ipfs_hash, utc_timestamp(), version),
+                )
+                self._conn.commit()
+                return True
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def get_conversation_hash(self, wallet_address: str, conversation_id: str) -> Optional[str]:
+        """获取对话最新版本的 CID"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ipfs_hash FROM conversation_pins WHERE conversation_id = ? AND wallet_address = ?",
+                (conversation_id, wallet_address.lower()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def list_conversation_hashes(self, wallet_address: str) -> Dict[str, str]:
+        """获取钱包下所有对话的最新 CID（conversation_id -> ipfs_hash，按时间倒序）"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT conversation_id, ipfs_hash FROM conversation_pins "
+                "WHERE wallet_address = ? ORDER BY pinned_at DESC",
+                (wallet_address.lower(),),
+            ).fetchall()
+        return {conversation_id: ipfs_hash for conversation_id, ipfs_hash in rows}
+
+    def page_conversation_hashes(
+        self,
+        wallet_address: str,
+        limit: int,
+        before: Optional[Tuple[str, str]] = None,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> List[Tuple[str, str, str]]:
+        """
+        按 (pinned_at, conversation_id) 倒序分页，返回最多 limit + 1 行 (conversation_id, ipfs_hash, pinned_at)
+
+        多出的一行仅用于判断该方向是否还有更多数据。
+        - before: 只返回排在游标之后（更旧）的对话
+        - after: 只返回排在游标之前（更新）的对话，取最接近游标的 limit 条
+        """
+        wallet_key = wallet_address.lower()
+        if after:
+            sql = (
+                "SELECT conversation_id, ipfs_hash, pinned_at FROM conversation_pins "
+                "WHERE wallet_address = ? AND (pinned_at, conversation_id) > (?, ?) "
+                "ORDER BY pinned_at ASC, conversation_id ASC LIMIT ?"
+            )
+            params = (wallet_key, after[0], after[1], limit + 1)
+        elif before:
+            sql = (
+                "SELECT conversation_id, ipfs_hash, pinned_at FROM conversation_pins "
+                "WHERE wallet_address = ? AND (pinned_at, conversation_id) < (?, ?) "
+                "ORDER BY pinned_at DESC, conversation_id DESC LIMIT ?"
+            )
+            params = (wallet_key, before[0], before[1], limit + 1)
+        else:
+            sql = (
+                "SELECT conversation_id, ipfs_hash, pinned_at FROM conversation_pins "
+                "WHERE wallet_address = ? ORDER BY pinned_at DESC, conversation_id DESC LIMIT ?"
+            )
+            params = (wallet_key, limit + 1)
+
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ============ 对话摘要 ============
+
+    _SUMMARY_COLUMNS = (
+        "conversation_id", "wallet_address", "ipfs_hash", "title", "message_count",
+        "minted_count", "last_message_preview", "created_at", "updated_at",
+    )
+
+    def record_summary(self, summary: Dict) -> None:
+        """写入 / 覆盖对话摘要（字段见 _SUMMARY_COLUMNS，时间为 ISO 字符串）"""
+        values = [summary.get(column) for column in self._SUMMARY_COLUMNS]
+        values[1] = values[1].lower()
+        placeholders = ", ".join("?" for _ in self._SUMMARY_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO conversation_summaries ({', '.join(self._SUMMARY_COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                values,
+            )
+
+    def list_summaries(self, wallet_address: str, conversation_ids: Optional[List[str]] = None) -> List[Dict]:
+        """获取钱包下的对话摘要（按更新时间倒序）；指定 conversation_ids 时只返回这些对话"""
+        sql = f"SELECT {', '.join(self._SUMMARY_COLUMNS)} FROM conversation_summaries WHERE wallet_address = ?"
+        params: List = [wallet_address.lower()]
+        if conversation_ids is not None:
+            if not conversation_ids:
+                return []
+            sql += f" AND conversation_id IN ({', '.join('?' for _ in conversation_ids)})"
+            params.extend(conversation_ids)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY updated_at DESC", params).fetchall()
+        return [dict(zip(self._SUMMARY_COLUMNS, row)) for row in rows]
+
+    # ============ 铸造记录 ============
+
+    _MINT_COLUMNS = ("mint_id", "wallet_address", "conversation_id", "ipfs_hash", "pinned_at", "listing_id", "record_json")
+
+    def record_mint(
+        self,
+        wallet_address: str,
+        mint_id: str,
+        conversation_id: Optional[str],
+        ipfs_hash: str,
+        pinned_at: Optional[str] = None,
+        listing_id: Optional[int] = None,
+        record: Optional[Dict] = None,
+    ) -> None:
+        """
+        记录铸造记录的最新 CID（record 为该版本的内容，未知时为 None）
+
+        同一 CID 重复写入（如对账同步）时保留已缓存的内容；CID 变化时内容随之替换
+        """
+        record_json = json.dumps(record, default=str) if record is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO mint_pins (mint_id, wallet_address, conversation_id, ipfs_hash, pinned_at, listing_id, record_json)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(mint_id) DO UPDATE SET
+                    wallet_address = excluded.wallet_address,
+                    conversation_id = excluded.conversation_id,
+                    pinned_at = excluded.pinned_at,
+                    listing_id = CASE WHEN excluded.ipfs_hash = mint_pins.ipfs_hash
+                        THEN COALESCE(excluded.listing_id, mint_pins.listing_id) ELSE excluded.listing_id END,
+                    record_json = CASE WHEN excluded.ipfs_hash = mint_pins.ipfs_hash
+                        THEN COALESCE(excluded.record_json, mint_pins.record_json) ELSE excluded.record_json END,
+                    ipfs_hash = excluded.ipfs_hash
+                WHERE excluded.pinned_at >= mint_pins.pinned_at
+                """,
+                (
+                    mint_id, wallet_address.lower(), conversation_id, ipfs_hash,
+                    pinned_at or utc_timestamp(), listing_id, record_json,
+                ),
+            )
+
+    def cache_mint_record(self, mint_id: str, ipfs_hash: str, record: Dict) -> None:
+        """回填从网关读取到的铸造记录内容（仅当 CID 仍是最新版本时）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE mint_pins SET record_json = ?, listing_id = ? WHERE mint_id = ? AND ipfs_hash = ?",
+                (json.dumps(record, default=str), record.get("listing_id"), mint_id, ipfs_hash),
+            )
+
+    def _mint_rows(self, where: str, params: Tuple) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self._MINT_COLUMNS)} FROM mint_pins WHERE {where} ORDER BY pinned_at DESC",
+                params,
+            ).fetchall()
+        results = []
+        for row in rows:
+            entry = dict(zip(self._MINT_COLUMNS, row))
+            record_json = entry.pop("record_json")
+            entry["record"] = json.loads(record_json) if record_json else None
+            results.append(entry)
+        return results
+
+    def get_mint(self, mint_id: str) -> Optional[Dict]:
+        """按 mint_id 查询（返回索引行，record 为缓存的内容或 None）"""
+        rows = self._mint_rows("mint_id = ?", (mint_id,))
+        return rows[0] if rows else None
+
+    def find_mints_by_conversation(self, wallet_address: str, conversation_id: str) -> List[Dict]:
+        """按对话查询铸造记录（按固定时间倒序）"""
+        return self._mint_rows("wallet_address = ? AND conversation_id = ?", (wallet_address.lower(), conversation_id))
+
+    def list_mints(self, wallet_address: str) -> List[Dict]:
+        """获取钱包下所有铸造记录的索引行（按固定时间倒序）"""
+        return self._mint_rows("wallet_address = ?", (wallet_address.lower(),))
+
+    # ============ 对账状态 ============
+
+    def get_sync_state(self, wallet_address: str, data_type: str) -> Optional[Tuple[float, Optional[str]]]:
+        """获取同步状态 (synced_at 时间戳, last_pinned_at 游标)；从未同步返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT synced_at, last_pinned_at FROM synced_wallets WHERE wallet_address = ? AND data_type = ?",
+                (wallet_address.lower(), data_type),
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def needs_sync(self, wallet_address: str, data_type: str, max_age_seconds: float) -> bool:
+        """从未同步过，或距上次同步超过 max_age_seconds 时需要同步（max_age_seconds<=0 表示只同步一次）"""
+        state = self.get_sync_state(wallet_address, data_type)
+        if state is None:
+            return True
+        return max_age_seconds > 0 and time.time() - state[0] > max_age_seconds
+
+    def mark_synced(self, wallet_address: str, data_type: str, last_pinned_at: Optional[str] = None) -> None:
+        """记录一次同步完成，并推进游标（游标只前进不后退）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO synced_wallets (wallet_address, data_type, synced_at, last_pinned_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(wallet_address, data_type) DO UPDATE SET
+                    synced_at = excluded.synced_at,
+                    last_pinned_at = CASE
+                        WHEN synced_wallets.last_pinned_at IS NULL THEN excluded.last_pinned_at
+                        WHEN excluded.last_pinned_at IS NULL THEN synced_wallets.last_pinned_at
+                        ELSE MAX(synced_wallets.last_pinned_at, excluded.last_pinned_at)
+                    END
+                """,
+                (wallet_address.lower(), data_type, time.time(), last_pinned_at),
+            )
+
+    def stats(self) -> Dict:
+        """索引统计信息"""
+        with self._lock:
+            conversations = self._conn.execute("SELECT COUNT(*) FROM conversation_pins").fetchone()[0]
+            mints = self._conn.execute("SELECT COUNT(*) FROM mint_pins").fetchone()[0]
+            summaries = self._conn.execute("SELECT COUNT(*) FROM conversation_summaries").fetchone()[0]
+        return {
+            "path": self.path,
+            "conversations": conversations,
+            "mint_records": mints,
+            "conversation_summaries": summaries,
+        }
@@ -0,0 +1,112 @@
+# Incremental, cursor-based synchronisation of Pinata pins into the local pin index
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+from .pin_index import PinIndex
+
+logger = get_logger(__name__)
+
+# 各数据类型在 keyvalues 中的主键
+ID_KEYS = {
+    "conversation": "conversation_id",
+    "mint_record": "mint_id",
+}
+
+
+def _version(keyvalues: Dict) -> int:
+    version = keyvalues.get("version")
+    return int(version) if version and str(version).isdigit() else 0
+
+
+def pin_recency(pin: Dict) -> Tuple[int, str]:
+    """pin 的新旧顺序：先比较 keyvalues 中的版本号，再比较 date_pinned"""
+    keyvalues = pin.get("metadata", {}).get("keyvalues", {}) or {}
+    return _version(keyvalues), pin.get("date_pinned") or ""
+
+
+class PinataSync:
+    """
+    Pinata pinList 增量同步
+
+    - 使用 pageLimit / pageOffset 分页遍历，不再受单次 1000 条的限制
+    - 记录每个钱包每类数据已同步到的最新 date_pinned，后续同步通过 pinStart 只拉取新增的 pin
+    - 同步结果写入 PinIndex，供对话和铸造记录查询使用
+    """
+
+    def __init__(
+        self,
+        index: PinIndex,
+        query_pins: Callable[..., List[Dict]],
+        page_size: int = 1000,
+        max_pages: int = 100,
+    ):
+        self.index = index
+        self.query_pins = query_pins
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+    def sync(self, wallet_address: str, data_type: str) -> int:
+        """
+        同步一个钱包某类数据的 pin 到本地索引（从上次同步的游标开始，首次同步时从头遍历）
+
+        Returns:
+            本次写入索引的条目数
+
+        Raises:
+            Pinata 请求失败时抛出异常，游标不会推进
+        """
+        id_key = ID_KEYS[data_type]
+        state = self.index.get_sync_state(wallet_address, data_type)
+        cursor: Optional[str] = None if state is None else state[1]
+
+        latest: Dict[str, Dict] = {}
+        newest = cursor
+        offset = 0
+        for _ in range(self.max_pages):
+            rows = self.query_pins(
+                wallet_address=wallet_address,
+                data_type=data_type,
+                limit=self.page_size,
+                page_offset=offset,
+                pin_start=cursor,
+                raise_on_error=True,
+            )
+            for pin in rows:
+                keyvalues = pin.get("metadata", {}).get("keyvalues", {}) or {}
+                item_id = keyvalues.get(id_key)
+                date_pinned = pin.get("date_pinned") or ""
+                if not item_id or not pin.get("ipfs_pin_hash"):
+                    continue
+                # 异步上传时固定顺序可能与写入顺序不同，对话优先按版本号取最新
+                if item_id not in latest or pin_recency(pin) > pin_recency(latest[item_id]):
+                    latest[item_id] = pin
+                if date_pinned and (newest is None or date_pinned > newest):
+                    newest = date_pinned
+
+            if len(rows) < self.page_size:
+                break
+            offset += len(rows)
+        else:
+            logger.warning(f"⚠️ Pin sync for {wallet_address[:10]}... stopped after {self.max_pages} pages")
+
+        for item_id, pin in latest.items():
+            keyvalues = pin.get("metadata", {}).get("keyvalues", {}) or {}
+            if data_type == "conversation":
+                self.index.record_conversation(
+                    wallet_address, item_id, pin["ipfs_pin_hash"], pin.get("date_pinned"),
+                    version=_version(keyvalues),
+                )
+            else:
+                listing_id = keyvalues.get("listing_id")
+                self.index.record_mint(
+                    wallet_address, item_id, keyvalues.get("conversation_id"),
+                    pin["ipfs_pin_hash"], pin.get("date_pinned"),
+                    listing_id=int(listing_id) if listing_id and str(listing_id).isdigit() else None,
+                )
+
+        self.index.mark_synced(wallet_address, data_type, newest)
+        logger.info(
+            f"🔄 Synced {len(latest)} {data_type} pins for {wallet_address[:10]}... "
+            f"({'full' if cursor is None else f'since {cursor}'})"
+        )
+        return len(latest)
@@ -0,0 +1,97 @@
+# Bounded background prefetch of wallet data after login
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Set
+
+from ..utils.cache import BoundedCache
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WalletPrefetcher:
+    """
+    登录后预热钱包数据
+
+    - 有界队列：队列已满时直接丢弃新的预热请求，登录高峰不会放大为对 Pinata 的请求洪峰
+    - 同一钱包已在队列中 / 正在预热，或在 cooldown_seconds 内预热过时不重复入队
+    - 固定数量的后台线程依次调用 load(wallet_address)，失败只记录日志
+    """
+
+    def __init__(
+        self,
+        load: Callable[[str], None],
+        queue_size: int = 32,
+        workers: int = 2,
+        cooldown_seconds: float = 300,
+    ):
+        self.load = load
+        self.workers = max(1, workers)
+        self.cooldown_seconds = cooldown_seconds
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self._pending: Set[str] = set()
+        self._recent = BoundedCache("prefetched_wallets", max_entries=10000, ttl_seconds=cooldown_seconds)
+        self._threads: List[threading.Thread] = []
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def submit(self, wallet_address: str) -> bool:
+        """请求预热钱包数据，返回是否已入队"""
+        wallet_key = wallet_address.lower()
+        with self._lock:
+            if wallet_key in self._pending or wallet_key in self._recent:
+                return False
+            try:
+                self._queue.put_nowait(wallet_key)
+            except queue.Full:
+                self.dropped += 1
+                logger.debug(f"Prefetch queue full, skipping {wallet_key[:10]}...")
+                return False
+            self._pending.add(wallet_key)
+            self._start_workers()
+        return True
+
+    def _start_workers(self) -> None:
+        # 首次入队时才启动线程
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"wallet-prefetch-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            wallet_key = self._queue.get()
+            started = time.monotonic()
+            try:
+                self.load(wallet_key)
+                with self._lock:
+                    self.completed += 1
+                logger.info(
+                    f"🔥 Prefetched {wallet_key[:10]}... in {(time.monotonic() - started) * 1000:.0f}ms"
+                )
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.warning(f"⚠️ Prefetch failed for {wallet_key[:10]}...: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(wallet_key)
+                    if self.cooldown_seconds > 0:
+                        self._recent[wallet_key] = True
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "in_progress": len(self._pending) - self._queue.qsize(),
+                "completed": self.completed,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "workers": len(self._threads),
+            }
@@ -0,0 +1,193 @@
+# Background garbage collection of superseded conversation snapshots
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from ..utils.logger import get_logger
+from .pin_index import PinIndex
+from .pin_sync import pin_recency
+
+logger = get_logger(__name__)
+
+
+class SnapshotCompactor:
+    """
+    旧对话快照回收
+
+    每次保存对话都会固定一个新的头部清单，旧版本会一直保留。压缩任务会：
+    - 按 (钱包, conversation_id) 分组，按版本号只保留最新的 keep 个头部清单，其余取消固定；
+      本地索引记录的最新版本始终保留
+    - 取消固定不再被保留的头部清单引用的分段（铸造状态变化后重新封存留下的旧分段）；
+      晚于该对话最新头部清单固定的分段属于正在进行的保存（分段先于头部清单固定），一律保留
+    - 按批次限速调用 unpin，支持 dry-run，并通过 status() 报告进度
+    """
+
+    def __init__(
+        self,
+        index: PinIndex,
+        list_pins: Callable[..., List[Dict]],
+        retrieve: Callable[[str], Optional[Dict]],
+        unpin: Callable[[str], bool],
+    ):
+        self.index = index
+        self.list_pins = list_pins
+        self.retrieve = retrieve
+        self.unpin = unpin
+
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict = {"state": "idle"}
+
+    # ============ 进度 ============
+
+    def status(self) -> Dict:
+        with self._lock:
+            return dict(self._status)
+
+    def _update(self, **fields) -> None:
+        with self._lock:
+            self._status.update(fields)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ============ 压缩 ============
+
+    @staticmethod
+    def _conversation_key(pin: Dict) -> Optional[Tuple[str, str]]:
+        keyvalues = pin.get("metadata", {}).get("keyvalues", {}) or {}
+        wallet, convo_id = keyvalues.get("wallet_address"), keyvalues.get("conversation_id")
+        if not wallet or not convo_id or not pin.get("ipfs_pin_hash"):
+            return None
+        return wallet.lower(), convo_id
+
+    def _collect_garbage(self, wallet_address: Optional[str], keep: int) -> List[str]:
+        """计算可以取消固定的 CID 列表"""
+        heads = self.list_pins(wallet_address=wallet_address, data_type="conversation")
+        segments = self.list_pins(wallet_address=wallet_address, data_type="conversation_segment")
+        self._update(scanned=len(heads) + len(segments))
+
+        heads_by_convo: Dict[Tuple[str, str], List[Dict]] = {}
+        for pin in heads:
+            key = self._conversation_key(pin)
+            if key:
+                heads_by_convo.setdefault(key, []).append(pin)
+
+        garbage: List[str] = []
+        referenced: Set[str] = set()
+        # 无法确认引用关系的对话，其分段一律保留
+        unsafe_convos: Set[Tuple[str, str]] = set()
+        # 每个对话最新头部清单的固定时间：之后固定的分段可能属于尚未固定头部清单的保存
+        newest_head_pinned: Dict[Tuple[str, str], str] = {}
+
+        for key, pins in heads_by_convo.items():
+            wallet, convo_id = key
+            pins.sort(key=pin_recency, reverse=True)
+            newest_head_pinned[key] = max(pin.get("date_pinned") or "" for pin in pins)
+            # 本地索引记录的最新版本无论如何都保留，其分段同样视为被引用
+            latest = self.index.get_conversation_hash(wallet, convo_id)
+            kept = {pin["ipfs_pin_hash"] for pin in pins[:keep]}
+            if latest:
+                kept.add(latest)
+
+            for pin in pins:
+                if pin["ipfs_pin_hash"] not in kept:
+                    garbage.append(pin["ipfs_pin_hash"])
+
+            for ipfs_hash in kept:
+                data = self.retrieve(ipfs_hash)
+                if data is None:
+                    unsafe_convos.add(key)
+                    continue
+                for segment in data.get("segments", []):
+                    referenced.add(segment.get("ipfs_hash"))
+
+        for pin in segments:
+            key = self._conversation_key(pin)
+            # 只回收仍有头部清单、引用关系已确认、且早于最新头部清单固定的分段
+            if (
+                key in heads_by_convo
+                and key not in unsafe_convos
+                and pin["ipfs_pin_hash"] not in referenced
+                and (pin.get("date_pinned") or "") <= newest_head_pinned[key]
+            ):
+                garbage.append(pin["ipfs_pin_hash"])
+
+        return garbage
+
+    def run(
+        self,
+        wallet_address: Optional[str] = None,
+        keep: int = 1,
+        dry_run: bool = False,
+        batch_size: int = 20,
+        batch_interval: float = 1.0,
+    ) -> Dict:
+        """同步执行一次压缩，返回最终进度报告"""
+        self._update(
+            state="scanning",
+            wallet_address=wallet_address,
+            keep=keep,
+            dry_run=dry_run,
+            scanned=0,
+            candidates=0,
+            unpinned=0,
+            failed=0,
+            started_at=datetime.now().isoformat(),
+            finished_at=None,
+            error=None,
+        )
+
+        try:
+            keep = max(1, keep)
+            self._update(keep=keep)
+            garbage = self._collect_garbage(wallet_address, keep)
+            self._update(state="unpinning" if not dry_run else "dry_run", candidates=len(garbage))
+
+            if not dry_run:
+                for start in range(0, len(garbage), max(1, batch_size)):
+                    unpinned = failed = 0
+                    for ipfs_hash in garbage[start:start + batch_size]:
+                        if self.unpin(ipfs_hash):
+                            unpinned += 1
+                        else:
+                            failed += 1
+                    with self._lock:
+                        self._status["unpinned"] += unpinned
+                        self._status["failed"] += failed
+                    if start + batch_size < len(garbage):
+                        time.sleep(batch_interval)
+
+            self._update(state="finished", finished_at=datetime.now().isoformat())
+        except Exception as e:
+            logger.error(f"❌ Snapshot compaction failed: {e}")
+            self._update(state="failed", error=str(e), finished_at=datetime.now().isoformat())
+
+        report = self.status()
+        logger.info(
+            f"🧹 Snapshot compaction {report['state']}: {report['candidates']} candidates, "
+            f"{report['unpinned']} unpinned, {report['failed']} failed (dry_run={dry_run})"
+        )
+        return report
+
+    def start(self, **kwargs) -> bool:
+        """在后台线程中执行压缩；已有任务在运行时返回 False"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(
+                target=self.run, kwargs=kwargs, name="snapshot-gc", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def schedule(self, interval_seconds: float, **kwargs) -> None:
+        """每隔 interval_seconds 在后台执行一次压缩"""
+        def loop() -> None:
+            while True:
+                time.sleep(interval_seconds)
+                if not self.is_running():
+                    self.run(**kwargs)
+
+        threading.Thread(target=loop, name="snapshot-gc-scheduler", daemon=True).start()
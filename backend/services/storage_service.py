@@ -1,15 +1,44 @@
 # IPFS/decentralized storage with Pinata cloud persistence
 import hashlib
 import json
+import threading
 import uuid
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Optional
-
-import requests
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
 
 from ..config import settings
-from ..models.chat_models import ChatMessage, Conversation, MintRecord
+from ..models.chat_models import (
+    ChatMessage,
+    Conversation,
+    ConversationListItem,
+    ConversationSegment,
+    MintRecord,
+    parse_messages,
+)
+from ..utils.cache import BoundedCache
+from ..utils.cid import compute_cid
+from ..utils.http_client import get_http_client
+from ..utils.locks import StripedLock
 from ..utils.logger import get_logger
+from ..utils.pagination import page_cursors, paginate
+from ..utils.shared_cache import get_shared_cache
+from ..utils.singleflight import SingleFlight
+from ..utils.snapshot_codec import (
+    SnapshotDecodeError,
+    decode_snapshot,
+    encode_json,
+    encode_snapshot,
+    resolve_encoding,
+)
+from .blob_cache import BlobCache
+from .gateway_client import GatewayClient
+from .pin_index import PinIndex
+from .pin_sync import PinataSync
+from .prefetcher import WalletPrefetcher
+from .snapshot_gc import SnapshotCompactor
+from .upload_outbox import UploadOutbox
 
 logger = get_logger(__name__)
 
@@ -21,14 +50,43 @@ except ImportError:
     IPFS_CLIENT_AVAILABLE = False
     logger.info("ipfshttpclient not installed. Local IPFS mode unavailable.")
 
+T = TypeVar("T")
+
+
+class FetchResult(list):
+    """
+    批量拉取的结果列表
+    
+    - complete=False 表示超过截止时间，仅返回了部分结果
+    - next_cursor / prev_cursor 为分页查询时获取更旧 / 更新一页的游标
+    """
+
+    def __init__(
+        self,
+        items=(),
+        complete: bool = True,
+        next_cursor: Optional[str] = None,
+        prev_cursor: Optional[str] = None,
+    ):
+        super().__init__(items)
+        self.complete = complete
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+
+class ConversationConflictError(RuntimeError):
+    """对话已被其他写入者更新到更新的版本"""
+
 
 class StorageService:
     """
     IPFS 存储服务 - 支持 Pinata 云端持久化
     
     数据类型:
-    - conversation: 完整对话（包含所有消息和状态）
+    - conversation: 对话头部清单（对话元数据 + 分段列表 + 未封存的尾部消息）
+    - conversation_segment: 已封存的消息分段（每段 CONVERSATION_SEGMENT_SIZE 条，不可变）
     - mint_record: NFT 铸造记录
+    - conversation_summary: 钱包对话摘要清单（可选，CONVERSATION_SUMMARY_PIN=true 时固定）
     
     Pinata 元数据结构:
     {
@@ -40,13 +98,33 @@ class StorageService:
             "app": "tokenized_llm_platform"
         }
     }
+    
+    快照编码由 SNAPSHOT_ENCODING 控制：json 走 pinJSONToIPFS；compact 等二进制编码
+    （msgpack/CBOR + zstd/zlib，带版本头）走 pinFileToIPFS，读取时自动识别。
+    
+    对话头部清单结构 (format = "segmented"):
+    {
+        "id", "wallet_address", "title", "created_at", "updated_at",
+        "message_count": 120, "minted_count": 4, "last_message_preview": "...",
+        "segments": [{"ipfs_hash": "Qm...", "message_count": 50}, ...],
+        "messages": [...]  # 尚未封存的尾部消息
+    }
     """
     
     APP_IDENTIFIER = "tokenized_llm_platform"
+    SNAPSHOT_FORMAT = "segmented"
     
     def __init__(self):
         self.client = None
         self.pinning_service = settings.IPFS_PINNING_SERVICE.lower()
+        self._http = get_http_client()
+        
+        # 快照编码（json 兼容旧格式；其他取值为带版本头的二进制编码）
+        self.snapshot_encoding = settings.SNAPSHOT_ENCODING.lower()
+        if self.snapshot_encoding != "json":
+            # 启动时解析一次（compact 自动选择已安装的依赖），之后按解析结果编码
+            self.snapshot_encoding = "+".join(resolve_encoding(self.snapshot_encoding))
+            logger.info(f"🗜️ Snapshot encoding: {self.snapshot_encoding}")
         
         # 初始化服务
         if self.pinning_service == "local":
@@ -56,10 +134,111 @@ class StorageService:
         else:
             logger.info("📝 Storage service running in MOCK mode (no IPFS)")
         
-        # 本地缓存
-        self._conversation_cache: Dict[str, Conversation] = {}  # conversation_id -> Conversation
-        self._mint_record_cache: Dict[str, MintRecord] = {}  # mint_id -> MintRecord
-        self._data_cache: Dict[str, Dict] = {}  # ipfs_hash -> data
+        # 本地缓存（有界：按字节预算 LRU 淘汰 + TTL 过期）
+        # 只有 Pinata 模式能从索引 / pinList 重新加载；Mock 和本地 IPFS 模式下缓存是唯一的数据来源，
+        # 因此对话与铸造记录缓存不设上限
+        bounded = self.pinning_service == "pinata"
+        self._conversation_cache = BoundedCache(  # (wallet, conversation_id) -> Conversation
+            "conversations",
+            max_bytes=settings.CONVERSATION_CACHE_MAX_BYTES if bounded else 0,
+            ttl_seconds=settings.CACHE_TTL_SECONDS if bounded else 0,
+        )
+        self._mint_record_cache = BoundedCache(  # mint_id -> MintRecord
+            "mint_records",
+            max_bytes=settings.MINT_RECORD_CACHE_MAX_BYTES if bounded else 0,
+            ttl_seconds=settings.CACHE_TTL_SECONDS if bounded else 0,
+        )
+        self._data_cache = BoundedCache(  # ipfs_hash -> data（内容不可变，不需要 TTL）
+            "ipfs_data",
+            max_bytes=settings.DATA_CACHE_MAX_BYTES,
+        )
+        self._missing_cache = BoundedCache(  # (类型, 钱包, ID) -> True，短时间内不再查询不存在的 ID
+            "missing",
+            max_entries=settings.NEGATIVE_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.NEGATIVE_CACHE_TTL_SECONDS,
+        )
+        
+        # 跨进程共享缓存（L2）：其他 worker 保存对话 / 铸造记录后广播失效消息，清除本地缓存（L1）
+        self._shared_cache = get_shared_cache()
+        if self._shared_cache is not None:
+            self._shared_cache.subscribe(self._on_invalidation)
+        
+        # 对话写入按 conversation_id 分段加锁：同一对话串行，不同对话并行
+        self._conversation_locks = StripedLock(settings.CONVERSATION_LOCK_STRIPES)
+        
+        # 合并相同 key 的并发加载（同一对话 / 钱包列表 / pinList 同步 / CID 下载只执行一次）
+        self._singleflight = SingleFlight()
+        
+        # 并行拉取 IPFS 快照的线程池（扇出度由 IPFS_FETCH_CONCURRENCY 控制）
+        self._fetch_executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.IPFS_FETCH_CONCURRENCY),
+            thread_name_prefix="ipfs-fetch",
+        )
+        
+        # IPFS 网关客户端（按延迟排序 + 对冲请求）
+        self._gateway_client = GatewayClient(
+            settings.IPFS_GATEWAYS or [settings.IPFS_GATEWAY],
+            timeout=settings.IPFS_GATEWAY_TIMEOUT_SECONDS,
+            hedge_percentile=settings.IPFS_HEDGE_PERCENTILE,
+            min_hedge_delay_ms=settings.IPFS_HEDGE_MIN_DELAY_MS,
+            max_hedge_delay_ms=settings.IPFS_HEDGE_MAX_DELAY_MS,
+            max_workers=max(1, settings.IPFS_FETCH_CONCURRENCY) * 2,
+            http=self._http,
+            verify_content=settings.IPFS_VERIFY_GATEWAY_CONTENT,
+        )
+        
+        # IPFS 内容磁盘缓存（按 CID 寻址，跨重启复用；Mock 模式下没有可缓存的远端内容）
+        self._blob_cache = (
+            BlobCache(settings.IPFS_BLOB_CACHE_DIR, settings.IPFS_BLOB_CACHE_MAX_BYTES)
+            if settings.IPFS_BLOB_CACHE_DIR and self.pinning_service != "none" else None
+        )
+        
+        # 异步上传发件箱：CID 在本地计算后立即返回，内容落盘后由后台线程固定到 Pinata
+        self._outbox: Optional[UploadOutbox] = None
+        if self.pinning_service == "pinata" and settings.UPLOAD_OUTBOX_ENABLED:
+            self._outbox = UploadOutbox(
+                settings.UPLOAD_OUTBOX_PATH,
+                self._post_file_to_pinata,
+                workers=settings.UPLOAD_OUTBOX_WORKERS,
+                max_attempts=settings.UPLOAD_OUTBOX_MAX_ATTEMPTS,
+                retry_base_seconds=settings.UPLOAD_OUTBOX_RETRY_BASE_SECONDS,
+                retry_max_seconds=settings.UPLOAD_OUTBOX_RETRY_MAX_SECONDS,
+            )
+            self._outbox.start()
+        
+        # 本地 pin 索引（wallet -> conversation_id / mint_id -> 最新 CID）
+        self._pin_index = PinIndex(settings.DATABASE_URL)
+        self._pin_sync = PinataSync(
+            self._pin_index,
+            self._query_pinata_pins,
+            page_size=settings.PINATA_SYNC_PAGE_SIZE,
+        )
+        
+        # 旧快照回收（按批次限速取消固定被替代的头部清单和分段）
+        # 最近一次固定的钱包摘要清单 CID（新版本固定成功后取消固定旧版本）
+        self._summary_manifest_hashes: Dict[str, str] = {}
+        
+        self._compactor = SnapshotCompactor(
+            self._pin_index,
+            self._list_all_pins,
+            self._retrieve_from_gateway,
+            self._unpin_from_pinata,
+        )
+        
+        # 登录后预热（有界队列，登录高峰时丢弃多余的预热请求）
+        self._prefetcher = WalletPrefetcher(
+            self._prefetch_wallet,
+            queue_size=settings.PREFETCH_QUEUE_SIZE,
+            workers=settings.PREFETCH_WORKERS,
+            cooldown_seconds=settings.PREFETCH_COOLDOWN_SECONDS,
+        )
+        if self.pinning_service == "pinata" and settings.SNAPSHOT_GC_INTERVAL_SECONDS > 0:
+            self._compactor.schedule(
+                settings.SNAPSHOT_GC_INTERVAL_SECONDS,
+                keep=settings.SNAPSHOT_GC_KEEP,
+                batch_size=settings.SNAPSHOT_GC_BATCH_SIZE,
+                batch_interval=settings.SNAPSHOT_GC_BATCH_INTERVAL_SECONDS,
+            )
 
     # ============ 初始化方法 ============
 
@@ -106,12 +285,16 @@ class StorageService:
         
         return headers
 
+    def _pinata_url(self, path: str) -> str:
+        """拼接 Pinata API 地址（PINATA_API_URL 可指向本地替身服务）"""
+        return f"{settings.PINATA_API_URL.rstrip('/')}/{path}"
+
     def _verify_pinata_credentials(self) -> bool:
         """验证 Pinata 凭证"""
         try:
             headers = self._get_pinata_headers()
-            response = requests.get(
-                "https://api.pinata.cloud/data/testAuthentication",
+            response = self._http.get(
+                self._pinata_url("data/testAuthentication"),
                 headers=headers,
                 timeout=10
             )
@@ -149,12 +332,62 @@ class StorageService:
         """生成唯一 ID"""
         return str(uuid.uuid4())
 
-    def _generate_mock_hash(self, data: Dict) -> str:
-        """生成模拟的 IPFS 哈希"""
+    def _generate_mock_hash(
+        self,
+        data: Dict,
+        content_root: Optional[bytes] = None,
+        content_key: str = "messages",
+    ) -> str:
+        """
+        生成模拟的 IPFS 哈希
+        
+        传入 content_root（消息的 Merkle 根）时，data[content_key] 不再参与序列化，
+        只哈希其余字段和根，避免每次追加都重新哈希整个对话
+        """
+        if content_root is not None:
+            data = {key: value for key, value in data.items() if key != content_key}
+            data["content_root"] = content_root.hex()
         content = json.dumps(data, sort_keys=True, default=str)
         hash_digest = hashlib.sha256(content.encode()).hexdigest()
         return f"Qm{hash_digest[:44]}"
 
+    def _store_json(
+        self,
+        data: Dict,
+        name: str,
+        wallet_address: str,
+        data_type: str,
+        extra_keyvalues: Optional[Dict] = None,
+        content_root: Optional[Callable[[], bytes]] = None,
+    ) -> Optional[str]:
+        """
+        按当前 pinning 服务和 SNAPSHOT_ENCODING 保存快照，返回 IPFS 哈希（上传失败返回 None）
+        
+        content_root 返回 data["messages"] 对应消息的 Merkle 根，仅 Mock 模式调用，用于计算内容 ID
+        """
+        compact = self.snapshot_encoding != "json"
+        if self.pinning_service == "pinata":
+            if self._outbox is not None:
+                # 固定的字节即本地计算 CID 的字节（JSON 快照同样以文件形式上传）
+                content = encode_snapshot(data, self.snapshot_encoding) if compact else encode_json(data)
+                metadata = self._pinata_metadata(name, wallet_address, data_type, extra_keyvalues)
+                metadata["keyvalues"]["encoding"] = self.snapshot_encoding
+                return self._enqueue_upload(content, name, metadata)
+            if compact:
+                content = encode_snapshot(data, self.snapshot_encoding)
+                return self._upload_file_to_pinata(content, name, wallet_address, data_type, extra_keyvalues)
+            return self._upload_to_pinata(data, name, wallet_address, data_type, extra_keyvalues)
+        elif self.pinning_service == "local" and self.client:
+            if compact:
+                ipfs_hash = self.client.add_bytes(encode_snapshot(data, self.snapshot_encoding))
+            else:
+                ipfs_hash = self.client.add_json(data)
+            self.client.pin.add(ipfs_hash)
+            return ipfs_hash
+        
+        # Mock 模式
+        return self._generate_mock_hash(data, content_root() if content_root else None)
+
     def _upload_to_pinata(
         self,
         data: Dict,
@@ -164,28 +397,16 @@ class StorageService:
         extra_keyvalues: Optional[Dict] = None
     ) -> Optional[str]:
         """上传 JSON 数据到 Pinata"""
-        url = "https://api.pinata.cloud/pinning/pinJSONToIPFS"
+        url = self._pinata_url("pinning/pinJSONToIPFS")
         headers = self._get_pinata_headers()
         
-        keyvalues = {
-            "wallet_address": wallet_address.lower(),
-            "type": data_type,
-            "app": self.APP_IDENTIFIER,
-            "timestamp": datetime.now().isoformat(),
-        }
-        if extra_keyvalues:
-            keyvalues.update(extra_keyvalues)
-        
         payload = {
             "pinataContent": data,
-            "pinataMetadata": {
-                "name": name,
-                "keyvalues": keyvalues
-            }
+            "pinataMetadata": self._pinata_metadata(name, wallet_address, data_type, extra_keyvalues),
         }
         
         try:
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self._http.post(url, json=payload, headers=headers, timeout=30)
             response.raise_for_status()
             result = response.json()
             ipfs_hash = result.get("IpfsHash")
@@ -195,21 +416,100 @@ class StorageService:
             logger.error(f"❌ Failed to upload to Pinata: {e}")
             return None
 
+    def _upload_file_to_pinata(
+        self,
+        content: bytes,
+        name: str,
+        wallet_address: str,
+        data_type: str,
+        extra_keyvalues: Optional[Dict] = None
+    ) -> Optional[str]:
+        """以文件形式上传二进制快照到 Pinata（pinFileToIPFS）"""
+        metadata = self._pinata_metadata(name, wallet_address, data_type, extra_keyvalues)
+        metadata["keyvalues"]["encoding"] = self.snapshot_encoding
+        return self._post_file_to_pinata(content, name, metadata)
+
+    def _post_file_to_pinata(self, content: bytes, name: str, metadata: Dict) -> Optional[str]:
+        """pinFileToIPFS 原样固定 content（CIDv0，与 compute_cid 的结果一致）"""
+        url = self._pinata_url("pinning/pinFileToIPFS")
+        # multipart 请求由 requests 自动设置 Content-Type
+        headers = self._get_pinata_headers()
+        headers.pop("Content-Type", None)
+        
+        try:
+            response = self._http.post(
+                url,
+                files={"file": (name, content, "application/octet-stream")},
+                data={
+                    "pinataMetadata": json.dumps(metadata),
+                    "pinataOptions": json.dumps({"cidVersion": 0}),
+                },
+                headers=headers,
+                timeout=30,
+            )
+            response.raise_for_status()
+            ipfs_hash = response.json().get("IpfsHash")
+            data_type = metadata.get("keyvalues", {}).get("type")
+            logger.info(f"📌 Uploaded to Pinata: {ipfs_hash} (type: {data_type}, {len(content)} bytes)")
+            return ipfs_hash
+        except Exception as e:
+            logger.error(f"❌ Failed to upload to Pinata: {e}")
+            return None
+
+    def _enqueue_upload(self, content: bytes, name: str, metadata: Dict) -> str:
+        """本地计算 CID 并写入发件箱，立即返回 CID（内容同时写入磁盘缓存供读取）"""
+        ipfs_hash = compute_cid(content)
+        self._outbox.enqueue(ipfs_hash, content, name, metadata)
+        if self._blob_cache:
+            self._blob_cache.put(ipfs_hash, content)
+        logger.info(f"📮 Queued upload {ipfs_hash} (type: {metadata['keyvalues'].get('type')}, {len(content)} bytes)")
+        return ipfs_hash
+
+    def _pinata_metadata(
+        self,
+        name: str,
+        wallet_address: str,
+        data_type: str,
+        extra_keyvalues: Optional[Dict] = None
+    ) -> Dict:
+        """构建 pinataMetadata"""
+        keyvalues = {
+            "wallet_address": wallet_address.lower(),
+            "type": data_type,
+            "app": self.APP_IDENTIFIER,
+            "timestamp": datetime.now().isoformat(),
+        }
+        if extra_keyvalues:
+            keyvalues.update(extra_keyvalues)
+        return {"name": name, "keyvalues": keyvalues}
+
     def _query_pinata_pins(
         self,
         wallet_address: Optional[str] = None,
         data_type: Optional[str] = None,
         conversation_id: Optional[str] = None,
-        limit: int = 1000
+        limit: int = 1000,
+        page_offset: int = 0,
+        pin_start: Optional[str] = None,
+        raise_on_error: bool = False
     ) -> List[Dict]:
-        """查询 Pinata 上的 pins"""
+        """
+        查询 Pinata 上的 pins（单页）
+        
+        Args:
+            page_offset: 分页偏移量
+            pin_start: 只返回该时间之后固定的 pin（ISO 8601）
+            raise_on_error: 请求失败时抛出异常而不是返回空列表
+        """
         if self.pinning_service != "pinata":
             return []
         
-        url = "https://api.pinata.cloud/data/pinList"
+        url = self._pinata_url("data/pinList")
         headers = self._get_pinata_headers()
         
-        params = {"status": "pinned", "pageLimit": limit}
+        params = {"status": "pinned", "pageLimit": limit, "pageOffset": page_offset}
+        if pin_start:
+            params["pinStart"] = pin_start
         
         keyvalues = {"app": {"value": self.APP_IDENTIFIER, "op": "eq"}}
         if wallet_address:
@@ -222,43 +522,116 @@ class StorageService:
         params["metadata"] = json.dumps({"keyvalues": keyvalues})
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=30)
+            response = self._http.get(url, headers=headers, params=params, timeout=30)
             response.raise_for_status()
             return response.json().get("rows", [])
         except Exception as e:
             logger.error(f"❌ Failed to query Pinata pins: {e}")
+            if raise_on_error:
+                raise
             return []
 
+    def _list_all_pins(
+        self,
+        wallet_address: Optional[str] = None,
+        data_type: Optional[str] = None,
+    ) -> List[Dict]:
+        """分页拉取符合条件的全部 pins（请求失败时抛出异常）"""
+        page_size = settings.PINATA_SYNC_PAGE_SIZE
+        pins: List[Dict] = []
+        while True:
+            rows = self._query_pinata_pins(
+                wallet_address=wallet_address,
+                data_type=data_type,
+                limit=page_size,
+                page_offset=len(pins),
+                raise_on_error=True,
+            )
+            pins.extend(rows)
+            if len(rows) < page_size:
+                return pins
+
     def _retrieve_from_gateway(self, ipfs_hash: str) -> Optional[Dict]:
-        """通过网关检索 IPFS 内容"""
-        if ipfs_hash in self._data_cache:
-            return self._data_cache[ipfs_hash]
+        """通过网关检索 IPFS 内容（相同 CID 的并发请求只下载一次）"""
+        cached = self._data_cache.get(ipfs_hash)
+        if cached is not None:
+            return cached
+        return self._singleflight.do(("cid", ipfs_hash), lambda: self._download_content(ipfs_hash))
+
+    def _download_content(self, ipfs_hash: str) -> Optional[Dict]:
+        """磁盘缓存 -> 网关，解码后写入内存缓存"""
+        cached = self._data_cache.get(ipfs_hash)
+        if cached is not None:
+            return cached
+        
+        # 磁盘缓存 -> 发件箱（尚未固定完成） -> 网关
+        content = self._blob_cache.get(ipfs_hash) if self._blob_cache else None
+        if content is None and self._outbox is not None:
+            content = self._outbox.get(ipfs_hash)
+        if content is None:
+            content = self._gateway_client.fetch(ipfs_hash)
+            if content is None:
+                return None
+            if self._blob_cache:
+                self._blob_cache.put(ipfs_hash, content)
+        
+        try:
+            data = decode_snapshot(content)
+        except SnapshotDecodeError as e:
+            logger.error(f"Failed to decode IPFS content {ipfs_hash}: {e}")
+            return None
+        self._data_cache[ipfs_hash] = data
+        return data
+
+    def _fetch_parallel(
+        self,
+        items: Dict[str, str],
+        loader: Callable[[str, str], Optional[T]],
+    ) -> Tuple[List[T], bool]:
+        """
+        并行执行 loader(item_id, ipfs_hash)，受 IPFS_FETCH_DEADLINE_SECONDS 总截止时间约束
+        
+        Returns:
+            (成功加载的结果列表, 是否全部在截止时间内完成)
+        """
+        if not items:
+            return [], True
         
-        gateways = [
-            f"https://gateway.pinata.cloud/ipfs/{ipfs_hash}",
-            f"https://ipfs.io/ipfs/{ipfs_hash}",
-            f"https://cloudflare-ipfs.com/ipfs/{ipfs_hash}",
-        ]
+        futures = {
+            self._fetch_executor.submit(loader, item_id, ipfs_hash): item_id
+            for item_id, ipfs_hash in items.items()
+        }
+        done, pending = wait(futures, timeout=settings.IPFS_FETCH_DEADLINE_SECONDS)
+        
+        # 未完成的任务尽量取消；已在运行的任务会在后台完成并写入缓存
+        for future in pending:
+            future.cancel()
+        if pending:
+            logger.warning(
+                f"⏱️ Fetch deadline exceeded: {len(pending)}/{len(items)} snapshots still pending"
+            )
         
-        for gateway_url in gateways:
+        results = []
+        for future in done:
             try:
-                response = requests.get(gateway_url, timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
-                    self._data_cache[ipfs_hash] = data
-                    return data
-            except Exception:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Failed to fetch {futures[future]}: {e}")
                 continue
-        
-        return None
+            if result is not None:
+                results.append(result)
+        return results, not pending
 
     def _unpin_from_pinata(self, ipfs_hash: str) -> bool:
-        """从 Pinata 取消固定"""
-        url = f"https://api.pinata.cloud/pinning/unpin/{ipfs_hash}"
+        """从 Pinata 取消固定（仍在发件箱中的内容直接取消上传）"""
+        if self._outbox is not None and self._outbox.discard(ipfs_hash):
+            logger.info(f"🗑️ Dropped queued upload: {ipfs_hash}")
+            return True
+        url = self._pinata_url(f"pinning/unpin/{ipfs_hash}")
         headers = self._get_pinata_headers()
         
         try:
-            response = requests.delete(url, headers=headers, timeout=10)
+            response = self._http.delete(url, headers=headers, timeout=10)
             response.raise_for_status()
             logger.info(f"🗑️ Unpinned from Pinata: {ipfs_hash}")
             return True
@@ -268,10 +641,16 @@ class StorageService:
 
     # ============ 对话管理方法 ============
 
-    def create_conversation(self, wallet_address: str, title: str = "New Conversation") -> Conversation:
-        """创建新对话"""
+    def create_conversation(
+        self,
+        wallet_address: str,
+        title: str = "New Conversation",
+        conversation_id: Optional[str] = None,
+        persist: bool = True,
+    ) -> Conversation:
+        """创建新对话（persist=False 时仅写入缓存，由调用方负责保存）"""
         conversation = Conversation(
-            id=self._generate_id(),
+            id=conversation_id or self._generate_id(),
             wallet_address=wallet_address.lower(),
             title=title,
             messages=[],
@@ -280,10 +659,11 @@ class StorageService:
         )
         
         # 缓存
-        self._conversation_cache[conversation.id] = conversation
+        self._conversation_cache[self._convo_key(conversation)] = conversation
         
         # 立即保存到 IPFS
-        self._save_conversation_to_ipfs(conversation)
+        if persist:
+            self._save_conversation_to_ipfs(conversation)
         
         logger.info(f"🆕 Created conversation {conversation.id} for {wallet_address[:10]}...")
         return conversation
@@ -292,59 +672,253 @@ class StorageService:
         """获取对话"""
         wallet_key = wallet_address.lower()
         
-        # 从缓存获取
-        if conversation_id in self._conversation_cache:
-            convo = self._conversation_cache[conversation_id]
-            if convo.wallet_address.lower() == wallet_key:
-                return convo
+        # 从缓存获取（临近过期时在后台提前刷新）
+        convo = self._conversation_cache.get((wallet_key, conversation_id))
+        if convo:
+            self._maybe_refresh_conversation(convo)
+            return convo
         
-        # 从 Pinata 获取
+        # 从共享缓存获取（其他 worker 刚保存的对话）
+        convo = self._load_shared_conversation(conversation_id, wallet_key)
+        if convo:
+            self._conversation_cache[(wallet_key, conversation_id)] = convo
+            return convo
+        
+        # 从 Pinata 获取（同一对话的并发请求只加载一次）
         if self.pinning_service == "pinata":
-            convo = self._load_conversation_from_pinata(conversation_id, wallet_key)
+            return self._singleflight.do(
+                ("conversation", wallet_key, conversation_id),
+                lambda: self._load_and_cache_conversation(conversation_id, wallet_key),
+            )
+        
+        return None
+
+    def _load_shared_conversation(self, conversation_id: str, wallet_key: str) -> Optional[Conversation]:
+        """从共享缓存读取对话；有索引时只接受索引中的最新版本"""
+        if self._shared_cache is None:
+            return None
+        try:
+            value = self._shared_cache.get(f"conversation:{wallet_key}:{conversation_id}")
+            if value is None:
+                return None
+            convo = Conversation.model_validate_json(value)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read conversation {conversation_id} from shared cache: {e}")
+            return None
+        
+        if convo.wallet_address.lower() != wallet_key:
+            return None
+        if self.pinning_service != "none" and (
+            self._pin_index.get_conversation_hash(wallet_key, conversation_id) != convo.ipfs_hash
+        ):
+            return None
+        return convo
+
+    def _share_conversation(self, conversation: Conversation) -> None:
+        """保存成功后写入共享缓存，并通知其他 worker 丢弃本地缓存的旧版本"""
+        if self._shared_cache is None:
+            return
+        # 与本地缓存一致：只有 Pinata 模式能重新加载，其他模式下共享缓存是各 worker 间唯一的共享数据，不设过期
+        ttl = settings.CACHE_TTL_SECONDS if self.pinning_service == "pinata" else 0
+        wallet_key = conversation.wallet_address.lower()
+        try:
+            self._shared_cache.set(
+                f"conversation:{wallet_key}:{conversation.id}", conversation.model_dump_json().encode(), ttl
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to write conversation {conversation.id} to shared cache: {e}")
+        self._shared_cache.publish({
+            "kind": "conversation",
+            "wallet": wallet_key,
+            "id": conversation.id,
+            "version": conversation.version,
+        })
+
+    def _on_invalidation(self, message: Dict) -> None:
+        """处理其他 worker 广播的失效消息"""
+        kind, wallet_key, item_id = message.get("kind"), message.get("wallet"), message.get("id")
+        if kind == "conversation":
+            cached = self._conversation_cache.get((wallet_key, item_id))
+            if cached and cached.version < message.get("version", 0):
+                self._conversation_cache.pop((wallet_key, item_id))
+            self._forget_missing("conversation", wallet_key, item_id)
+        elif kind == "mint":
+            self._mint_record_cache.pop(item_id)
+            self._forget_missing("mint", wallet_key, item_id)
+            self._forget_missing("mint_by_conversation", wallet_key, message.get("conversation_id"))
+
+    def _known_missing(self, kind: str, wallet_key: str, item_id: str) -> bool:
+        """该 ID 近期已确认不存在（索引和 Pinata 同步均未找到）"""
+        return settings.NEGATIVE_CACHE_TTL_SECONDS > 0 and self._missing_cache.get((kind, wallet_key, item_id)) is not None
+
+    def _remember_missing(self, kind: str, wallet_key: str, item_id: str) -> None:
+        if settings.NEGATIVE_CACHE_TTL_SECONDS > 0:
+            self._missing_cache[(kind, wallet_key, item_id)] = True
+
+    def _forget_missing(self, kind: str, wallet_key: str, item_id: str) -> None:
+        """本实例写入了该 ID 的内容，清除负缓存"""
+        self._missing_cache.pop((kind, wallet_key, item_id), None)
+
+    @staticmethod
+    def _convo_key(conversation: Conversation) -> Tuple[str, str]:
+        """对话缓存键：conversation_id 由客户端提供，不同钱包可能重复"""
+        return conversation.wallet_address.lower(), conversation.id
+
+    def _load_and_cache_conversation(self, conversation_id: str, wallet_key: str) -> Optional[Conversation]:
+        convo = self._conversation_cache.get((wallet_key, conversation_id))
+        if convo:
+            return convo
+        
+        convo = self._load_conversation_from_pinata(conversation_id, wallet_key)
+        if convo:
+            self._conversation_cache[(wallet_key, conversation_id)] = convo
+        return convo
+
+    def _maybe_refresh_conversation(self, convo: Conversation) -> None:
+        """缓存剩余有效期低于 CACHE_REFRESH_AHEAD_RATIO 时，在后台提前刷新，避免集中过期"""
+        if self.pinning_service != "pinata" or not settings.CACHE_TTL_SECONDS:
+            return
+        remaining = self._conversation_cache.remaining_ttl(self._convo_key(convo))
+        if remaining is None or remaining > settings.CACHE_TTL_SECONDS * settings.CACHE_REFRESH_AHEAD_RATIO:
+            return
+        self._singleflight.start(
+            ("refresh",) + self._convo_key(convo),
+            lambda: self._refresh_conversation(convo),
+            self._fetch_executor,
+        )
+
+    def _refresh_conversation(self, cached: Conversation) -> None:
+        """CID 未变化时只延长缓存有效期，否则重新加载；期间缓存被新写入替换时放弃本次刷新"""
+        wallet_key = cached.wallet_address.lower()
+        ipfs_hash = self._lookup_conversation_hash(cached.id, wallet_key)
+        if ipfs_hash is None:
+            return
+        if ipfs_hash == cached.ipfs_hash:
+            self._conversation_cache.replace(self._convo_key(cached), cached, cached)
+            return
+        
+        convo = self._load_conversation_from_pinata(cached.id, wallet_key)
+        if convo and self._conversation_cache.replace(self._convo_key(cached), cached, convo):
+            logger.info(f"♻️ Refreshed conversation {cached.id} ahead of cache expiry")
+
+    def _load_conversation_from_pinata(self, conversation_id: str, wallet_address: str) -> Optional[Conversation]:
+        """从 Pinata 加载对话（通过本地索引定位最新 CID）"""
+        ipfs_hash = self._lookup_conversation_hash(conversation_id, wallet_address)
+        if not ipfs_hash:
+            return None
+        
+        data = self._retrieve_from_gateway(ipfs_hash)
+        if data:
+            convo = self._parse_conversation_snapshot(data, ipfs_hash, conversation_id, wallet_address)
             if convo:
-                self._conversation_cache[conversation_id] = convo
+                logger.info(f"📖 Loaded conversation {conversation_id} from Pinata")
                 return convo
         
         return None
 
-    def _load_conversation_from_pinata(self, conversation_id: str, wallet_address: str) -> Optional[Conversation]:
-        """从 Pinata 加载对话"""
-        pins = self._query_pinata_pins(
-            wallet_address=wallet_address,
-            data_type="conversation",
-            conversation_id=conversation_id,
-            limit=10
-        )
+    def _lookup_conversation_hash(self, conversation_id: str, wallet_address: str) -> Optional[str]:
+        """查找对话最新 CID：先查本地索引，未命中且需要同步时才增量同步 Pinata"""
+        wallet_key = wallet_address.lower()
+        ipfs_hash = self._pin_index.get_conversation_hash(wallet_key, conversation_id)
+        if ipfs_hash or not self._needs_sync(wallet_key, "conversation"):
+            return ipfs_hash
         
-        if not pins:
+        # 负缓存只用于跳过 pinList 同步：近期同步后仍确认不存在的 ID 不再重复同步
+        if self._known_missing("conversation", wallet_key, conversation_id):
             return None
         
-        # 按时间排序，获取最新版本
-        pins.sort(key=lambda x: x.get("date_pinned", ""), reverse=True)
-        latest_pin = pins[0]
-        ipfs_hash = latest_pin.get("ipfs_pin_hash")
+        self._reconcile_pins(wallet_key, "conversation")
+        ipfs_hash = self._pin_index.get_conversation_hash(wallet_key, conversation_id)
+        # 只缓存确认不存在的情况（同步成功后仍未找到）；同步失败等临时错误不写入负缓存
+        if not ipfs_hash and not self._needs_sync(wallet_key, "conversation"):
+            self._remember_missing("conversation", wallet_key, conversation_id)
+        return ipfs_hash
+
+    def _needs_sync(self, wallet_address: str, data_type: str) -> bool:
+        """钱包的某类数据是否需要与 Pinata 同步"""
+        return self._pin_index.needs_sync(
+            wallet_address, data_type, settings.PINATA_SYNC_INTERVAL_SECONDS
+        )
+
+    def _reconcile_pins(self, wallet_address: str, data_type: str) -> None:
+        """与 Pinata pinList 对账（增量同步到本地索引）；失败时不推进同步状态，下次读取时重试"""
+        try:
+            # 同一钱包同类数据的并发同步合并为一次 pinList 遍历
+            self._singleflight.do(
+                ("sync", wallet_address.lower(), data_type),
+                lambda: self._pin_sync.sync(wallet_address, data_type),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Pin sync failed for {wallet_address[:10]}... ({data_type}): {e}")
+
+    def prefetch_wallet(self, wallet_address: str) -> bool:
+        """在后台预热钱包的对话摘要和铸造记录（登录时调用），返回是否已入队"""
+        if self.pinning_service != "pinata":
+            return False
+        return self._prefetcher.submit(wallet_address)
+
+    def _prefetch_wallet(self, wallet_key: str) -> None:
+        """同步 pin 索引并拉取摘要与铸造记录，结果写入索引、摘要表和各级缓存"""
+        summaries = self.get_conversation_summaries(wallet_key)
+        records = self.get_mint_records(wallet_key)
+        logger.debug(
+            f"Prefetched {len(summaries)} conversation summaries and {len(records)} mint records "
+            f"for {wallet_key[:10]}..."
+        )
+
+    def _parse_conversation_snapshot(
+        self,
+        data: Dict,
+        ipfs_hash: str,
+        conversation_id: str,
+        wallet_address: str,
+    ) -> Optional[Conversation]:
+        """从头部清单（或旧版完整快照）重建 Conversation，按需拉取各分段"""
+        try:
+            segments = []
+            raw_messages = []
+            if data.get("format") == self.SNAPSHOT_FORMAT:
+                segments = [ConversationSegment(**segment_info) for segment_info in data.get("segments", [])]
+                for segment, segment_data in zip(segments, self._fetch_segments(segments)):
+                    if not segment_data:
+                        logger.error(f"Missing segment {segment.ipfs_hash} for conversation {conversation_id}")
+                        return None
+                    raw_messages.extend(segment_data.get("messages", []))
+            # 旧版快照的 messages 即全部消息；分段格式下为未封存的尾部
+            raw_messages.extend(data.get("messages", []))
+            
+            messages = parse_messages(raw_messages)
+            return Conversation(
+                id=data.get("id", conversation_id),
+                wallet_address=data.get("wallet_address", wallet_address),
+                title=data.get("title", "Untitled"),
+                messages=messages,
+                created_at=datetime.fromisoformat(data.get("created_at", datetime.now().isoformat())),
+                updated_at=datetime.fromisoformat(data.get("updated_at", datetime.now().isoformat())),
+                ipfs_hash=ipfs_hash,
+                segments=segments,
+                version=data.get("version", 0),
+            )
+        except Exception as e:
+            logger.error(f"Failed to parse conversation: {e}")
+            return None
+
+    def _fetch_segments(self, segments: List[ConversationSegment]) -> List[Optional[Dict]]:
+        """
+        拉取各分段内容，按清单顺序返回（未能在截止时间内取到的为 None）
         
-        if ipfs_hash:
-            data = self._retrieve_from_gateway(ipfs_hash)
-            if data:
-                try:
-                    # 重建 Conversation 对象
-                    messages = [ChatMessage(**msg) for msg in data.get("messages", [])]
-                    convo = Conversation(
-                        id=data.get("id", conversation_id),
-                        wallet_address=data.get("wallet_address", wallet_address),
-                        title=data.get("title", "Untitled"),
-                        messages=messages,
-                        created_at=datetime.fromisoformat(data.get("created_at", datetime.now().isoformat())),
-                        updated_at=datetime.fromisoformat(data.get("updated_at", datetime.now().isoformat())),
-                        ipfs_hash=ipfs_hash,
-                    )
-                    logger.info(f"📖 Loaded conversation {conversation_id} from Pinata")
-                    return convo
-                except Exception as e:
-                    logger.error(f"Failed to parse conversation: {e}")
+        并行拉取使用 _fetch_executor；已在该线程池中执行时（例如批量加载对话列表）改为顺序拉取，
+        避免工作线程互相等待占满线程池
+        """
+        if len(segments) <= 1 or threading.current_thread().name.startswith("ipfs-fetch"):
+            return [self._retrieve_from_gateway(segment.ipfs_hash) for segment in segments]
         
-        return None
+        results, _ = self._fetch_parallel(
+            {str(index): segment.ipfs_hash for index, segment in enumerate(segments)},
+            lambda index, ipfs_hash: (int(index), self._retrieve_from_gateway(ipfs_hash)),
+        )
+        fetched = dict(results)
+        return [fetched.get(index) for index in range(len(segments))]
 
     def add_message_to_conversation(
         self,
@@ -354,131 +928,553 @@ class StorageService:
         content: str,
     ) -> ChatMessage:
         """向对话添加消息"""
+        messages, _ = self.append_messages(
+            conversation_id, wallet_address, [(role, content)]
+        )
+        return messages[0]
+
+    def append_exchange(
+        self,
+        conversation_id: str,
+        wallet_address: str,
+        user_content: str,
+        assistant_content: str,
+    ) -> Tuple[ChatMessage, ChatMessage, Conversation]:
+        """一次性追加一轮问答（用户消息 + 助手回复），只保存一次快照"""
+        messages, conversation = self.append_messages(
+            conversation_id,
+            wallet_address,
+            [("user", user_content), ("assistant", assistant_content)],
+        )
+        return messages[0], messages[1], conversation
+
+    def append_messages(
+        self,
+        conversation_id: str,
+        wallet_address: str,
+        entries: List[Tuple[str, str]],
+    ) -> Tuple[List[ChatMessage], Conversation]:
+        """
+        向对话批量追加消息，所有消息追加完成后只上传一次快照
+        
+        Args:
+            entries: (role, content) 列表，按顺序追加
+        """
         wallet_key = wallet_address.lower()
+        first_content = entries[0][1] if entries else ""
         
-        # 获取或创建对话
-        conversation = self.get_conversation(conversation_id, wallet_key)
-        if not conversation:
-            conversation = self.create_conversation(wallet_key, content[:30])
-            conversation.id = conversation_id  # 使用指定的 ID
+        def append(conversation: Conversation) -> List[ChatMessage]:
+            now = datetime.now()
+            messages = []
+            for role, content in entries:
+                message = ChatMessage(
+                    id=self._generate_id(),
+                    role=role,
+                    content=content,
+                    timestamp=now,
+                    is_minted=False,
+                )
+                conversation.add_message(message)
+                messages.append(message)
+            conversation.updated_at = now
+            return messages
         
-        # 创建消息
-        message = ChatMessage(
-            id=self._generate_id(),
-            role=role,
-            content=content,
-            timestamp=datetime.now(),
-            is_minted=False,
-        )
+        # 不存在时创建新对话（不单独保存空快照），整批追加后只上传一次
+        return self._write_conversation(conversation_id, wallet_key, append, create_title=first_content[:30])
+
+    def _write_conversation(
+        self,
+        conversation_id: str,
+        wallet_key: str,
+        mutate: Callable[[Conversation], T],
+        create_title: Optional[str] = None,
+    ) -> Tuple[Optional[T], Optional[Conversation]]:
+        """
+        在对话锁内执行 读取 -> 修改 -> 保存
         
-        # 添加到对话
-        conversation.messages.append(message)
-        conversation.updated_at = datetime.now()
+        保存时发现版本冲突（其他进程已写入更新的版本）则丢弃缓存、重新加载最新版本后重试，
+        最多重试 CONVERSATION_WRITE_RETRIES 次。
         
-        # 更新缓存
-        self._conversation_cache[conversation.id] = conversation
+        Args:
+            mutate: 修改对话的函数，返回值原样返回
+            create_title: 对话不存在时以该标题创建；为 None 时对话不存在直接返回 (None, None)
+        """
+        with self._conversation_locks.lock_for(conversation_id):
+            conversation = self.get_conversation(conversation_id, wallet_key)
+            for attempt in range(settings.CONVERSATION_WRITE_RETRIES + 1):
+                if not conversation:
+                    if create_title is None:
+                        return None, None
+                    conversation = self.create_conversation(
+                        wallet_key, create_title,
+                        conversation_id=conversation_id,
+                        persist=False,
+                    )
+                
+                result = mutate(conversation)
+                self._conversation_cache[(wallet_key, conversation_id)] = conversation
+                try:
+                    self._save_conversation_to_ipfs(conversation)
+                    return result, conversation
+                except ConversationConflictError as e:
+                    logger.warning(f"⚠️ {e}; reloading (attempt {attempt + 1})")
+                    # 丢弃本地缓存和负缓存，按索引中的最新 CID 重新加载（不经过可能过期的缓存层）
+                    self._conversation_cache.pop((wallet_key, conversation_id))
+                    self._forget_missing("conversation", wallet_key, conversation_id)
+                    conversation = (
+                        self._load_and_cache_conversation(conversation_id, wallet_key)
+                        if self.pinning_service == "pinata" else None
+                    )
         
-        # 保存到 IPFS
-        self._save_conversation_to_ipfs(conversation)
+        raise ConversationConflictError(
+            f"Conversation {conversation_id} kept changing concurrently, giving up"
+        )
+
+    def _serialize_message(self, msg: ChatMessage) -> Dict:
+        """序列化单条消息"""
+        return {
+            "id": msg.id,
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
+            "is_minted": msg.is_minted,
+        }
+
+    def _pin_segment(self, conversation: Conversation, index: int, start: int, count: int) -> Optional[str]:
+        """将 messages[start:start+count] 作为第 index 个分段固定到 IPFS"""
+        data = {
+            "format": "segment",
+            "conversation_id": conversation.id,
+            "index": index,
+            "messages": [
+                self._serialize_message(msg)
+                for msg in conversation.messages[start:start + count]
+            ],
+        }
+        name = f"segment_{conversation.wallet_address[:10]}_{conversation.id[:8]}_{index}"
+        return self._store_json(
+            data, name, conversation.wallet_address, "conversation_segment",
+            extra_keyvalues={"conversation_id": conversation.id, "segment_index": str(index)},
+            content_root=lambda: conversation.content_root(start, start + count),
+        )
+
+    def _seal_segments(self, conversation: Conversation) -> None:
+        """把尾部中已满 CONVERSATION_SEGMENT_SIZE 条的部分封存为新分段"""
+        segment_size = max(1, settings.CONVERSATION_SEGMENT_SIZE)
+        sealed = sum(segment.message_count for segment in conversation.segments)
         
-        return message
+        while len(conversation.messages) - sealed >= segment_size:
+            ipfs_hash = self._pin_segment(conversation, len(conversation.segments), sealed, segment_size)
+            if not ipfs_hash:
+                # 封存失败时消息留在尾部，下次保存时重试
+                break
+            conversation.segments.append(
+                ConversationSegment(ipfs_hash=ipfs_hash, message_count=segment_size)
+            )
+            sealed += segment_size
+
+    def _reseal_segments_for(self, conversation: Conversation, positions: List[int]) -> None:
+        """已封存消息（positions 为按顺序排列的消息位置）的状态变化时，仅重新固定受影响的分段"""
+        start = 0
+        for index, segment in enumerate(conversation.segments):
+            end = start + segment.message_count
+            first = bisect_left(positions, start)
+            if first < len(positions) and positions[first] < end:
+                ipfs_hash = self._pin_segment(conversation, index, start, segment.message_count)
+                if ipfs_hash:
+                    segment.ipfs_hash = ipfs_hash
+            start = end
 
     def _save_conversation_to_ipfs(self, conversation: Conversation) -> Optional[str]:
-        """保存对话到 IPFS"""
-        # 序列化对话
+        """
+        保存对话到 IPFS：封存满的分段，然后只上传头部清单和尾部消息
+        
+        每次保存版本号加一；Pinata 模式下以读取时的版本做乐观并发检查，
+        索引中已有更新的版本时抛出 ConversationConflictError（由 _write_conversation 重新加载后重试）。
+        本地 IPFS 模式无法按索引中的 CID 重新加载对话，不做版本检查（后写入者覆盖）
+        """
+        versioned = self.pinning_service == "pinata"
+        if versioned and not self._pin_index.is_current(
+            conversation.wallet_address, conversation.id, conversation.version, conversation.ipfs_hash
+        ):
+            raise ConversationConflictError(f"Conversation {conversation.id} has a newer version")
+        new_version = conversation.version + 1
+        
+        self._seal_segments(conversation)
+        sealed = sum(segment.message_count for segment in conversation.segments)
+        
+        # 序列化头部清单（附带摘要统计，列表页只需读取头部清单）
+        summary = self._summarize_conversation(conversation)
         data = {
+            "format": self.SNAPSHOT_FORMAT,
             "id": conversation.id,
+            "version": new_version,
             "wallet_address": conversation.wallet_address,
             "title": conversation.title,
+            "message_count": summary.message_count,
+            "minted_count": summary.minted_count,
+            "last_message_preview": summary.last_message_preview,
+            "segments": [segment.model_dump() for segment in conversation.segments],
             "messages": [
-                {
-                    "id": msg.id,
-                    "role": msg.role,
-                    "content": msg.content,
-                    "timestamp": msg.timestamp.isoformat() if msg.timestamp else None,
-                    "is_minted": msg.is_minted,
-                }
-                for msg in conversation.messages
+                self._serialize_message(msg)
+                for msg in conversation.messages[sealed:]
             ],
             "created_at": conversation.created_at.isoformat(),
             "updated_at": conversation.updated_at.isoformat(),
         }
         
-        if self.pinning_service == "pinata":
-            name = f"conversation_{conversation.wallet_address[:10]}_{conversation.id[:8]}"
-            ipfs_hash = self._upload_to_pinata(
-                data, name, conversation.wallet_address, "conversation",
-                extra_keyvalues={"conversation_id": conversation.id}
-            )
-            if ipfs_hash:
-                conversation.ipfs_hash = ipfs_hash
-                return ipfs_hash
-        elif self.pinning_service == "local" and self.client:
-            ipfs_hash = self.client.add_json(data)
-            self.client.pin.add(ipfs_hash)
-            conversation.ipfs_hash = ipfs_hash
+        name = f"conversation_{conversation.wallet_address[:10]}_{conversation.id[:8]}"
+        ipfs_hash = self._store_json(
+            data, name, conversation.wallet_address, "conversation",
+            extra_keyvalues={"conversation_id": conversation.id, "version": str(new_version)},
+            content_root=conversation.content_root,
+        )
+        if not ipfs_hash:
+            return None
+        if self.pinning_service == "none":
+            conversation.version = new_version
+            self._share_conversation(conversation)
             return ipfs_hash
         
-        # Mock 模式
-        return self._generate_mock_hash(data)
+        if not versioned:
+            self._pin_index.record_conversation(conversation.wallet_address, conversation.id, ipfs_hash)
+        elif not self._pin_index.commit_conversation(
+            conversation.wallet_address, conversation.id, ipfs_hash,
+            version=new_version,
+            expected_version=conversation.version,
+            expected_hash=conversation.ipfs_hash,
+        ):
+            # 上传期间被其他写入者抢先，刚固定的版本已无用（内容恰好相同时 CID 相同，不能取消固定）
+            if self._pin_index.get_conversation_hash(conversation.wallet_address, conversation.id) != ipfs_hash:
+                self.unpin_content(ipfs_hash)
+            raise ConversationConflictError(f"Conversation {conversation.id} was updated concurrently")
+        
+        conversation.ipfs_hash = ipfs_hash
+        conversation.version = new_version
+        self._forget_missing("conversation", conversation.wallet_address.lower(), conversation.id)
+        summary.ipfs_hash = ipfs_hash
+        self._record_summary(summary)
+        if self.pinning_service == "pinata" and settings.CONVERSATION_SUMMARY_PIN:
+            self._pin_summary_manifest(conversation.wallet_address)
+        self._share_conversation(conversation)
+        return ipfs_hash
+
+    def _page_conversation_hashes(
+        self,
+        wallet_key: str,
+        limit: Optional[int],
+        before: Optional[Tuple[str, str]],
+        after: Optional[Tuple[str, str]],
+    ) -> Tuple[Dict[str, str], Optional[str], Optional[str]]:
+        """
+        从本地索引取一页对话的最新 CID（需要时先与 Pinata 增量同步）
+        
+        Returns:
+            (按索引顺序排列的 conversation_id -> ipfs_hash, next_cursor, prev_cursor)；limit 为空时返回全部
+        """
+        if self._needs_sync(wallet_key, "conversation"):
+            self._reconcile_pins(wallet_key, "conversation")
+        if not limit:
+            return self._pin_index.list_conversation_hashes(wallet_key), None, None
+        
+        rows = self._pin_index.page_conversation_hashes(wallet_key, limit, before, after)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after:
+            rows.reverse()
+        next_cursor, prev_cursor = page_cursors(
+            [(pinned_at, convo_id) for convo_id, _, pinned_at in rows], has_more, before, after
+        )
+        return {convo_id: ipfs_hash for convo_id, ipfs_hash, _ in rows}, next_cursor, prev_cursor
+
+    def _finish_page(
+        self,
+        results: FetchResult,
+        order: Optional[Dict[str, str]],
+        limit: Optional[int],
+        before: Optional[Tuple[str, str]],
+        after: Optional[Tuple[str, str]],
+    ) -> FetchResult:
+        """
+        对结果排序并分页
+        
+        order 为 pin 索引给出的页内顺序（Pinata 模式，已在索引中分页）；
+        为空时按 (updated_at, id) 倒序，在内存中分页（Mock / 本地模式）
+        """
+        if order is not None:
+            position = {item_id: index for index, item_id in enumerate(order)}
+            results.sort(key=lambda x: position.get(x.id, len(position)))
+            return results
+        
+        key = lambda x: (x.updated_at.isoformat(), x.id)
+        if not limit:
+            results.sort(key=key, reverse=True)
+            return results
+        page, has_more = paginate(results, key, limit, before, after)
+        next_cursor, prev_cursor = page_cursors([key(x) for x in page], has_more, before, after)
+        return FetchResult(page, results.complete, next_cursor, prev_cursor)
+
+    def get_user_conversations(
+        self,
+        wallet_address: str,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[str, str]] = None,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> FetchResult:
+        """
+        获取用户的对话（按最近更新倒序）
+        
+        Args:
+            limit: 每页数量；为空时返回全部
+            before / after: 已解码的分页游标，分别获取更旧 / 更新的一页
+        
+        超过截止时间时返回部分结果（complete=False）
+        """
+        # 同一钱包、同一页的并发请求共享一次加载结果
+        return self._singleflight.do(
+            ("conversations", wallet_address.lower(), limit, before, after),
+            lambda: self._load_user_conversations(wallet_address, limit, before, after),
+        )
 
-    def get_user_conversations(self, wallet_address: str) -> List[Conversation]:
-        """获取用户的所有对话"""
+    def _load_user_conversations(
+        self,
+        wallet_address: str,
+        limit: Optional[int],
+        before: Optional[Tuple[str, str]],
+        after: Optional[Tuple[str, str]],
+    ) -> FetchResult:
         wallet_key = wallet_address.lower()
-        conversations = []
+        conversations = FetchResult()
+        order = None
         
         if self.pinning_service == "pinata":
-            # 从 Pinata 查询所有对话
-            pins = self._query_pinata_pins(
-                wallet_address=wallet_key,
-                data_type="conversation",
-                limit=1000
+            # 只拉取当前页的对话
+            convo_hashes, conversations.next_cursor, conversations.prev_cursor = (
+                self._page_conversation_hashes(wallet_key, limit, before, after)
             )
+            if limit:
+                order = convo_hashes
             
-            # 按 conversation_id 分组，只取最新版本
-            convo_pins: Dict[str, Dict] = {}
-            for pin in pins:
-                metadata = pin.get("metadata", {})
-                keyvalues = metadata.get("keyvalues", {})
-                convo_id = keyvalues.get("conversation_id")
-                
-                if convo_id:
-                    if convo_id not in convo_pins or pin.get("date_pinned", "") > convo_pins[convo_id].get("date_pinned", ""):
-                        convo_pins[convo_id] = pin
+            # 缓存中已是最新版本的直接复用，其余并行拉取
+            to_fetch = {}
+            for convo_id, ipfs_hash in convo_hashes.items():
+                cached = self._conversation_cache.get((wallet_key, convo_id))
+                if cached and cached.ipfs_hash == ipfs_hash:
+                    conversations.append(cached)
+                else:
+                    to_fetch[convo_id] = ipfs_hash
             
-            # 加载每个对话
-            for convo_id, pin in convo_pins.items():
-                ipfs_hash = pin.get("ipfs_pin_hash")
-                if ipfs_hash:
-                    data = self._retrieve_from_gateway(ipfs_hash)
-                    if data:
-                        try:
-                            messages = [ChatMessage(**msg) for msg in data.get("messages", [])]
-                            convo = Conversation(
-                                id=data.get("id", convo_id),
-                                wallet_address=data.get("wallet_address", wallet_key),
-                                title=data.get("title", "Untitled"),
-                                messages=messages,
-                                created_at=datetime.fromisoformat(data.get("created_at", datetime.now().isoformat())),
-                                updated_at=datetime.fromisoformat(data.get("updated_at", datetime.now().isoformat())),
-                                ipfs_hash=ipfs_hash,
-                            )
-                            conversations.append(convo)
-                            self._conversation_cache[convo.id] = convo
-                        except Exception as e:
-                            logger.error(f"Failed to parse conversation: {e}")
+            def load(convo_id: str, ipfs_hash: str) -> Optional[Conversation]:
+                data = self._retrieve_from_gateway(ipfs_hash)
+                if not data:
+                    return None
+                convo = self._parse_conversation_snapshot(data, ipfs_hash, convo_id, wallet_key)
+                if convo:
+                    self._conversation_cache[self._convo_key(convo)] = convo
+                return convo
+            
+            loaded, conversations.complete = self._fetch_parallel(to_fetch, load)
+            conversations.extend(loaded)
         else:
             # 从缓存获取
             for convo in self._conversation_cache.values():
                 if convo.wallet_address.lower() == wallet_key:
                     conversations.append(convo)
         
-        # 按更新时间排序
-        conversations.sort(key=lambda x: x.updated_at, reverse=True)
+        conversations = self._finish_page(conversations, order, limit, before, after)
         
         logger.info(f"📚 Retrieved {len(conversations)} conversations for {wallet_key[:10]}...")
         return conversations
 
+    # ============ 对话摘要 ============
+
+    @staticmethod
+    def _message_preview(content: Optional[str]) -> Optional[str]:
+        """最后一条消息预览（前 50 个字符）"""
+        if content is None:
+            return None
+        return content[:50] + "..." if len(content) > 50 else content
+
+    def _summarize_conversation(self, conversation: Conversation) -> ConversationListItem:
+        """由内存中的完整对话计算摘要"""
+        minted_count = sum(1 for msg in conversation.messages if msg.is_minted)
+        last_message = conversation.messages[-1] if conversation.messages else None
+        return ConversationListItem(
+            id=conversation.id,
+            title=conversation.title,
+            wallet_address=conversation.wallet_address,
+            message_count=len(conversation.messages),
+            last_message_preview=self._message_preview(last_message.content if last_message else None),
+            has_minted_messages=minted_count > 0,
+            minted_count=minted_count,
+            created_at=conversation.created_at,
+            updated_at=conversation.updated_at,
+            ipfs_hash=conversation.ipfs_hash,
+        )
+
+    def _summary_from_snapshot(
+        self,
+        data: Dict,
+        ipfs_hash: str,
+        conversation_id: str,
+        wallet_address: str,
+    ) -> Optional[ConversationListItem]:
+        """只根据头部清单构建摘要；旧版快照缺少统计字段时回退为完整解析"""
+        if data.get("format") == self.SNAPSHOT_FORMAT and "minted_count" in data:
+            try:
+                return ConversationListItem(
+                    id=data.get("id", conversation_id),
+                    title=data.get("title", "Untitled"),
+                    wallet_address=data.get("wallet_address", wallet_address),
+                    message_count=data["message_count"],
+                    last_message_preview=data.get("last_message_preview"),
+                    has_minted_messages=data["minted_count"] > 0,
+                    minted_count=data["minted_count"],
+                    created_at=datetime.fromisoformat(data["created_at"]),
+                    updated_at=datetime.fromisoformat(data["updated_at"]),
+                    ipfs_hash=ipfs_hash,
+                )
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"⚠️ Incomplete summary fields in {ipfs_hash}: {e}")
+        
+        convo = self._parse_conversation_snapshot(data, ipfs_hash, conversation_id, wallet_address)
+        if not convo:
+            return None
+        self._conversation_cache[self._convo_key(convo)] = convo
+        return self._summarize_conversation(convo)
+
+    def _record_summary(self, summary: ConversationListItem) -> None:
+        """写入本地摘要清单"""
+        row = summary.model_dump(exclude={"id", "has_minted_messages"})
+        row["conversation_id"] = summary.id
+        row["created_at"] = summary.created_at.isoformat()
+        row["updated_at"] = summary.updated_at.isoformat()
+        self._pin_index.record_summary(row)
+
+    def _summary_from_row(self, row: Dict) -> ConversationListItem:
+        return ConversationListItem(
+            id=row["conversation_id"],
+            has_minted_messages=row["minted_count"] > 0,
+            **{key: value for key, value in row.items() if key != "conversation_id"},
+        )
+
+    def _pin_summary_manifest(self, wallet_address: str) -> Optional[str]:
+        """将钱包的摘要清单固定到 IPFS，并取消固定上一版本"""
+        wallet_key = wallet_address.lower()
+        data = {
+            "format": "conversation_summaries",
+            "wallet_address": wallet_key,
+            "conversations": self._pin_index.list_summaries(wallet_key),
+            "updated_at": datetime.now().isoformat(),
+        }
+        ipfs_hash = self._store_json(
+            data, f"summaries_{wallet_key[:10]}", wallet_key, "conversation_summary"
+        )
+        previous = self._summary_manifest_hashes.get(wallet_key)
+        if ipfs_hash:
+            self._summary_manifest_hashes[wallet_key] = ipfs_hash
+            if previous and previous != ipfs_hash:
+                self._unpin_from_pinata(previous)
+        return ipfs_hash
+
+    def _load_summary_manifest(self, wallet_address: str) -> Dict[str, ConversationListItem]:
+        """读取 Pinata 上最新的钱包摘要清单（conversation_id -> 摘要）"""
+        pins = self._query_pinata_pins(wallet_address, "conversation_summary", limit=1)
+        if not pins:
+            return {}
+        ipfs_hash = pins[0]["ipfs_pin_hash"]
+        self._summary_manifest_hashes.setdefault(wallet_address, ipfs_hash)
+        data = self._retrieve_from_gateway(ipfs_hash)
+        
+        summaries = {}
+        for row in (data or {}).get("conversations", []):
+            try:
+                summary = self._summary_from_row(row)
+            except Exception as e:
+                logger.warning(f"⚠️ Skipping malformed summary entry in {ipfs_hash}: {e}")
+                continue
+            summaries[summary.id] = summary
+        return summaries
+
+    def get_conversation_summaries(
+        self,
+        wallet_address: str,
+        limit: Optional[int] = None,
+        before: Optional[Tuple[str, str]] = None,
+        after: Optional[Tuple[str, str]] = None,
+    ) -> FetchResult:
+        """
+        获取用户的对话摘要列表（不加载消息内容），分页参数同 get_user_conversations
+        
+        优先使用本地摘要清单；摘要版本落后于 pin 索引的对话只拉取头部清单重新计算，
+        超过截止时间时返回部分结果（complete=False）
+        """
+        # 同一钱包、同一页的并发请求共享一次加载结果
+        return self._singleflight.do(
+            ("summaries", wallet_address.lower(), limit, before, after),
+            lambda: self._load_conversation_summaries(wallet_address, limit, before, after),
+        )
+
+    def _load_conversation_summaries(
+        self,
+        wallet_address: str,
+        limit: Optional[int],
+        before: Optional[Tuple[str, str]],
+        after: Optional[Tuple[str, str]],
+    ) -> FetchResult:
+        wallet_key = wallet_address.lower()
+        summaries = FetchResult()
+        order = None
+        
+        if self.pinning_service == "pinata":
+            convo_hashes, summaries.next_cursor, summaries.prev_cursor = (
+                self._page_conversation_hashes(wallet_key, limit, before, after)
+            )
+            if limit:
+                order = convo_hashes
+            known = {
+                row["conversation_id"]: row
+                for row in self._pin_index.list_summaries(wallet_key, list(convo_hashes) if limit else None)
+            }
+            
+            stale = {}
+            for convo_id, ipfs_hash in convo_hashes.items():
+                row = known.get(convo_id)
+                if row and row["ipfs_hash"] == ipfs_hash:
+                    summaries.append(self._summary_from_row(row))
+                else:
+                    stale[convo_id] = ipfs_hash
+            
+            # 本地摘要缺失（如新实例）时先尝试已固定的摘要清单
+            if stale and settings.CONVERSATION_SUMMARY_PIN:
+                for convo_id, summary in self._load_summary_manifest(wallet_key).items():
+                    if stale.get(convo_id) == summary.ipfs_hash:
+                        self._record_summary(summary)
+                        summaries.append(summary)
+                        del stale[convo_id]
+            
+            def load(convo_id: str, ipfs_hash: str) -> Optional[ConversationListItem]:
+                cached = self._conversation_cache.get((wallet_key, convo_id))
+                if cached and cached.ipfs_hash == ipfs_hash:
+                    summary = self._summarize_conversation(cached)
+                else:
+                    data = self._retrieve_from_gateway(ipfs_hash)
+                    if not data:
+                        return None
+                    summary = self._summary_from_snapshot(data, ipfs_hash, convo_id, wallet_key)
+                if summary:
+                    self._record_summary(summary)
+                return summary
+            
+            loaded, summaries.complete = self._fetch_parallel(stale, load)
+            summaries.extend(loaded)
+        else:
+            for convo in self._conversation_cache.values():
+                if convo.wallet_address.lower() == wallet_key:
+                    summaries.append(self._summarize_conversation(convo))
+        
+        return self._finish_page(summaries, order, limit, before, after)
+
     def update_message_mint_status(
         self,
         conversation_id: str,
@@ -487,22 +1483,18 @@ class StorageService:
         is_minted: bool
     ) -> bool:
         """更新消息的铸造状态"""
-        conversation = self.get_conversation(conversation_id, wallet_address)
-        if not conversation:
-            return False
-        
-        # 更新消息状态
-        for msg in conversation.messages:
-            if msg.id in message_ids:
-                msg.is_minted = is_minted
-        
-        conversation.updated_at = datetime.now()
-        self._conversation_cache[conversation.id] = conversation
-        
-        # 保存到 IPFS
-        self._save_conversation_to_ipfs(conversation)
+        def mark(conversation: Conversation) -> bool:
+            # 更新消息状态（按 ID 索引批量定位）
+            positions = conversation.set_minted(message_ids, is_minted)
+            
+            # 已封存分段中的消息状态变化时，重新固定对应分段
+            self._reseal_segments_for(conversation, positions)
+            
+            conversation.updated_at = datetime.now()
+            return True
         
-        return True
+        updated, _ = self._write_conversation(conversation_id, wallet_address.lower(), mark)
+        return bool(updated)
 
     # ============ NFT 铸造记录方法 ============
 
@@ -573,54 +1565,84 @@ class StorageService:
         
         if self.pinning_service == "pinata":
             name = f"mint_{mint_record.wallet_address[:10]}_{mint_record.id[:8]}"
-            return self._upload_to_pinata(
+            extra_keyvalues = {
+                "conversation_id": mint_record.conversation_id,
+                "mint_id": mint_record.id,
+            }
+            if mint_record.listing_id is not None:
+                extra_keyvalues["listing_id"] = str(mint_record.listing_id)
+            ipfs_hash = self._store_json(
                 data, name, mint_record.wallet_address, "mint_record",
-                extra_keyvalues={
-                    "conversation_id": mint_record.conversation_id,
-                    "mint_id": mint_record.id,
-                }
+                extra_keyvalues=extra_keyvalues
             )
+            if ipfs_hash:
+                # 内容一并写入索引，按 ID / 对话 / 挂单查询时无需访问网关
+                self._pin_index.record_mint(
+                    mint_record.wallet_address, mint_record.id,
+                    mint_record.conversation_id, ipfs_hash,
+                    listing_id=mint_record.listing_id, record=data,
+                )
+                wallet_key = mint_record.wallet_address.lower()
+                self._forget_missing("mint", wallet_key, mint_record.id)
+                self._forget_missing("mint_by_conversation", wallet_key, mint_record.conversation_id)
+                if self._shared_cache is not None:
+                    self._shared_cache.publish({
+                        "kind": "mint",
+                        "wallet": wallet_key,
+                        "id": mint_record.id,
+                        "conversation_id": mint_record.conversation_id,
+                    })
+            return ipfs_hash
         
         return self._generate_mock_hash(data)
 
-    def get_mint_records(self, wallet_address: str) -> List[MintRecord]:
-        """获取用户的所有铸造记录"""
+    def _parse_mint_record(self, data: Dict) -> Optional[MintRecord]:
+        """从 IPFS 数据重建 MintRecord"""
+        try:
+            return MintRecord(
+                id=data.get("id"),
+                conversation_id=data.get("conversation_id"),
+                message_ids=data.get("message_ids", []),
+                wallet_address=data.get("wallet_address"),
+                ipfs_hash=data.get("ipfs_hash"),
+                metadata_url=data.get("metadata_url"),
+                gateway_url=data.get("gateway_url"),
+                tx_hash=data.get("tx_hash"),
+                token_id=data.get("token_id"),
+                listing_id=data.get("listing_id"),
+                price=data.get("price", 0),
+                is_listed=data.get("is_listed", False),
+                owner_address=data.get("owner_address"),
+                minted_at=datetime.fromisoformat(data.get("minted_at", datetime.now().isoformat())),
+            )
+        except Exception as e:
+            logger.error(f"Failed to parse mint record: {e}")
+            return None
+
+    def get_mint_records(self, wallet_address: str) -> FetchResult:
+        """获取用户的所有铸造记录（超过截止时间时返回部分结果，complete=False）"""
         wallet_key = wallet_address.lower()
-        records = []
+        records = FetchResult()
         
         if self.pinning_service == "pinata":
-            pins = self._query_pinata_pins(
-                wallet_address=wallet_key,
-                data_type="mint_record",
-                limit=1000
-            )
+            if self._needs_sync(wallet_key, "mint_record"):
+                self._reconcile_pins(wallet_key, "mint_record")
             
-            for pin in pins:
-                ipfs_hash = pin.get("ipfs_pin_hash")
-                if ipfs_hash:
-                    data = self._retrieve_from_gateway(ipfs_hash)
-                    if data:
-                        try:
-                            record = MintRecord(
-                                id=data.get("id"),
-                                conversation_id=data.get("conversation_id"),
-                                message_ids=data.get("message_ids", []),
-                                wallet_address=data.get("wallet_address"),
-                                ipfs_hash=data.get("ipfs_hash"),
-                                metadata_url=data.get("metadata_url"),
-                                gateway_url=data.get("gateway_url"),
-                                tx_hash=data.get("tx_hash"),
-                                token_id=data.get("token_id"),
-                                listing_id=data.get("listing_id"),
-                                price=data.get("price", 0),
-                                is_listed=data.get("is_listed", False),
-                                owner_address=data.get("owner_address"),
-                                minted_at=datetime.fromisoformat(data.get("minted_at", datetime.now().isoformat())),
-                            )
-                            records.append(record)
-                            self._mint_record_cache[record.id] = record
-                        except Exception as e:
-                            logger.error(f"Failed to parse mint record: {e}")
+            # 索引中已有内容的直接解析，其余并行拉取
+            missing = {}
+            for row in self._pin_index.list_mints(wallet_key):
+                if row["record"] is None:
+                    missing[row["mint_id"]] = row["ipfs_hash"]
+                    continue
+                record = self._load_indexed_mint(row)
+                if record:
+                    records.append(record)
+            
+            def load(mint_id: str, ipfs_hash: str) -> Optional[MintRecord]:
+                return self._load_indexed_mint({"mint_id": mint_id, "ipfs_hash": ipfs_hash, "record": None})
+            
+            loaded, records.complete = self._fetch_parallel(missing, load)
+            records.extend(loaded)
         else:
             for record in self._mint_record_cache.values():
                 if record.wallet_address.lower() == wallet_key:
@@ -629,11 +1651,72 @@ class StorageService:
         records.sort(key=lambda x: x.minted_at, reverse=True)
         return records
 
+    def _load_indexed_mint(self, row: Dict) -> Optional[MintRecord]:
+        """由索引行加载铸造记录：使用索引中缓存的内容，缺失（如对账发现新版本）时才访问网关并回填索引"""
+        data = row.get("record")
+        if data is None:
+            data = self._retrieve_from_gateway(row["ipfs_hash"])
+            if not data:
+                return None
+            self._pin_index.cache_mint_record(row["mint_id"], row["ipfs_hash"], data)
+        
+        record = self._parse_mint_record(data)
+        if record:
+            self._mint_record_cache[record.id] = record
+        return record
+
+    def _find_mint_rows(
+        self, wallet_key: str, kind: str, item_id: str, lookup: Callable[[], List[Dict]]
+    ) -> List[Dict]:
+        """查询索引；未命中且需要同步时先与 Pinata 增量同步再查一次"""
+        rows = lookup()
+        if rows or not self._needs_sync(wallet_key, "mint_record"):
+            return rows
+        
+        # 负缓存只用于跳过 pinList 同步：近期同步后仍确认不存在的 ID 不再重复同步
+        if self._known_missing(kind, wallet_key, item_id):
+            return rows
+        
+        self._reconcile_pins(wallet_key, "mint_record")
+        rows = lookup()
+        if not rows and not self._needs_sync(wallet_key, "mint_record"):
+            self._remember_missing(kind, wallet_key, item_id)
+        return rows
+
+    def get_mint_record(self, mint_id: str, wallet_address: str) -> Optional[MintRecord]:
+        """按 ID 获取钱包的铸造记录（O(1) 索引查询）"""
+        wallet_key = wallet_address.lower()
+        
+        if self.pinning_service != "pinata":
+            record = self._mint_record_cache.get(mint_id)
+            return record if record and record.wallet_address.lower() == wallet_key else None
+        
+        rows = self._find_mint_rows(
+            wallet_key, "mint", mint_id,
+            lambda: [row for row in [self._pin_index.get_mint(mint_id)] if row],
+        )
+        if not rows or rows[0]["wallet_address"] != wallet_key:
+            return None
+        return self._load_indexed_mint(rows[0])
+
     def get_mint_record_by_conversation(self, conversation_id: str, wallet_address: str) -> Optional[MintRecord]:
-        """根据对话 ID 获取铸造记录"""
-        records = self.get_mint_records(wallet_address)
-        for record in records:
-            if record.conversation_id == conversation_id:
+        """根据对话 ID 获取铸造记录（最新的一条）"""
+        wallet_key = wallet_address.lower()
+        
+        if self.pinning_service != "pinata":
+            matches = [
+                record for record in self._mint_record_cache.values()
+                if record.wallet_address.lower() == wallet_key and record.conversation_id == conversation_id
+            ]
+            return max(matches, key=lambda x: x.minted_at) if matches else None
+        
+        rows = self._find_mint_rows(
+            wallet_key, "mint_by_conversation", conversation_id,
+            lambda: self._pin_index.find_mints_by_conversation(wallet_key, conversation_id),
+        )
+        for row in rows:
+            record = self._load_indexed_mint(row)
+            if record:
                 return record
         return None
 
@@ -646,14 +1729,7 @@ class StorageService:
         is_listed: bool
     ) -> bool:
         """更新铸造记录的上架状态"""
-        # 从缓存获取
-        if mint_id in self._mint_record_cache:
-            record = self._mint_record_cache[mint_id]
-        else:
-            # 从 Pinata 获取
-            records = self.get_mint_records(wallet_address)
-            record = next((r for r in records if r.id == mint_id), None)
-        
+        record = self.get_mint_record(mint_id, wallet_address)
         if not record:
             return False
         
@@ -678,10 +1754,11 @@ class StorageService:
         """上传 NFT 元数据到 IPFS"""
         # 筛选要铸造的消息
         if message_ids:
-            messages_to_mint = [m for m in conversation.messages if m.id in message_ids]
+            positions = conversation.positions_of(message_ids)
         else:
-            messages_to_mint = conversation.messages
-            message_ids = [m.id for m in messages_to_mint]
+            positions = range(len(conversation.messages))
+            message_ids = [m.id for m in conversation.messages]
+        messages_to_mint = [conversation.messages[pos] for pos in positions]
         
         # 构建 NFT 元数据
         metadata = {
@@ -705,15 +1782,24 @@ class StorageService:
         # 上传到 IPFS
         if self.pinning_service == "pinata":
             name = f"nft_{conversation.wallet_address[:10]}_{conversation.id[:8]}"
-            ipfs_hash = self._upload_to_pinata(
-                metadata, name, conversation.wallet_address, "nft_metadata",
-                extra_keyvalues={"conversation_id": conversation.id}
-            )
+            if self._outbox is not None:
+                ipfs_hash = self._enqueue_upload(encode_json(metadata), name, self._pinata_metadata(
+                    name, conversation.wallet_address, "nft_metadata",
+                    extra_keyvalues={"conversation_id": conversation.id},
+                ))
+            else:
+                ipfs_hash = self._upload_to_pinata(
+                    metadata, name, conversation.wallet_address, "nft_metadata",
+                    extra_keyvalues={"conversation_id": conversation.id}
+                )
         elif self.pinning_service == "local" and self.client:
             ipfs_hash = self.client.add_json(metadata)
             self.client.pin.add(ipfs_hash)
         else:
-            ipfs_hash = self._generate_mock_hash(metadata)
+            # 消息叶子哈希复用对话的 Merkle 树，只对元数据的其余字段重新哈希
+            ipfs_hash = self._generate_mock_hash(
+                metadata, conversation.messages_root(positions), content_key="conversation"
+            )
         
         return {
             "ipfs_hash": ipfs_hash,
@@ -722,6 +1808,39 @@ class StorageService:
             "message_ids": message_ids,
         }
 
+    # ============ 快照回收 ============
+
+    def compact_snapshots(
+        self,
+        wallet_address: Optional[str] = None,
+        keep: Optional[int] = None,
+        dry_run: bool = False,
+        background: bool = True,
+    ) -> Dict:
+        """
+        取消固定被替代的对话快照，每个对话只保留最新的 keep 个版本
+        
+        Args:
+            wallet_address: 只处理该钱包（为空则处理本应用的全部 pins）
+            dry_run: 只统计候选数量，不实际取消固定
+            background: 在后台线程执行并立即返回当前进度
+        """
+        if self.pinning_service != "pinata":
+            return {"state": "unavailable", "detail": "Snapshot compaction requires Pinata"}
+        
+        kwargs = {
+            "wallet_address": wallet_address.lower() if wallet_address else None,
+            "keep": keep or settings.SNAPSHOT_GC_KEEP,
+            "dry_run": dry_run,
+            "batch_size": settings.SNAPSHOT_GC_BATCH_SIZE,
+            "batch_interval": settings.SNAPSHOT_GC_BATCH_INTERVAL_SECONDS,
+        }
+        if not background:
+            return self._compactor.run(**kwargs)
+        
+        started = self._compactor.start(**kwargs)
+        return {**self._compactor.status(), "started": started}
+
     # ============ 辅助方法 ============
 
     def get_service_status(self) -> Dict:
@@ -730,9 +1849,25 @@ class StorageService:
             "service": self.pinning_service,
             "available": self.pinning_service != "none",
             "gateway": settings.IPFS_GATEWAY,
+            "gateways": self._gateway_client.stats(),
             "app_identifier": self.APP_IDENTIFIER,
+            "snapshot_encoding": self.snapshot_encoding,
             "cached_conversations": len(self._conversation_cache),
             "cached_mint_records": len(self._mint_record_cache),
+            "caches": {
+                cache.name: cache.stats()
+                for cache in (
+                    self._conversation_cache, self._mint_record_cache, self._data_cache, self._missing_cache
+                )
+            },
+            "pin_index": self._pin_index.stats(),
+            "blob_cache": self._blob_cache.stats() if self._blob_cache else None,
+            "http_hosts": self._http.stats(),
+            "singleflight": self._singleflight.stats(),
+            "compaction": self._compactor.status(),
+            "upload_outbox": self._outbox.stats() if self._outbox else None,
+            "prefetch": self._prefetcher.stats(),
+            "shared_cache": self._shared_cache.stats() if self._shared_cache else None,
         }
 
     def retrieve_content(self, ipfs_hash: str) -> Optional[Dict]:
@@ -0,0 +1,211 @@
+# Durable SQLite outbox for asynchronous Pinata uploads
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 领取任务后的租约时长：工作线程 / 进程崩溃后，租约到期的任务会被重新领取
+LEASE_SECONDS = 120.0
+
+
+class UploadOutbox:
+    """
+    上传发件箱
+
+    CID 在本地按待固定的字节计算后立即返回给调用方，字节和元数据先落盘到 SQLite
+    （synchronous=FULL），再由后台工作线程调用 upload 固定到 Pinata：
+    - 失败按指数退避重试，超过 max_attempts（0 表示不限）或返回的 CID 与本地计算不一致时转为 dead
+    - 进程重启后未完成的任务继续上传；多个进程共享同一个发件箱时通过租约避免重复领取
+    - 上传完成前 get() 可直接提供内容，读路径无需等待网关
+    """
+
+    def __init__(
+        self,
+        path: str,
+        upload: Callable[[bytes, str, Dict], Optional[str]],
+        workers: int = 2,
+        max_attempts: int = 0,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 300.0,
+    ):
+        self.path = path
+        self.upload = upload
+        self.workers = max(1, workers)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.delivered = 0
+        self.retries = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS upload_outbox (
+                cid TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                metadata_json TEXT NOT NULL,
+                content BLOB NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_upload_outbox_due ON upload_outbox (state, next_attempt_at)"
+        )
+        pending = self._conn.execute(
+            "SELECT COUNT(*) FROM upload_outbox WHERE state = 'pending'"
+        ).fetchone()[0]
+        logger.info(f"📮 Upload outbox ready at {path} ({pending} pending)")
+
+    # ============ 入队 / 查询 ============
+
+    def enqueue(self, cid: str, content: bytes, name: str, metadata: Dict) -> None:
+        """持久化一个待上传任务（相同 CID 已在队列中时忽略）；返回即表示已落盘"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO upload_outbox "
+                "(cid, name, metadata_json, content, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (cid, name, json.dumps(metadata), content, time.time(), time.time()),
+            )
+        self._wakeup.set()
+
+    def get(self, cid: str) -> Optional[bytes]:
+        """尚未上传完成（含 dead）的任务内容"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM upload_outbox WHERE cid = ?", (cid,)
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def discard(self, cid: str) -> bool:
+        """取消尚未上传的任务（例如写入冲突后作废的快照），返回是否存在"""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM upload_outbox WHERE cid = ?", (cid,))
+        return cursor.rowcount > 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT state, COUNT(*) FROM upload_outbox GROUP BY state"
+            ).fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM upload_outbox WHERE state = 'pending'"
+            ).fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "dead": counts.get("dead", 0),
+            "delivered": self.delivered,
+            "retries": self.retries,
+            "oldest_pending_seconds": round(time.time() - oldest, 1) if oldest else None,
+            "workers": len(self._threads),
+        }
+
+    # ============ 工作线程 ============
+
+    def _claim(self) -> Optional[tuple]:
+        """领取一个到期任务并续租（BEGIN IMMEDIATE 保证跨进程互斥）"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT cid, name, metadata_json, content, attempts FROM upload_outbox "
+                    "WHERE state = 'pending' AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row:
+                    self._conn.execute(
+                        "UPDATE upload_outbox SET next_attempt_at = ? WHERE cid = ?",
+                        (now + LEASE_SECONDS, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _next_due_in(self) -> float:
+        with self._lock:
+            due = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM upload_outbox WHERE state = 'pending'"
+            ).fetchone()[0]
+        if due is None:
+            return self.retry_max_seconds
+        return min(max(0.0, due - time.time()), self.retry_max_seconds)
+
+    def _fail(self, cid: str, attempts: int, error: str, dead: bool = False) -> None:
+        dead = dead or (self.max_attempts > 0 and attempts >= self.max_attempts)
+        delay = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** (attempts - 1)))
+        with self._lock:
+            self._conn.execute(
+                "UPDATE upload_outbox SET state = ?, attempts = ?, next_attempt_at = ?, last_error = ? "
+                "WHERE cid = ?",
+                ("dead" if dead else "pending", attempts, time.time() + delay, error, cid),
+            )
+            self.retries += 1
+        if dead:
+            logger.error(f"❌ Upload of {cid} abandoned after {attempts} attempts: {error}")
+        else:
+            logger.warning(f"⚠️ Upload of {cid} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+
+    def drain_once(self) -> bool:
+        """处理一个到期任务，没有到期任务时返回 False"""
+        row = self._claim()
+        if row is None:
+            return False
+        cid, name, metadata_json, content, attempts = row
+        attempts += 1
+        try:
+            ipfs_hash = self.upload(bytes(content), name, json.loads(metadata_json))
+        except Exception as e:
+            self._fail(cid, attempts, str(e))
+            return True
+
+        if not ipfs_hash:
+            self._fail(cid, attempts, "upload failed")
+        elif ipfs_hash != cid:
+            # 内容已固定但地址不同：本地记录的 CID 不可访问，保留内容以便排查
+            self._fail(cid, attempts, f"pinned as {ipfs_hash}, expected {cid}", dead=True)
+        else:
+            with self._lock:
+                self._conn.execute("DELETE FROM upload_outbox WHERE cid = ?", (cid,))
+                self.delivered += 1
+        return True
+
+    def _run(self) -> None:
+        while True:
+            try:
+                if self.drain_once():
+                    continue
+            except Exception as e:
+                logger.error(f"❌ Upload outbox worker error: {e}")
+            self._wakeup.wait(self._next_due_in())
+            self._wakeup.clear()
+
+    def start(self) -> None:
+        """启动后台工作线程"""
+        with self._lock:
+            if self._threads:
+                return
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"upload-outbox-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
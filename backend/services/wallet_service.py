@@ -14,21 +14,35 @@ from ..utils.crypto_utils import (
 )
 
 from ..utils.logger import get_logger
+from ..utils.shared_cache import get_shared_cache
 
 logger = get_logger(__name__)
 
 class WalletService:
     def __init__(self):
-        # In production consider Redis or DB to persist nonces
+        # 配置了共享缓存时 nonce 存在共享缓存中（任意 worker 都能完成验证），否则只保存在本进程
         self.active_nonces: Dict[str, str] = {}
+        self.shared_cache = get_shared_cache()
         self.mock_mode = settings.USE_MOCK_SERVICES
 
     def _store_nonce(self, address: str, nonce: str) -> None:
         logger.info(f"Storing nonce for address: {address}")
+        if self.shared_cache is not None:
+            self.shared_cache.set(f"nonce:{address.lower()}", nonce.encode(), settings.AUTH_NONCE_TTL_SECONDS)
+            return
         self.active_nonces[address.lower()] = nonce
 
+    def _get_nonce(self, address: str) -> Optional[str]:
+        if self.shared_cache is not None:
+            value = self.shared_cache.get(f"nonce:{address.lower()}")
+            return value.decode() if value is not None else None
+        return self.active_nonces.get(address.lower())
+
     def _pop_nonce(self, address: str) -> Optional[str]:
         logger.info(f"Popping nonce for address: {address}")
+        if self.shared_cache is not None:
+            value = self.shared_cache.pop(f"nonce:{address.lower()}")
+            return value.decode() if value is not None else None
         return self.active_nonces.pop(address.lower(), None)
 
     def generate_nonce(self, address: str) -> Dict[str, str]:
@@ -51,7 +65,7 @@ class WalletService:
     ) -> Tuple[bool, Optional[str], Optional[str]]:
         """Verify wallet signature and consume nonce once validated."""
         normalized = normalize_address(address or settings.MOCK_WALLET_ADDRESS)
-        expected_nonce = self.active_nonces.get(normalized.lower())
+        expected_nonce = self._get_nonce(normalized)
 
         if not expected_nonce:
             return False, None, "鉴权 nonce 已失效或不存在，请重新获取。"
@@ -69,7 +83,9 @@ class WalletService:
             if not message:
                 message = expected_message
 
-        self._pop_nonce(normalized)
+        # nonce 只能使用一次：并发验证（可能在不同 worker 上）时只有取到 nonce 的一方通过
+        if self._pop_nonce(normalized) != expected_nonce:
+            return False, None, "鉴权 nonce 已失效或不存在，请重新获取。"
         return True, normalized, None
 
     def issue_access_token(self, wallet_address: str) -> str:
@@ -0,0 +1 @@
+# Developer tools (local stand-in services, benchmarks)
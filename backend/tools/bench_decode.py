@@ -0,0 +1,132 @@
+# Micro-benchmark: per-message vs batched decoding of conversation snapshots
+"""
+对比对话快照的解码耗时：
+
+- per_message: json 解析 + 逐条 ChatMessage(**msg)（旧路径）
+- batched:     loads_json（orjson 可用时）+ 缓存的 TypeAdapter 一次校验整个消息列表（当前路径）
+- construct:   model_construct 跳过校验（作为参照：Pydantic v2 下逐字段 Python 构造反而更慢）
+
+    python -m backend.tools.bench_decode --messages 2000 --repeat 20
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from ..models.chat_models import ChatMessage, Conversation, parse_messages
+from ..utils.snapshot_codec import ORJSON_AVAILABLE, encode_json, loads_json
+
+
+def build_snapshot(message_count: int) -> bytes:
+    """生成与头部清单同结构的快照（消息全部放在尾部）"""
+    start = datetime(2024, 1, 1)
+    messages = [
+        {
+            "id": f"msg-{index:06d}",
+            "role": "user" if index % 2 == 0 else "assistant",
+            "content": f"message {index} " + "lorem ipsum dolor sit amet " * 8,
+            "timestamp": (start + timedelta(seconds=index)).isoformat(),
+            "is_minted": index % 10 == 0,
+        }
+        for index in range(message_count)
+    ]
+    return encode_json({
+        "format": "segmented",
+        "id": "bench-conversation",
+        "version": 1,
+        "wallet_address": "0x" + "ab" * 20,
+        "title": "Benchmark",
+        "segments": [],
+        "messages": messages,
+        "created_at": start.isoformat(),
+        "updated_at": (start + timedelta(seconds=message_count)).isoformat(),
+    })
+
+
+def decode_per_message(payload: bytes) -> Conversation:
+    data = json.loads(payload)
+    return Conversation(
+        id=data["id"],
+        wallet_address=data["wallet_address"],
+        title=data["title"],
+        messages=[ChatMessage(**msg) for msg in data["messages"]],
+        created_at=datetime.fromisoformat(data["created_at"]),
+        updated_at=datetime.fromisoformat(data["updated_at"]),
+        version=data["version"],
+    )
+
+
+def decode_batched(payload: bytes) -> Conversation:
+    data = loads_json(payload)
+    return Conversation(
+        id=data["id"],
+        wallet_address=data["wallet_address"],
+        title=data["title"],
+        messages=parse_messages(data["messages"]),
+        created_at=datetime.fromisoformat(data["created_at"]),
+        updated_at=datetime.fromisoformat(data["updated_at"]),
+        version=data["version"],
+    )
+
+
+def decode_construct(payload: bytes) -> Conversation:
+    data = loads_json(payload)
+    return Conversation.model_construct(
+        id=data["id"],
+        wallet_address=data["wallet_address"],
+        title=data["title"],
+        messages=[
+            ChatMessage.model_construct(
+                id=msg["id"],
+                role=msg["role"],
+                content=msg["content"],
+                timestamp=datetime.fromisoformat(msg["timestamp"]),
+                is_minted=msg["is_minted"],
+            )
+            for msg in data["messages"]
+        ],
+        created_at=datetime.fromisoformat(data["created_at"]),
+        updated_at=datetime.fromisoformat(data["updated_at"]),
+        version=data["version"],
+    )
+
+
+def measure(decode: Callable[[bytes], Conversation], payload: bytes, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode(payload)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark snapshot decoding")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = build_snapshot(args.messages)
+    # 各路径结果一致
+    expected = decode_per_message(payload).model_dump()
+    assert decode_batched(payload).model_dump() == expected
+    assert decode_construct(payload).model_dump() == expected
+
+    results: Dict[str, List[float]] = {
+        "per_message": measure(decode_per_message, payload, args.repeat),
+        "batched": measure(decode_batched, payload, args.repeat),
+        "construct": measure(decode_construct, payload, args.repeat),
+    }
+    print(f"{args.messages} messages, {len(payload)} bytes, orjson={'yes' if ORJSON_AVAILABLE else 'no'}")
+    baseline = results["per_message"][len(results["per_message"]) // 2]
+    for name, timings in results.items():
+        median = timings[len(timings) // 2]
+        print(
+            f"{name:>12}: median {median * 1000:8.2f} ms  min {timings[0] * 1000:8.2f} ms  "
+            f"{args.messages / median:10.0f} msg/s  x{baseline / median:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
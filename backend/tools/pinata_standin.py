@@ -0,0 +1,386 @@
+# Local stand-in for the Pinata pinning API and IPFS gateway (offline load testing)
+"""
+本地 Pinata / IPFS 网关替身服务
+
+实现后端用到的 Pinata 接口，CID 按真实的 UnixFS 规则在本地计算：
+- POST   /pinning/pinJSONToIPFS
+- POST   /pinning/pinFileToIPFS
+- GET    /data/pinList（keyvalues 过滤、pageLimit / pageOffset、pinStart / pinEnd）
+- DELETE /pinning/unpin/<cid>
+- GET    /data/testAuthentication
+- GET    /ipfs/<cid>
+
+可注入延迟、错误率和 429 限流，便于在单机上可复现地压测存储吞吐：
+
+    python -m backend.tools.pinata_standin --port 8787 --latency-ms 80 --jitter-ms 40 \\
+        --error-rate 0.01 --throttle-rate 0.02 --seed 42
+
+后端指向替身服务：
+
+    PINATA_API_URL=http://127.0.0.1:8787
+    IPFS_GATEWAY=http://127.0.0.1:8787/ipfs/
+    IPFS_GATEWAYS='["http://127.0.0.1:8787/ipfs/"]'
+
+运行时可通过 GET/POST /_standin/faults 查看或调整故障参数，GET /_standin/stats 查看请求统计。
+"""
+import argparse
+import fnmatch
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from flask import Flask, Response, jsonify, request
+
+from ..utils.cid import compute_cid
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class Faults:
+    """故障注入参数"""
+
+    latency_ms: float = 0.0  # 每个请求的基础延迟
+    jitter_ms: float = 0.0  # 在基础延迟上叠加 [-jitter, +jitter] 的均匀抖动
+    error_rate: float = 0.0  # 返回 500 的概率
+    throttle_rate: float = 0.0  # 返回 429 的概率
+    rate_limit: float = 0.0  # 每秒允许的请求数（令牌桶，超出返回 429；0 表示不限制）
+    retry_after: int = 1  # 429 响应的 Retry-After（秒）
+    gateway: bool = True  # 故障是否同样作用于 /ipfs/ 网关请求
+
+
+@dataclass
+class _Pin:
+    cid: str
+    content: bytes
+    name: Optional[str]
+    keyvalues: Dict
+    date_pinned: str
+    id: str
+
+    def row(self) -> Dict:
+        return {
+            "id": self.id,
+            "ipfs_pin_hash": self.cid,
+            "size": len(self.content),
+            "user_id": "standin",
+            "date_pinned": self.date_pinned,
+            "date_unpinned": None,
+            "metadata": {"name": self.name, "keyvalues": self.keyvalues},
+            "regions": [],
+            "mime_type": None,
+            "number_of_files": 1,
+        }
+
+
+class PinStore:
+    """内存中的 pin 存储（线程安全），CID 由内容计算"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pins: Dict[str, _Pin] = {}
+        self._last_pinned: Optional[datetime] = None
+
+    def _next_timestamp(self) -> str:
+        # date_pinned 严格递增，保证 pinStart 增量同步的游标可靠
+        now = datetime.now(timezone.utc)
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        if self._last_pinned is not None and now <= self._last_pinned:
+            now = self._last_pinned + timedelta(milliseconds=1)
+        self._last_pinned = now
+        return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+
+    def pin(self, content: bytes, metadata: Optional[Dict]) -> Dict:
+        cid = compute_cid(content)
+        metadata = metadata or {}
+        with self._lock:
+            existing = self._pins.get(cid)
+            if existing is not None:
+                # 与 Pinata 一致：重复固定返回 isDuplicate，保留原有元数据
+                return {"IpfsHash": cid, "PinSize": len(content), "Timestamp": existing.date_pinned, "isDuplicate": True}
+            pin = _Pin(
+                cid=cid,
+                content=content,
+                name=metadata.get("name"),
+                keyvalues={k: str(v) for k, v in (metadata.get("keyvalues") or {}).items()},
+                date_pinned=self._next_timestamp(),
+                id=str(uuid.uuid4()),
+            )
+            self._pins[cid] = pin
+        return {"IpfsHash": cid, "PinSize": len(content), "Timestamp": pin.date_pinned}
+
+    def unpin(self, cid: str) -> bool:
+        with self._lock:
+            return self._pins.pop(cid, None) is not None
+
+    def get(self, cid: str) -> Optional[bytes]:
+        with self._lock:
+            pin = self._pins.get(cid)
+        return pin.content if pin else None
+
+    def query(
+        self,
+        keyvalues: Dict,
+        name: Optional[str],
+        pin_start: Optional[str],
+        pin_end: Optional[str],
+        limit: int,
+        offset: int,
+    ) -> Dict:
+        with self._lock:
+            pins = list(self._pins.values())
+        matched = [
+            pin for pin in pins
+            if (not name or pin.name == name)
+            and (not pin_start or pin.date_pinned >= pin_start)
+            and (not pin_end or pin.date_pinned <= pin_end)
+            and all(_match_keyvalue(pin.keyvalues.get(key), spec) for key, spec in keyvalues.items())
+        ]
+        # Pinata 默认按固定时间倒序返回
+        matched.sort(key=lambda pin: pin.date_pinned, reverse=True)
+        return {"count": len(matched), "rows": [pin.row() for pin in matched[offset:offset + limit]]}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._pins)
+
+
+def _like(value: str, pattern: str, ignore_case: bool) -> bool:
+    # SQL LIKE：% 匹配任意串，_ 匹配单个字符
+    pattern = pattern.replace("*", "[*]").replace("?", "[?]").replace("%", "*").replace("_", "?")
+    if ignore_case:
+        return fnmatch.fnmatchcase(value.lower(), pattern.lower())
+    return fnmatch.fnmatchcase(value, pattern)
+
+
+def _match_keyvalue(actual: Optional[str], spec) -> bool:
+    """按 Pinata keyvalues 过滤语法匹配：{"value": ..., "op": "eq"}"""
+    if not isinstance(spec, dict):
+        spec = {"value": spec, "op": "eq"}
+    op = spec.get("op", "eq")
+    expected = spec.get("value")
+    if op == "ne":
+        return actual != str(expected)
+    if actual is None:
+        return False
+    if op == "eq":
+        return actual == str(expected)
+    if op in ("gt", "gte", "lt", "lte"):
+        try:
+            left, right = float(actual), float(expected)
+        except (TypeError, ValueError):
+            left, right = actual, str(expected)
+        return {"gt": left > right, "gte": left >= right, "lt": left < right, "lte": left <= right}[op]
+    if op in ("like", "iLike"):
+        return _like(actual, str(expected), op == "iLike")
+    if op in ("notLike", "notILike"):
+        return not _like(actual, str(expected), op == "notILike")
+    if op == "between":
+        low, high = expected if isinstance(expected, (list, tuple)) else (None, None)
+        return low is not None and str(low) <= actual <= str(high)
+    return False
+
+
+class FaultInjector:
+    """按 Faults 参数注入延迟、500 和 429（使用固定种子的随机数，结果可复现）"""
+
+    def __init__(self, faults: Faults, seed: Optional[int] = None):
+        self.faults = faults
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens = faults.rate_limit
+        self._refilled_at = time.monotonic()
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+
+    def _take_token(self) -> bool:
+        rate = self.faults.rate_limit
+        if rate <= 0:
+            return True
+        now = time.monotonic()
+        self._tokens = min(rate, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def apply(self, gateway: bool) -> Optional[Response]:
+        """返回需要注入的错误响应；None 表示正常处理"""
+        faults = self.faults
+        with self._lock:
+            self.stats["requests"] += 1
+            if gateway and not faults.gateway:
+                return None
+            delay = faults.latency_ms + self._random.uniform(-faults.jitter_ms, faults.jitter_ms)
+            roll = self._random.random()
+            allowed = self._take_token()
+
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        if not allowed or roll < faults.throttle_rate:
+            with self._lock:
+                self.stats["throttled"] += 1
+            response = jsonify({"error": {"reason": "RATE_LIMITED", "details": "Too many requests"}})
+            response.status_code = 429
+            response.headers["Retry-After"] = str(faults.retry_after)
+            return response
+        if roll < faults.throttle_rate + faults.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            response = jsonify({"error": {"reason": "INTERNAL_SERVER_ERROR", "details": "Injected failure"}})
+            response.status_code = 500
+            return response
+        return None
+
+
+def _error(status: int, reason: str, details: str):
+    return jsonify({"error": {"reason": reason, "details": details}}), status
+
+
+def create_app(
+    faults: Optional[Faults] = None,
+    seed: Optional[int] = None,
+    jwt: Optional[str] = None,
+    store: Optional[PinStore] = None,
+) -> Flask:
+    """
+    创建替身服务
+
+    Args:
+        jwt: 指定时只接受该 JWT（Bearer）；否则任意非空凭证均视为有效
+    """
+    app = Flask(__name__)
+    store = store if store is not None else PinStore()
+    injector = FaultInjector(faults or Faults(), seed)
+    app.config["PIN_STORE"] = store
+    app.config["FAULT_INJECTOR"] = injector
+
+    def authorized() -> bool:
+        auth = request.headers.get("Authorization", "")
+        if jwt is not None:
+            return auth == f"Bearer {jwt}"
+        return auth.startswith("Bearer ") or bool(
+            request.headers.get("pinata_api_key") and request.headers.get("pinata_secret_api_key")
+        )
+
+    @app.before_request
+    def inject_faults():
+        if request.path.startswith("/_standin/"):
+            return None
+        gateway = request.path.startswith("/ipfs/")
+        injected = injector.apply(gateway)
+        if injected is not None:
+            return injected
+        if not gateway and not authorized():
+            return _error(401, "INVALID_CREDENTIALS", "Invalid/expired credentials")
+        return None
+
+    @app.route("/data/testAuthentication")
+    def test_authentication():
+        return jsonify({"message": "Congratulations! You are communicating with the Pinata API!"})
+
+    @app.route("/pinning/pinJSONToIPFS", methods=["POST"])
+    def pin_json():
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or "pinataContent" not in payload:
+            return _error(400, "INVALID_JSON", "pinataContent is required")
+        content = json.dumps(payload["pinataContent"], separators=(",", ":"), ensure_ascii=False).encode()
+        return jsonify(store.pin(content, payload.get("pinataMetadata")))
+
+    @app.route("/pinning/pinFileToIPFS", methods=["POST"])
+    def pin_file():
+        upload = request.files.get("file")
+        if upload is None:
+            return _error(400, "NO_FILE", "file is required")
+        try:
+            metadata = json.loads(request.form.get("pinataMetadata") or "{}")
+        except ValueError:
+            return _error(400, "INVALID_METADATA", "pinataMetadata must be JSON")
+        return jsonify(store.pin(upload.read(), metadata))
+
+    @app.route("/data/pinList")
+    def pin_list():
+        if request.args.get("status", "pinned") not in ("pinned", "all"):
+            return jsonify({"count": 0, "rows": []})
+        try:
+            metadata = json.loads(request.args.get("metadata") or "{}")
+            keyvalues = metadata.get("keyvalues") or json.loads(request.args.get("metadata[keyvalues]") or "{}")
+            limit = min(int(request.args.get("pageLimit", 10)), 1000)
+            offset = int(request.args.get("pageOffset", 0))
+        except ValueError:
+            return _error(400, "INVALID_QUERY", "Invalid pinList parameters")
+        return jsonify(store.query(
+            keyvalues=keyvalues,
+            name=metadata.get("name") or request.args.get("metadata[name]"),
+            pin_start=request.args.get("pinStart"),
+            pin_end=request.args.get("pinEnd"),
+            limit=limit,
+            offset=offset,
+        ))
+
+    @app.route("/pinning/unpin/<cid>", methods=["DELETE"])
+    def unpin(cid: str):
+        if not store.unpin(cid):
+            return _error(404, "CURRENT_USER_HAS_NOT_PINNED_CID", f"The current user has not pinned the cid: {cid}")
+        return Response("OK", mimetype="text/plain")
+
+    @app.route("/ipfs/<cid>")
+    def gateway(cid: str):
+        content = store.get(cid)
+        if content is None:
+            return Response("not found", status=404, mimetype="text/plain")
+        return Response(content, mimetype="application/octet-stream", headers={"Etag": f'"{cid}"'})
+
+    @app.route("/_standin/faults", methods=["GET", "POST"])
+    def configure_faults():
+        if request.method == "POST":
+            for key, value in (request.get_json(silent=True) or {}).items():
+                if hasattr(injector.faults, key):
+                    setattr(injector.faults, key, type(getattr(injector.faults, key))(value))
+        return jsonify(asdict(injector.faults))
+
+    @app.route("/_standin/stats")
+    def stats():
+        return jsonify({**injector.stats, "pins": len(store)})
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local Pinata / IPFS gateway stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second, 0 = unlimited")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--no-gateway-faults", action="store_true", help="do not inject faults on /ipfs/")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--jwt", default=None, help="only accept this JWT (default: accept any credentials)")
+    args = parser.parse_args(argv)
+
+    faults = Faults(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        gateway=not args.no_gateway_faults,
+    )
+    app = create_app(faults, seed=args.seed, jwt=args.jwt)
+    logger.info(f"🧪 Pinata stand-in listening on http://{args.host}:{args.port} ({faults})")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Bounded in-memory caches with size accounting, LRU/TTL eviction and hit/miss counters
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """粗略估算对象占用的字节数（字符串按长度计，容器递归累加）"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return 8
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value) + 48
+    if isinstance(value, BaseModel):
+        return estimate_size(value.__dict__)
+    if isinstance(value, dict):
+        return 64 + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return 56 + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class BoundedCache:
+    """
+    线程安全的有界缓存
+
+    - max_bytes / max_entries: 超出预算时按 LRU 淘汰（0 表示不限制）
+    - ttl_seconds: 条目过期时间（0 表示永不过期）
+    - 统计命中 / 未命中 / 淘汰 / 过期次数，供状态接口展示
+
+    提供 dict 风格接口（get / [] / in / pop / values），可直接替换普通 dict 缓存。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_bytes: int = 0,
+        max_entries: int = 0,
+        ttl_seconds: float = 0,
+        sizeof: Callable[[Any], int] = estimate_size,
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._sizeof = sizeof
+
+        # key -> (value, size, expires_at)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # ============ 内部方法 ============
+
+    def _expired(self, expires_at: float, now: float) -> bool:
+        return expires_at and now >= expires_at
+
+    def _remove(self, key: Hashable) -> Any:
+        value, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        return value
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的条目直到满足预算"""
+        while self._entries and (
+            (self.max_bytes and self._bytes > self.max_bytes)
+            or (self.max_entries and len(self._entries) > self.max_entries)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    # ============ 公共接口 ============
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[2], time.monotonic()):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        size = self._sizeof(value)
+        expires_at = time.monotonic() + ttl if ttl else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            self._evict()
+
+    def replace(self, key: Hashable, expected: Any, value: Any, ttl_seconds: Optional[float] = None) -> bool:
+        """仅当当前值仍是 expected（同一对象）时写入 value，用于后台刷新避免覆盖更新的写入"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not expected:
+                return False
+            self.set(key, value, ttl_seconds)
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return default
+            return self._remove(key)
+
+    def remaining_ttl(self, key: Hashable) -> Optional[float]:
+        """条目剩余有效时间（秒）；不存在返回 None，永不过期返回 inf"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not entry[2]:
+                return float("inf")
+            return max(0.0, entry[2] - time.monotonic())
+
+    def values(self) -> List[Any]:
+        """返回未过期条目的快照（不影响 LRU 顺序和命中统计）"""
+        now = time.monotonic()
+        with self._lock:
+            return [value for value, _, expires_at in self._entries.values() if not self._expired(expires_at, now)]
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                (key, value)
+                for key, (value, _, expires_at) in self._entries.items()
+                if not self._expired(expires_at, now)
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __getitem__(self, key: Hashable) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable) -> None:
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and not self._expired(entry[2], time.monotonic())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter([key for key, _ in self.items()])
@@ -0,0 +1,119 @@
+# Local IPFS CID computation (CIDv0, UnixFS/dag-pb, balanced layout as used by kubo and Pinata)
+import hashlib
+from typing import List, Optional, Tuple
+
+CHUNK_SIZE = 256 * 1024  # kubo 默认的固定大小分块
+MAX_LINKS = 174  # balanced layout 每个节点的最大链接数
+
+_B58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def base58btc(data: bytes) -> str:
+    """Base58 (bitcoin 字母表) 编码"""
+    number = int.from_bytes(data, "big")
+    encoded = ""
+    while number:
+        number, remainder = divmod(number, 58)
+        encoded = _B58_ALPHABET[remainder] + encoded
+    leading_zeros = len(data) - len(data.lstrip(b"\x00"))
+    return "1" * leading_zeros + encoded
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field_varint(field: int, value: int) -> bytes:
+    return _varint(field << 3) + _varint(value)
+
+
+def _field_bytes(field: int, value: bytes) -> bytes:
+    return _varint((field << 3) | 2) + _varint(len(value)) + value
+
+
+def _multihash(block: bytes) -> bytes:
+    """sha2-256 multihash"""
+    return b"\x12\x20" + hashlib.sha256(block).digest()
+
+
+def _unixfs_file(data: Optional[bytes], filesize: int, blocksizes: List[int]) -> bytes:
+    """UnixFS Data 消息（Type=File）"""
+    out = _field_varint(1, 2)
+    if data is not None:
+        out += _field_bytes(2, data)
+    out += _field_varint(3, filesize)
+    for size in blocksizes:
+        out += _field_varint(4, size)
+    return out
+
+
+class _Node:
+    """构建中的 dag-pb 节点：links 为 (multihash, 累计大小 Tsize, 文件字节数)"""
+
+    def __init__(self):
+        self.links: List[Tuple[bytes, int, int]] = []
+
+    def encode(self) -> Tuple[bytes, int, int]:
+        """返回 (编码后的块, 子树累计大小, 文件字节数)"""
+        filesize = sum(link[2] for link in self.links)
+        block = b""
+        for multihash, tsize, _ in self.links:
+            link = _field_bytes(1, multihash) + _field_bytes(2, b"") + _field_varint(3, tsize)
+            block += _field_bytes(2, link)
+        block += _field_bytes(1, _unixfs_file(None, filesize, [link[2] for link in self.links]))
+        return block, len(block) + sum(link[1] for link in self.links), filesize
+
+
+def _leaf(chunk: bytes) -> Tuple[bytes, int, int]:
+    # 空文件不写 Data 字段
+    block = _field_bytes(1, _unixfs_file(chunk or None, len(chunk), []))
+    return block, len(block), len(chunk)
+
+
+def is_cidv0(value: str) -> bool:
+    """是否为 CIDv0（sha2-256 multihash 的 base58btc 编码，固定 46 个字符）"""
+    return len(value) == 46 and value.startswith("Qm")
+
+
+def compute_cid(content: bytes, chunk_size: int = CHUNK_SIZE, max_links: int = MAX_LINKS) -> str:
+    """
+    计算内容以文件形式添加到 IPFS 时的 CIDv0（Qm...）
+
+    与 `ipfs add`（kubo 默认参数：256KiB 固定分块、balanced layout、非 raw leaves）
+    以及 Pinata pinFileToIPFS 默认生成的 CID 一致，可在上传前得到内容地址。
+    """
+    chunks = [content[offset:offset + chunk_size] for offset in range(0, len(content), chunk_size)] or [b""]
+    position = 0
+
+    def fill(node: _Node, depth: int) -> None:
+        """按 balanced layout 填充节点：depth 为 1 时挂叶子，否则递归填充子树"""
+        nonlocal position
+        while len(node.links) < max_links and position < len(chunks):
+            if depth == 1:
+                block, tsize, filesize = _leaf(chunks[position])
+                position += 1
+            else:
+                child = _Node()
+                fill(child, depth - 1)
+                block, tsize, filesize = child.encode()
+            node.links.append((_multihash(block), tsize, filesize))
+
+    block, tsize, filesize = _leaf(chunks[0])
+    position = 1
+    depth = 1
+    while position < len(chunks):
+        # 原根节点作为新根的第一个子节点，再按当前深度填满新根
+        root = _Node()
+        root.links.append((_multihash(block), tsize, filesize))
+        fill(root, depth)
+        block, tsize, filesize = root.encode()
+        depth += 1
+    return base58btc(_multihash(block))
@@ -0,0 +1,106 @@
+# Shared pooled HTTP client for outbound calls (Pinata, IPFS gateways, RPC)
+import threading
+from functools import lru_cache
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import settings
+
+
+class HostStats:
+    """单个主机的请求统计"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.requests = 0
+        self.errors = 0
+        self.ewma_latency_ms = None
+
+    def record(self, latency_ms: Optional[float] = None, error: bool = False) -> None:
+        self.requests += 1
+        if error:
+            self.errors += 1
+        if latency_ms is not None:
+            if self.ewma_latency_ms is None:
+                self.ewma_latency_ms = latency_ms
+            else:
+                self.ewma_latency_ms = (1 - self.alpha) * self.ewma_latency_ms + self.alpha * latency_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "ewma_latency_ms": round(self.ewma_latency_ms, 1) if self.ewma_latency_ms is not None else None,
+        }
+
+
+class HttpClient:
+    """
+    共享的出站 HTTP 客户端
+
+    - 单个 requests.Session，按主机维护 keep-alive 连接池，避免每次请求重新握手 TCP + TLS
+    - 连接池数量 / 每池连接数 / 默认超时均可配置
+    - 通过响应 hook 记录每个主机的延迟（包括直接复用 session 的 Web3 RPC 请求）
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 32, timeout: float = 30.0):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.hooks["response"].append(self._on_response)
+
+        self._stats: Dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _host_stats(self, url: str) -> HostStats:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._stats:
+                self._stats[host] = HostStats()
+            return self._stats[host]
+
+    def _on_response(self, response: requests.Response, *args, **kwargs) -> None:
+        stats = self._host_stats(response.url)
+        latency_ms = response.elapsed.total_seconds() * 1000
+        with self._lock:
+            stats.record(latency_ms, error=response.status_code >= 500)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """发送请求（默认使用 HTTP_TIMEOUT_SECONDS 超时）；连接失败等异常计入主机错误数"""
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException:
+            stats = self._host_stats(url)
+            with self._lock:
+                stats.record(error=True)
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        """各主机的请求数、错误数与 EWMA 延迟"""
+        with self._lock:
+            return {host: stats.to_dict() for host, stats in self._stats.items()}
+
+
+@lru_cache
+def get_http_client() -> HttpClient:
+    """返回进程内共享的 HTTP 客户端"""
+    return HttpClient(
+        pool_connections=settings.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        timeout=settings.HTTP_TIMEOUT_SECONDS,
+    )
@@ -0,0 +1,23 @@
+# Lock striping for per-key mutual exclusion with a fixed number of locks
+import threading
+import zlib
+from typing import List
+
+
+class StripedLock:
+    """
+    分段锁
+
+    按 key 的哈希把 key 映射到固定数量的可重入锁之一：相同 key 的操作互斥，
+    不同 key 大多落在不同的锁上可以并行，且锁的数量不随 key 的数量增长。
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks: List[threading.RLock] = [threading.RLock() for _ in range(max(1, stripes))]
+
+    def lock_for(self, key: str) -> threading.RLock:
+        # crc32 在进程内外都稳定，便于排查日志中的锁冲突
+        return self._locks[zlib.crc32(key.encode()) % len(self._locks)]
+
+    def __len__(self) -> int:
+        return len(self._locks)
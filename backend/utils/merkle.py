@@ -0,0 +1,90 @@
+# Incremental Merkle tree for content hashing (append / update in O(log n))
+import hashlib
+import json
+from typing import Any, List, Sequence
+
+# 叶子与内部节点使用不同前缀，避免二者哈希碰撞（同 RFC 6962）
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+EMPTY_ROOT = hashlib.sha256(b"").digest()
+
+
+def hash_leaf(data: Any) -> bytes:
+    """对可 JSON 序列化的数据做规范化序列化后计算叶子哈希"""
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(_LEAF_PREFIX + content.encode()).digest()
+
+
+def hash_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(_NODE_PREFIX + left + right).digest()
+
+
+def merkle_root(leaves: Sequence[bytes]) -> bytes:
+    """一次性计算叶子哈希序列的根（与 MerkleTree 的结果一致）"""
+    if not leaves:
+        return EMPTY_ROOT
+    level = list(leaves)
+    while len(level) > 1:
+        level = [
+            hash_node(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+    return level[0]
+
+
+class MerkleTree:
+    """
+    增量 Merkle 树
+
+    保存每一层的全部节点：追加叶子时只重算各层最后一个节点，修改叶子时只重算其到根的路径，
+    均为 O(log n) 次哈希。落单的节点原样提升到上一层。
+    """
+
+    def __init__(self, leaves: Sequence[bytes] = ()):
+        self._levels: List[List[bytes]] = [[]]
+        for leaf in leaves:
+            self.append(leaf)
+
+    def __len__(self) -> int:
+        return len(self._levels[0])
+
+    @property
+    def leaves(self) -> List[bytes]:
+        return self._levels[0]
+
+    def append(self, leaf: bytes) -> None:
+        self._levels[0].append(leaf)
+        self._rehash(len(self._levels[0]) - 1)
+
+    def update(self, index: int, leaf: bytes) -> None:
+        if self._levels[0][index] == leaf:
+            return
+        self._levels[0][index] = leaf
+        self._rehash(index)
+
+    def _rehash(self, index: int) -> None:
+        """从叶子 index 向上重算到根"""
+        depth = 0
+        while len(self._levels[depth]) > 1:
+            level = self._levels[depth]
+            if depth + 1 == len(self._levels):
+                self._levels.append([])
+            parent_level = self._levels[depth + 1]
+            left = index & ~1
+            node = hash_node(level[left], level[left + 1]) if left + 1 < len(level) else level[left]
+            parent = index >> 1
+            if parent < len(parent_level):
+                parent_level[parent] = node
+            else:
+                parent_level.append(node)
+            index = parent
+            depth += 1
+
+    def root(self) -> bytes:
+        if not self._levels[0]:
+            return EMPTY_ROOT
+        return self._levels[-1][0]
+
+    def range_root(self, start: int, end: int) -> bytes:
+        """leaves[start:end] 子序列的根（例如封存分段），无需重新序列化消息"""
+        return merkle_root(self._levels[0][start:end])
@@ -0,0 +1,88 @@
+# Opaque cursors for keyset pagination
+import base64
+import json
+from typing import Callable, List, Optional, Tuple, TypeVar
+
+from .validation import ValidationError
+
+T = TypeVar("T")
+
+
+def encode_cursor(sort_key: str, item_id: str) -> str:
+    """将 (排序键, ID) 编码为不透明的游标字符串"""
+    raw = json.dumps([sort_key, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """解码游标；为空返回 None，格式错误抛出 ValidationError"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        sort_key, item_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValidationError(f"无效的分页游标: {cursor}") from e
+    if not isinstance(sort_key, str) or not isinstance(item_id, str):
+        raise ValidationError(f"无效的分页游标: {cursor}")
+    return sort_key, item_id
+
+
+def parse_page_args(
+    limit: Optional[str],
+    before: Optional[str],
+    after: Optional[str],
+    max_limit: int,
+) -> Tuple[Optional[int], Optional[Tuple[str, str]], Optional[Tuple[str, str]]]:
+    """校验分页查询参数；未提供 limit 时返回 None（不分页）"""
+    if before and after:
+        raise ValidationError("before 和 after 不能同时指定。")
+    page_limit = None
+    if limit is not None:
+        try:
+            page_limit = int(limit)
+        except ValueError as e:
+            raise ValidationError(f"limit 必须是整数: {limit}") from e
+        if page_limit <= 0:
+            raise ValidationError("limit 必须大于 0。")
+        page_limit = min(page_limit, max_limit)
+    elif before or after:
+        page_limit = max_limit
+    return page_limit, decode_cursor(before), decode_cursor(after)
+
+
+def paginate(
+    items: List[T],
+    key: Callable[[T], Tuple[str, str]],
+    limit: int,
+    before: Optional[Tuple[str, str]] = None,
+    after: Optional[Tuple[str, str]] = None,
+) -> Tuple[List[T], bool]:
+    """对内存中的列表按 key 倒序分页，返回 (当前页, 该方向是否还有更多)"""
+    ordered = sorted(items, key=key, reverse=True)
+    if after:
+        newer = [item for item in ordered if key(item) > after]
+        return newer[-limit:], len(newer) > limit
+    if before:
+        ordered = [item for item in ordered if key(item) < before]
+    return ordered[:limit], len(ordered) > limit
+
+
+def page_cursors(
+    keys: List[Tuple[str, str]],
+    has_more: bool,
+    before: Optional[Tuple[str, str]] = None,
+    after: Optional[Tuple[str, str]] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    根据当前页首尾元素生成 (next_cursor, prev_cursor)
+
+    next_cursor 作为 before 获取更旧的一页，prev_cursor 作为 after 获取更新的一页；
+    对应方向没有数据时为 None。
+    """
+    if not keys:
+        return None, None
+    first, last = keys[0], keys[-1]
+    if after:
+        return encode_cursor(*last), encode_cursor(*first) if has_more else None
+    return encode_cursor(*last) if has_more else None, encode_cursor(*first) if before else None
@@ -0,0 +1,350 @@
+# Shared cross-process cache tier (Redis or SQLite) with invalidation broadcast
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import settings
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 可选依赖：redis 后端需要 redis-py（也可注入任何兼容的客户端，例如测试用的 fakeredis）
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+InvalidationHandler = Callable[[Dict], None]
+
+
+class SharedCache(ABC):
+    """
+    跨进程共享缓存（L2）
+
+    多个 worker 进程共享同一份缓存数据和一次性数据（如登录 nonce），
+    并通过广播失效消息让各进程的本地缓存（L1）保持一致。值统一为 bytes。
+    """
+
+    backend = "base"
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        # 进程标识：忽略自己发出的失效消息
+        self.origin = uuid.uuid4().hex
+        self._handlers: List[InvalidationHandler] = []
+        self._handlers_lock = threading.Lock()
+        self.published = 0
+        self.received = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """读取值（不存在或已过期时返回 None）"""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl_seconds: float = 0) -> None:
+        """写入值，ttl_seconds 为 0 表示不过期"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除值"""
+
+    @abstractmethod
+    def pop(self, key: str) -> Optional[bytes]:
+        """原子地读取并删除（同一个值只会被一个进程取到）"""
+
+    @abstractmethod
+    def _publish(self, payload: str) -> None:
+        """把序列化后的失效消息发送给其他进程"""
+
+    @abstractmethod
+    def _start_listener(self) -> None:
+        """启动后台线程接收其他进程的失效消息，收到后调用 _dispatch"""
+
+    def publish(self, message: Dict) -> None:
+        """向其他进程广播失效消息"""
+        try:
+            self._publish(json.dumps({**message, "origin": self.origin}))
+            self.published += 1
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to publish cache invalidation: {e}")
+
+    def subscribe(self, handler: InvalidationHandler) -> None:
+        """注册失效消息处理函数（首次注册时启动监听线程）"""
+        with self._handlers_lock:
+            self._handlers.append(handler)
+            if len(self._handlers) == 1:
+                self._start_listener()
+
+    def _dispatch(self, payload: Any) -> None:
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        for handler in list(self._handlers):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.warning(f"⚠️ Cache invalidation handler failed: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "invalidations_published": self.published,
+            "invalidations_received": self.received,
+        }
+
+
+class RedisSharedCache(SharedCache):
+    """Redis 后端：键值带 TTL，失效消息通过 Pub/Sub 广播"""
+
+    backend = "redis"
+
+    def __init__(self, client: Any, prefix: str = ""):
+        super().__init__(prefix)
+        self.client = client
+        self.channel = self._key("invalidate")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self._key(key))
+
+    def set(self, key: str, value: bytes, ttl_seconds: float = 0) -> None:
+        if ttl_seconds:
+            self.client.set(self._key(key), value, px=int(ttl_seconds * 1000))
+        else:
+            self.client.set(self._key(key), value)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self._key(key))
+
+    def pop(self, key: str) -> Optional[bytes]:
+        # GET + DEL 放在 MULTI/EXEC 事务中执行（兼容不支持 GETDEL 的 Redis 版本）
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.get(self._key(key))
+        pipeline.delete(self._key(key))
+        value, _ = pipeline.execute()
+        return value
+
+    def _publish(self, payload: str) -> None:
+        self.client.publish(self.channel, payload)
+
+    def _start_listener(self) -> None:
+        def listen() -> None:
+            while True:
+                try:
+                    pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(self.channel)
+                    for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._dispatch(message.get("data"))
+                except Exception as e:
+                    logger.warning(f"⚠️ Redis invalidation listener error, reconnecting: {e}")
+                    time.sleep(1)
+
+        threading.Thread(target=listen, name="shared-cache-listener", daemon=True).start()
+
+
+class SqliteSharedCache(SharedCache):
+    """
+    SQLite 后端：同一主机上的多个 worker 共享一个数据库文件（WAL 模式）
+
+    失效消息写入 invalidations 表，各进程的监听线程按 poll_seconds 轮询新消息。
+    """
+
+    backend = "sqlite"
+
+    # 失效消息保留时长（秒），超过后清理
+    RETENTION_SECONDS = 300
+
+    def __init__(self, path: str, prefix: str = "", poll_seconds: float = 0.5):
+        super().__init__(prefix)
+        self.path = path
+        self.poll_seconds = poll_seconds
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            """
+        )
+        # 只接收启动之后的失效消息
+        self._last_seen = self._conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM cache_invalidations"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache_entries WHERE key = ?", (self._key(key),)
+            ).fetchone()
+        if row is None or (row[1] and row[1] < time.time()):
+            return None
+        return bytes(row[0])
+
+    def set(self, key: str, value: bytes, ttl_seconds: float = 0) -> None:
+        expires_at = time.time() + ttl_seconds if ttl_seconds else 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (self._key(key), value, expires_at),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (self._key(key),))
+
+    def pop(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM cache_entries WHERE key = ?", (self._key(key),)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache_entries WHERE key = ?", (self._key(key),))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None or (row[1] and row[1] < time.time()):
+            return None
+        return bytes(row[0])
+
+    def _publish(self, payload: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cache_invalidations (payload, created_at) VALUES (?, ?)",
+                (payload, time.time()),
+            )
+
+    def _poll(self) -> None:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM cache_invalidations WHERE id > ? ORDER BY id",
+                (self._last_seen,),
+            ).fetchall()
+        for row_id, payload in rows:
+            self._last_seen = row_id
+            self._dispatch(payload)
+
+    def _cleanup(self) -> None:
+        """清理过期的缓存条目和旧的失效消息"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM cache_entries WHERE expires_at > 0 AND expires_at < ?", (now,)
+            )
+            self._conn.execute(
+                "DELETE FROM cache_invalidations WHERE created_at < ?", (now - self.RETENTION_SECONDS,)
+            )
+
+    def _start_listener(self) -> None:
+        def listen() -> None:
+            last_cleanup = time.monotonic()
+            while True:
+                time.sleep(self.poll_seconds)
+                try:
+                    self._poll()
+                    if time.monotonic() - last_cleanup > 60:
+                        self._cleanup()
+                        last_cleanup = time.monotonic()
+                except Exception as e:
+                    logger.warning(f"⚠️ Shared cache poll error: {e}")
+
+        threading.Thread(target=listen, name="shared-cache-listener", daemon=True).start()
+
+
+def create_shared_cache(
+    backend: str,
+    url: Optional[str] = None,
+    sqlite_path: Optional[str] = None,
+    prefix: str = "",
+    poll_seconds: float = 0.5,
+    client: Any = None,
+) -> Optional[SharedCache]:
+    """
+    按配置创建共享缓存，backend 为 none 时返回 None（各进程只使用本地缓存）
+
+    Args:
+        client: 直接注入的 Redis 协议客户端（例如测试中的本地替身），优先于 url
+    """
+    backend = (backend or "none").lower()
+    if backend == "redis":
+        if client is None:
+            if not REDIS_AVAILABLE:
+                logger.warning("⚠️ redis not installed, shared cache disabled")
+                return None
+            client = redis.Redis.from_url(url)
+        logger.info(f"🔗 Shared cache: redis ({url or 'injected client'})")
+        return RedisSharedCache(client, prefix=prefix)
+    if backend == "sqlite":
+        logger.info(f"🔗 Shared cache: sqlite ({sqlite_path})")
+        return SqliteSharedCache(sqlite_path, prefix=prefix, poll_seconds=poll_seconds)
+    if backend != "none":
+        logger.warning(f"⚠️ Unknown shared cache backend: {backend}, shared cache disabled")
+    return None
+
+
+# 通过 set_shared_cache 注入的实例（未注入时按配置创建）
+_UNSET = object()
+_injected_cache: Any = _UNSET
+
+
+def set_shared_cache(cache: Optional[SharedCache]) -> None:
+    """
+    注入共享缓存实例（测试替身或自定义后端），之后创建的服务都会使用它
+
+    传入 None 表示禁用共享缓存；已创建的服务仍持有原来的实例。
+    """
+    global _injected_cache
+    _injected_cache = cache
+
+
+def reset_shared_cache() -> None:
+    """清除注入的实例和按配置创建的单例，下次调用 get_shared_cache 时重新按配置创建"""
+    global _injected_cache
+    _injected_cache = _UNSET
+    _configured_shared_cache.cache_clear()
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """返回进程内共享的 SharedCache 实例（未配置时为 None）"""
+    if _injected_cache is not _UNSET:
+        return _injected_cache
+    return _configured_shared_cache()
+
+
+@lru_cache
+def _configured_shared_cache() -> Optional[SharedCache]:
+    return create_shared_cache(
+        settings.SHARED_CACHE_BACKEND,
+        url=settings.SHARED_CACHE_URL,
+        sqlite_path=settings.SHARED_CACHE_SQLITE_PATH,
+        prefix=settings.SHARED_CACHE_PREFIX,
+        poll_seconds=settings.SHARED_CACHE_POLL_SECONDS,
+    )
@@ -0,0 +1,90 @@
+# Single-flight deduplication of concurrent calls with the same key
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    合并相同 key 的并发调用
+
+    同一时刻对同一个 key 只执行一次 fn，其余调用方等待并共享同一结果（或异常）。
+    调用结束后立即移除 key，之后的调用会重新执行，因此不承担缓存职责。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """执行 fn（或等待相同 key 的进行中调用），返回其结果"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self._run(key, call, fn)
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def start(self, key: Hashable, fn: Callable[[], Any], executor: Executor) -> bool:
+        """在 executor 中后台执行 fn；相同 key 已在进行中时直接返回 False"""
+        with self._lock:
+            if key in self._calls:
+                return False
+            call = self._calls[key] = _Call()
+            self.executions += 1
+        try:
+            executor.submit(self._run, key, call, fn)
+        except RuntimeError:
+            # 线程池已关闭
+            self._finish(key, call)
+            return False
+        return True
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> None:
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            self._finish(key, call)
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "shared": self.shared,
+            }
@@ -0,0 +1,164 @@
+# Compact binary encoding for conversation / mint-record snapshots
+import json
+import zlib
+from typing import Any, Dict, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+# 可选依赖：未安装时回退到 JSON 序列化 / zlib 压缩
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import cbor2
+    CBOR_AVAILABLE = True
+except ImportError:
+    CBOR_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+# 可选依赖：orjson 解析 JSON 快照更快，未安装时使用标准库
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 头部：魔数（以 NUL 开头，不可能是合法 JSON）+ 版本 + 序列化格式 + 压缩算法
+MAGIC = b"\x00OCS"
+VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+SERIALIZERS = {"json": 0, "msgpack": 1, "cbor": 2}
+COMPRESSORS = {"none": 0, "zlib": 1, "zstd": 2}
+
+_SERIALIZER_NAMES = {code: name for name, code in SERIALIZERS.items()}
+_COMPRESSOR_NAMES = {code: name for name, code in COMPRESSORS.items()}
+
+
+class SnapshotDecodeError(ValueError):
+    """快照内容无法解码"""
+
+
+def resolve_encoding(encoding: str) -> Tuple[str, str]:
+    """
+    将 SNAPSHOT_ENCODING 解析为 (序列化格式, 压缩算法)
+
+    - "json": 纯 JSON（兼容旧快照，走 pinJSONToIPFS）
+    - "compact": 自动选择已安装的最优组合（msgpack > cbor > json，zstd > zlib）
+    - "<serializer>+<compressor>": 显式指定，例如 "msgpack+zstd"、"json+zlib"
+    """
+    encoding = (encoding or "json").lower()
+    if encoding == "json":
+        return "json", "none"
+    if encoding == "compact":
+        serializer = "msgpack" if MSGPACK_AVAILABLE else "cbor" if CBOR_AVAILABLE else "json"
+        return serializer, "zstd" if ZSTD_AVAILABLE else "zlib"
+
+    serializer, _, compressor = encoding.partition("+")
+    compressor = compressor or "none"
+    if serializer not in SERIALIZERS or compressor not in COMPRESSORS:
+        raise ValueError(f"Unknown snapshot encoding: {encoding}")
+    if (serializer == "msgpack" and not MSGPACK_AVAILABLE) or (serializer == "cbor" and not CBOR_AVAILABLE):
+        logger.warning(f"⚠️ {serializer} not installed, falling back to JSON serialization")
+        serializer = "json"
+    if compressor == "zstd" and not ZSTD_AVAILABLE:
+        logger.warning("⚠️ zstandard not installed, falling back to zlib compression")
+        compressor = "zlib"
+    return serializer, compressor
+
+
+def loads_json(payload: bytes) -> Any:
+    """解析 JSON（优先使用 orjson）"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def encode_json(data: Any) -> bytes:
+    """紧凑 JSON 字节（不带头部，旧格式读取方可直接解析）"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+def _serialize(data: Any, serializer: str) -> bytes:
+    if serializer == "msgpack":
+        return msgpack.packb(data, use_bin_type=True, default=str)
+    if serializer == "cbor":
+        return cbor2.dumps(data, default=lambda encoder, value: encoder.encode(str(value)))
+    return encode_json(data)
+
+
+def _deserialize(payload: bytes, serializer: str) -> Any:
+    if serializer == "msgpack":
+        if not MSGPACK_AVAILABLE:
+            raise SnapshotDecodeError("msgpack snapshot but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    if serializer == "cbor":
+        if not CBOR_AVAILABLE:
+            raise SnapshotDecodeError("CBOR snapshot but cbor2 is not installed")
+        return cbor2.loads(payload)
+    return loads_json(payload)
+
+
+def _compress(payload: bytes, compressor: str) -> bytes:
+    if compressor == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(payload)
+    if compressor == "zlib":
+        return zlib.compress(payload, 9)
+    return payload
+
+
+def _decompress(payload: bytes, compressor: str) -> bytes:
+    if compressor == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise SnapshotDecodeError("zstd snapshot but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if compressor == "zlib":
+        return zlib.decompress(payload)
+    return payload
+
+
+def encode_snapshot(data: Dict, encoding: str = "compact") -> bytes:
+    """按指定编码生成带版本头的二进制快照"""
+    serializer, compressor = resolve_encoding(encoding)
+    header = MAGIC + bytes([VERSION, SERIALIZERS[serializer], COMPRESSORS[compressor]])
+    return header + _compress(_serialize(data, serializer), compressor)
+
+
+def is_compact_snapshot(content: bytes) -> bool:
+    return content[:len(MAGIC)] == MAGIC
+
+
+def decode_snapshot(content: bytes) -> Any:
+    """自动识别格式并解码：带魔数头的二进制快照，否则按 JSON 处理（旧快照）"""
+    if not is_compact_snapshot(content):
+        try:
+            return loads_json(content)
+        except ValueError as e:
+            raise SnapshotDecodeError(str(e)) from e
+
+    if len(content) < HEADER_SIZE:
+        raise SnapshotDecodeError("Truncated snapshot header")
+    version, serializer_code, compressor_code = content[len(MAGIC):HEADER_SIZE]
+    if version != VERSION:
+        raise SnapshotDecodeError(f"Unsupported snapshot version: {version}")
+    serializer = _SERIALIZER_NAMES.get(serializer_code)
+    compressor = _COMPRESSOR_NAMES.get(compressor_code)
+    if serializer is None or compressor is None:
+        raise SnapshotDecodeError("Unknown snapshot serializer or compressor")
+
+    try:
+        return _deserialize(_decompress(content[HEADER_SIZE:], compressor), serializer)
+    except SnapshotDecodeError:
+        raise
+    except Exception as e:
+        raise SnapshotDecodeError(str(e)) from e
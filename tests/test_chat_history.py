@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from backend.config import settings
+from backend.main import app
+from backend.routes import chat_routes
+from backend.services.storage_service import StorageService
+from backend.services.wallet_service import WalletService
+
+WALLET = "0x" + "1" * 40
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IPFS_PINNING_SERVICE", "none")
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'index.db'}")
+    storage = StorageService()
+    monkeypatch.setattr(chat_routes, "get_storage_service", lambda: storage)
+
+    # 两个对话交替写入，按时间全局排序时消息来自不同对话交错出现
+    for turn in range(3):
+        for conversation_id in ("c1", "c2"):
+            storage.append_exchange(conversation_id, WALLET, f"{conversation_id}-q{turn}", f"{conversation_id}-a{turn}")
+
+    token = WalletService().issue_access_token(WALLET)
+    return app.test_client(), {"Authorization": f"Bearer {token}"}
+
+
+def test_streamed_history_matches_plain_order(client):
+    test_client, headers = client
+    url = f"{settings.API_PREFIX}/chat/history"
+
+    plain = test_client.get(url, headers=headers).get_json()["history"]
+    assert [entry["content"] for entry in plain[:4]] == ["c1-q0", "c1-a0", "c2-q0", "c2-a0"]
+
+    ndjson = test_client.get(url, query_string={"stream": "ndjson"}, headers=headers)
+    assert [json.loads(line) for line in ndjson.data.decode().splitlines()] == plain
+
+    streamed = json.loads(test_client.get(url, query_string={"stream": "json"}, headers=headers).data)
+    assert streamed["history"] == plain
+    assert streamed["total_messages"] == len(plain) == 12
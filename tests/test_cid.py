@@ -0,0 +1,76 @@
+import hashlib
+
+from backend.utils.cid import base58btc, compute_cid
+
+
+def _multihash(block: bytes) -> bytes:
+    return b"\x12\x20" + hashlib.sha256(block).digest()
+
+
+def _varint(value: int) -> bytes:
+    out = b""
+    while value >= 0x80:
+        out += bytes([value & 0x7F | 0x80])
+        value >>= 7
+    return out + bytes([value])
+
+
+def _leaf(chunk: bytes) -> bytes:
+    # PBNode { Data: UnixFS { Type: File, Data: chunk, filesize } }
+    unixfs = b"\x08\x02\x12" + _varint(len(chunk)) + chunk + b"\x18" + _varint(len(chunk))
+    return b"\x0a" + _varint(len(unixfs)) + unixfs
+
+
+def _node(children):
+    """children 为 (块, 子树累计大小, 文件字节数)；返回同样的三元组"""
+    block = b""
+    for child, tsize, _ in children:
+        link = b"\x0a\x22" + _multihash(child) + b"\x12\x00" + b"\x18" + _varint(tsize)
+        block += b"\x12" + _varint(len(link)) + link
+    filesize = sum(size for _, _, size in children)
+    unixfs = b"\x08\x02\x18" + _varint(filesize) + b"".join(b"\x20" + _varint(size) for _, _, size in children)
+    block += b"\x0a" + _varint(len(unixfs)) + unixfs
+    return block, len(block) + sum(tsize for _, tsize, _ in children), filesize
+
+
+def _leaf_entry(chunk: bytes):
+    block = _leaf(chunk)
+    return block, len(block), len(chunk)
+
+
+def _cid(block: bytes) -> str:
+    return base58btc(_multihash(block))
+
+
+def test_known_single_block_cids():
+    # `ipfs add` / Pinata pinFileToIPFS 的已知结果
+    assert compute_cid(b"hello world\n") == "QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o"
+    assert compute_cid(b"") == "QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH"
+
+
+def test_base58btc_keeps_leading_zeros():
+    assert base58btc(b"\x00\x00\x01") == "112"
+    assert base58btc(b"hello world") == "StV1DL6CwTryKyV"
+
+
+def test_content_filling_one_chunk_is_a_single_leaf():
+    assert compute_cid(b"abcd", chunk_size=4) == _cid(_leaf(b"abcd"))
+
+
+def test_two_chunks_link_from_one_root():
+    root, _, _ = _node([_leaf_entry(b"abcd"), _leaf_entry(b"efgh")])
+    assert compute_cid(b"abcdefgh", chunk_size=4) == _cid(root)
+
+
+def test_balanced_layout_adds_levels_when_root_is_full():
+    # 每个节点最多 2 个链接：[[a, b], [c]]
+    left = _node([_leaf_entry(b"a"), _leaf_entry(b"b")])
+    right = _node([_leaf_entry(b"c")])
+    root, _, _ = _node([left, right])
+    assert compute_cid(b"abc", chunk_size=1, max_links=2) == _cid(root)
+
+    # [[[a, b], [c, d]], [[e]]]
+    level1 = [_node([_leaf_entry(c1), _leaf_entry(c2)]) for c1, c2 in ((b"a", b"b"), (b"c", b"d"))]
+    tail = _node([_node([_leaf_entry(b"e")])])
+    root, _, _ = _node([_node(level1), tail])
+    assert compute_cid(b"abcde", chunk_size=1, max_links=2) == _cid(root)
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from backend.services.gateway_client import GatewayClient
+from backend.utils.cid import compute_cid
+
+CONTENT = b'{"format": "segment", "messages": []}'
+CID = compute_cid(CONTENT)
+
+
+class FakeHttp:
+    """按网关返回固定内容"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, timeout=None):
+        gateway, _, _ = url.rpartition("/")
+        return SimpleNamespace(status_code=200, content=self.responses[gateway + "/"])
+
+
+def _client(verify_content=True) -> GatewayClient:
+    http = FakeHttp({"https://bad.example/ipfs/": b"tampered", "https://good.example/ipfs/": CONTENT})
+    return GatewayClient(
+        ["https://bad.example/ipfs/", "https://good.example/ipfs/"],
+        timeout=2.0,
+        http=http,
+        verify_content=verify_content,
+    )
+
+
+def test_mismatched_content_falls_through_to_next_gateway():
+    client = _client()
+    assert client.fetch(CID) == CONTENT
+
+    stats = {entry["url"]: entry for entry in client.stats()}
+    assert stats["https://bad.example/ipfs/"]["failures"] == 1
+    assert stats["https://good.example/ipfs/"]["failures"] == 0
+    # 失败的网关排到后面
+    assert client.ranked_gateways()[0] == "https://good.example/ipfs/"
+
+
+def test_verification_can_be_disabled():
+    assert _client(verify_content=False).fetch(CID) == b"tampered"
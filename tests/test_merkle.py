@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from backend.models.chat_models import ChatMessage, Conversation
+from backend.utils.merkle import EMPTY_ROOT, MerkleTree, hash_leaf, hash_node, merkle_root
+
+
+def _leaves(count: int):
+    return [hash_leaf({"index": index}) for index in range(count)]
+
+
+def test_incremental_append_matches_batch_root():
+    tree = MerkleTree()
+    assert tree.root() == EMPTY_ROOT
+    leaves = _leaves(13)
+    for count, leaf in enumerate(leaves, start=1):
+        tree.append(leaf)
+        assert tree.root() == merkle_root(leaves[:count])
+
+
+def test_odd_node_is_promoted_unchanged():
+    a, b, c = _leaves(3)
+    assert merkle_root([a, b, c]) == hash_node(hash_node(a, b), c)
+    assert merkle_root([a]) == a
+
+
+def test_update_rehashes_path_to_root():
+    leaves = _leaves(9)
+    tree = MerkleTree(leaves)
+    leaves[4] = hash_leaf({"index": 4, "minted": True})
+    tree.update(4, leaves[4])
+    assert tree.root() == merkle_root(leaves)
+    assert tree.range_root(2, 6) == merkle_root(leaves[2:6])
+
+
+def test_leaf_and_node_hashes_are_domain_separated():
+    a, b = _leaves(2)
+    assert hash_leaf(a + b) != hash_node(a, b)
+
+
+def test_conversation_root_tracks_appends_and_mint_status():
+    conversation = Conversation(id="c1", wallet_address="0x" + "1" * 40)
+    for index in range(5):
+        conversation.add_message(
+            ChatMessage(id=f"m{index}", role="user", content=f"hello {index}", timestamp=datetime(2024, 1, 1, 0, index))
+        )
+    before = conversation.content_root()
+
+    conversation.set_minted(["m1", "m3"])
+    after = conversation.content_root()
+    assert after != before
+
+    # 增量维护的根与从头计算的结果一致
+    expected = merkle_root([hash_leaf(msg.model_dump(mode="json")) for msg in conversation.messages])
+    assert after == expected
+    assert conversation.content_root(1, 3) == merkle_root(
+        [hash_leaf(msg.model_dump(mode="json")) for msg in conversation.messages[1:3]]
+    )
+    assert conversation.messages_root([3, 1]) == merkle_root(
+        [hash_leaf(conversation.messages[3].model_dump(mode="json")),
+         hash_leaf(conversation.messages[1].model_dump(mode="json"))]
+    )
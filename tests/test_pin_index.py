@@ -0,0 +1,146 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from backend.config import settings
+from backend.services.pin_index import PinIndex
+from backend.services.storage_service import StorageService
+
+WALLET = "0x" + "1" * 40
+OTHER_WALLET = "0x" + "2" * 40
+
+
+def _open(tmp_path) -> PinIndex:
+    return PinIndex(f"sqlite:///{tmp_path / 'pins.db'}")
+
+
+def _current(index: PinIndex, wallet: str, conversation_id: str):
+    row = index._conn.execute(
+        "SELECT version, ipfs_hash FROM conversation_pins WHERE wallet_address = ? AND conversation_id = ?",
+        (wallet.lower(), conversation_id),
+    ).fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+
+def test_commit_conversation_rejects_stale_writer(tmp_path):
+    # 两个实例共享同一个数据库文件，模拟两个 worker 进程
+    first, second = _open(tmp_path), _open(tmp_path)
+
+    assert first.commit_conversation(WALLET, "c1", "QmA", version=1, expected_version=0, expected_hash=None)
+    # 第二个写入者仍持有读取时的版本 0
+    assert not second.is_current(WALLET, "c1", 0, None)
+    assert not second.commit_conversation(WALLET, "c1", "QmB", version=1, expected_version=0, expected_hash=None)
+    assert second.get_conversation_hash(WALLET, "c1") == "QmA"
+
+    # 重新加载最新版本后重试成功
+    version, ipfs_hash = _current(second, WALLET, "c1")
+    assert second.commit_conversation(
+        WALLET, "c1", "QmB", version=version + 1, expected_version=version, expected_hash=ipfs_hash
+    )
+    assert first.get_conversation_hash(WALLET, "c1") == "QmB"
+    assert first.is_current(WALLET, "c1", 2, "QmB")
+
+
+def test_commit_conversation_is_scoped_to_wallet(tmp_path):
+    index = _open(tmp_path)
+    assert index.commit_conversation(WALLET, "c1", "QmA", version=1, expected_version=0, expected_hash=None)
+
+    # 另一个钱包使用相同的 conversation_id 时是独立的对话
+    assert index.is_current(OTHER_WALLET, "c1", 0, None)
+    assert index.commit_conversation(OTHER_WALLET, "c1", "QmB", version=1, expected_version=0, expected_hash=None)
+    assert index.get_conversation_hash(WALLET, "c1") == "QmA"
+    assert index.get_conversation_hash(OTHER_WALLET, "c1") == "QmB"
+
+    index.record_conversation(OTHER_WALLET, "c1", "QmC", version=2)
+    assert index.get_conversation_hash(WALLET, "c1") == "QmA"
+
+
+def test_concurrent_writers_retry_until_every_commit_lands(tmp_path):
+    writers, commits_per_writer = 4, 10
+    indexes = [_open(tmp_path) for _ in range(writers)]
+
+    def write(index: PinIndex, writer: int) -> None:
+        for commit in range(commits_per_writer):
+            while True:
+                version, ipfs_hash = _current(index, WALLET, "c1")
+                if index.commit_conversation(
+                    WALLET, "c1", f"Qm{writer}-{commit}",
+                    version=version + 1, expected_version=version, expected_hash=ipfs_hash,
+                ):
+                    break
+
+    threads = [threading.Thread(target=write, args=(index, n)) for n, index in enumerate(indexes)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 每次提交都基于最新版本，没有写入被覆盖
+    assert _current(indexes[0], WALLET, "c1")[0] == writers * commits_per_writer
+
+
+def test_legacy_conversation_tables_are_rekeyed(tmp_path):
+    path = tmp_path / "pins.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE conversation_pins (
+            conversation_id TEXT PRIMARY KEY,
+            wallet_address TEXT NOT NULL,
+            ipfs_hash TEXT NOT NULL,
+            pinned_at TEXT NOT NULL
+        );
+        INSERT INTO conversation_pins VALUES ('c1', '0x1111111111111111111111111111111111111111', 'QmA', '2024-01-01T00:00:00.000Z');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    index = PinIndex(f"sqlite:///{path}")
+    assert index.get_conversation_hash(WALLET, "c1") == "QmA"
+    assert index.commit_conversation(OTHER_WALLET, "c1", "QmB", version=1, expected_version=0, expected_hash=None)
+    assert index.get_conversation_hash(WALLET, "c1") == "QmA"
+
+
+class FakeIpfsClient:
+    """本地 IPFS 节点替身：按内容生成哈希"""
+
+    def __init__(self):
+        self.pin = SimpleNamespace(add=lambda ipfs_hash: None)
+
+    def add_json(self, data):
+        return "Qm" + hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:44]
+
+    def add_bytes(self, content):
+        return "Qm" + hashlib.sha256(content).hexdigest()[:44]
+
+
+@pytest.fixture
+def local_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IPFS_PINNING_SERVICE", "local")
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'pins.db'}")
+    monkeypatch.setattr(settings, "IPFS_BLOB_CACHE_DIR", str(tmp_path / "blobs"))
+
+    def connect(service):
+        service.client = FakeIpfsClient()
+
+    monkeypatch.setattr(StorageService, "_init_local_ipfs", connect)
+
+
+def test_local_mode_keeps_writing_after_restart(local_storage):
+    first = StorageService()
+    first.append_exchange("c1", WALLET, "q1", "a1")
+    first_hash = first._pin_index.get_conversation_hash(WALLET, "c1")
+    assert first_hash
+
+    # 本地模式无法按 CID 重新加载：重启后（或另一个 worker）重新创建对话，写入不应冲突
+    restarted = StorageService()
+    second_hash = restarted.append_exchange("c1", WALLET, "q2", "a2")[2].ipfs_hash
+    assert restarted._pin_index.get_conversation_hash(WALLET, "c1") == second_hash != first_hash
+
+    third_hash = restarted.append_exchange("c1", WALLET, "q3", "a3")[2].ipfs_hash
+    assert first._pin_index.get_conversation_hash(WALLET, "c1") == third_hash != second_hash
@@ -0,0 +1,187 @@
+import queue
+import threading
+import time
+
+import pytest
+from eth_account import Account
+from eth_account.messages import encode_defunct
+
+from backend.config import settings
+from backend.services.storage_service import StorageService
+from backend.services.wallet_service import WalletService
+from backend.utils.shared_cache import (
+    RedisSharedCache,
+    SharedCache,
+    create_shared_cache,
+    get_shared_cache,
+    reset_shared_cache,
+    set_shared_cache,
+)
+
+WALLET = "0x" + "1" * 40
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def get(self, key):
+        self.ops.append((self.client.get, key))
+
+    def delete(self, key):
+        self.ops.append((self.client.delete, key))
+
+    def execute(self):
+        with self.client.lock:
+            return [op(key) for op, key in self.ops]
+
+
+class FakePubSub:
+    def __init__(self, client):
+        self.client = client
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        with self.client.lock:
+            self.client.subscribers.setdefault(channel, []).append(self.messages)
+
+    def listen(self):
+        while True:
+            yield {"type": "message", "data": self.messages.get()}
+
+
+class FakeRedis:
+    """进程内的 Redis 替身：多个 RedisSharedCache 共用一个实例即模拟多个 worker 连接同一 Redis"""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = {}
+        self.lock = threading.RLock()
+
+    def get(self, key):
+        with self.lock:
+            value, expires_at = self.data.get(key, (None, None))
+            if expires_at is not None and expires_at < time.time():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, px=None):
+        with self.lock:
+            self.data[key] = (value, time.time() + px / 1000 if px else None)
+
+    def delete(self, key):
+        with self.lock:
+            return 1 if self.data.pop(key, None) is not None else 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def publish(self, channel, payload):
+        with self.lock:
+            for messages in self.subscribers.get(channel, []):
+                messages.put(payload)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def _worker_cache(client) -> SharedCache:
+    return create_shared_cache("redis", prefix="test:", client=client)
+
+
+@pytest.fixture(autouse=True)
+def _reset_shared_cache():
+    yield
+    reset_shared_cache()
+
+
+@pytest.fixture
+def mock_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "IPFS_PINNING_SERVICE", "none")
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{tmp_path / 'index.db'}")
+
+
+def test_shared_cache_is_abstract():
+    with pytest.raises(TypeError):
+        SharedCache()
+
+
+def test_injected_cache_overrides_configuration():
+    cache = _worker_cache(FakeRedis())
+    set_shared_cache(cache)
+    assert get_shared_cache() is cache
+
+    set_shared_cache(None)
+    assert get_shared_cache() is None
+
+    reset_shared_cache()
+    assert get_shared_cache() is None  # SHARED_CACHE_BACKEND 默认为 none
+
+
+def test_invalidation_reaches_other_workers_only():
+    client = FakeRedis()
+    first, second = _worker_cache(client), _worker_cache(client)
+    received = {"first": [], "second": []}
+    first.subscribe(received["first"].append)
+    second.subscribe(received["second"].append)
+    assert _wait_for(lambda: len(client.subscribers.get("test:invalidate", [])) == 2)
+
+    first.set("k", b"v", ttl_seconds=5)
+    assert second.get("k") == b"v"
+    first.publish({"kind": "conversation", "id": "c1"})
+
+    assert _wait_for(lambda: received["second"])
+    assert received["second"][0]["id"] == "c1"
+    assert received["first"] == []
+    assert isinstance(first, RedisSharedCache)
+
+
+def test_saved_conversation_invalidates_other_worker(mock_storage):
+    client = FakeRedis()
+    set_shared_cache(_worker_cache(client))
+    first = StorageService()
+    set_shared_cache(_worker_cache(client))
+    second = StorageService()
+    assert _wait_for(lambda: len(client.subscribers.get("test:invalidate", [])) == 2)
+
+    first.append_exchange("c1", WALLET, "q1", "a1")
+    convo = second.get_conversation("c1", WALLET)
+    assert convo is not None and len(convo.messages) == 2
+    assert second.get_conversation("c1", "0x" + "2" * 40) is None
+
+    first.append_exchange("c1", WALLET, "q2", "a2")
+    assert _wait_for(lambda: second._conversation_cache.get((WALLET, "c1")) is None)
+    assert len(second.get_conversation("c1", WALLET).messages) == 4
+
+
+def test_nonce_is_shared_and_single_use_across_workers():
+    client = FakeRedis()
+    set_shared_cache(_worker_cache(client))
+    issuer = WalletService()
+    set_shared_cache(_worker_cache(client))
+    verifier = WalletService()
+    set_shared_cache(_worker_cache(client))
+    replayer = WalletService()
+    issuer.mock_mode = verifier.mock_mode = replayer.mock_mode = False
+
+    account = Account.create()
+    challenge = issuer.generate_nonce(account.address)
+    signature = account.sign_message(encode_defunct(text=challenge["message"])).signature.hex()
+
+    ok, wallet, error = verifier.verify_signature(account.address, challenge["message"], signature)
+    assert ok and error is None
+    assert wallet.lower() == account.address.lower()
+
+    ok, _, error = replayer.verify_signature(account.address, challenge["message"], signature)
+    assert not ok and error
@@ -0,0 +1,100 @@
+import time
+
+from backend.services import upload_outbox
+from backend.services.upload_outbox import UploadOutbox
+
+
+def _open(tmp_path, upload, **kwargs) -> UploadOutbox:
+    return UploadOutbox(str(tmp_path / "outbox.db"), upload, **kwargs)
+
+
+def test_delivered_upload_leaves_the_outbox(tmp_path):
+    uploads = []
+
+    def upload(content, name, metadata):
+        uploads.append((content, name, metadata))
+        return "QmA"
+
+    outbox = _open(tmp_path, upload)
+    outbox.enqueue("QmA", b"payload", "snapshot", {"keyvalues": {"type": "conversation"}})
+    assert outbox.get("QmA") == b"payload"
+
+    assert outbox.drain_once()
+    assert uploads == [(b"payload", "snapshot", {"keyvalues": {"type": "conversation"}})]
+    assert outbox.get("QmA") is None
+    assert not outbox.drain_once()
+    assert outbox.stats()["delivered"] == 1
+
+
+def test_pending_uploads_resume_after_restart(tmp_path):
+    first = _open(tmp_path, lambda *_: None)
+    first.enqueue("QmA", b"payload", "snapshot", {})
+    del first
+
+    uploads = []
+    second = _open(tmp_path, lambda content, name, metadata: uploads.append(content) or "QmA")
+    assert second.stats()["pending"] == 1
+    assert second.drain_once()
+    assert uploads == [b"payload"]
+    assert second.stats()["pending"] == 0
+
+
+def test_claim_is_leased_and_reclaimed_after_expiry(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_outbox, "LEASE_SECONDS", 0.2)
+    first = _open(tmp_path, lambda *_: "QmA")
+    second = _open(tmp_path, lambda *_: "QmA")
+    first.enqueue("QmA", b"payload", "snapshot", {})
+
+    # 第一个进程领取后崩溃（未完成上传）：租约期内其他进程不会重复领取
+    assert first._claim()[0] == "QmA"
+    assert second._claim() is None
+    assert not second.drain_once()
+
+    time.sleep(0.25)
+    assert second.drain_once()
+    assert second.get("QmA") is None
+
+
+def test_failed_upload_backs_off_then_retries(tmp_path):
+    results = [RuntimeError("pinata unavailable"), None, "QmA"]
+
+    def upload(*_):
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    outbox = _open(tmp_path, upload, retry_base_seconds=0.05, retry_max_seconds=1)
+    outbox.enqueue("QmA", b"payload", "snapshot", {})
+
+    assert outbox.drain_once()
+    # 退避期内不会再次尝试
+    assert not outbox.drain_once()
+    time.sleep(0.06)
+    assert outbox.drain_once()
+    time.sleep(0.11)
+    assert outbox.drain_once()
+    assert outbox.get("QmA") is None
+    assert outbox.stats()["retries"] == 2
+
+
+def test_mismatched_cid_and_exhausted_attempts_are_dead(tmp_path):
+    outbox = _open(tmp_path, lambda content, *_: "QmOther" if content == b"a" else None, max_attempts=1)
+    outbox.enqueue("QmA", b"a", "snapshot", {})
+    outbox.enqueue("QmB", b"b", "snapshot", {})
+
+    assert outbox.drain_once()
+    assert outbox.drain_once()
+    stats = outbox.stats()
+    assert (stats["pending"], stats["dead"]) == (0, 2)
+    # dead 任务保留内容以便排查，读路径仍可使用
+    assert outbox.get("QmA") == b"a"
+    assert not outbox.drain_once()
+
+
+def test_discard_cancels_a_queued_upload(tmp_path):
+    outbox = _open(tmp_path, lambda *_: "QmA")
+    outbox.enqueue("QmA", b"payload", "snapshot", {})
+    assert outbox.discard("QmA")
+    assert not outbox.discard("QmA")
+    assert not outbox.drain_once()